@@ -0,0 +1,221 @@
+"""
+Exportación del atlas de mapas estáticos: los mapas nacionales de distritos y
+un mapa por departamento, renderizados en paralelo y guardados en output/
+junto con un manifest.json que el dashboard usa para servir las imágenes.
+
+Uso (desde code/streamlit/src):
+    python atlas.py
+    python atlas.py --format svg --workers 4 --output ../../../output/atlas
+"""
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from cache import cache_key
+from instrumentation import instrumented, note, warn
+from schema import get_schema, normalize_values
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SRC_DIR, "..", "data"))
+ATLAS_DIR = os.path.normpath(os.path.join(SRC_DIR, "..", "..", "..", "output", "atlas"))
+MANIFEST_NAME = "manifest.json"
+
+# Mapas nacionales: id -> (función de plots.py, título), los mismos del Tab 2
+NATIONAL_MAPS = {
+    "nacional_hospitales": ("create_static_choropleth_map", "Distribución de Hospitales por Distrito en Perú"),
+    "nacional_sin_hospitales": ("create_zero_hospitals_map", "Distritos sin Hospitales Públicos"),
+    "nacional_top10": ("create_top10_hospitals_map", "Top 10 Distritos con Mayor Número de Hospitales"),
+}
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "_", str(text).lower()).strip("_")
+
+def department_id(department):
+    """Identificador del mapa de un departamento en el manifest (p. ej. 'departamento_madre_de_dios')."""
+    return "departamento_" + _slug(normalize_values(pd.Series([department]))[0])
+
+def atlas_key(gdf_hospitals, gdf_districts_merged):
+    """Clave de los datos con que se generó el atlas (cambia si cambia cualquiera de las dos capas)."""
+    from plots import data_hash
+
+    return cache_key([data_hash(gdf_hospitals), data_hash(gdf_districts_merged)], {})
+
+def _groups(gdf):
+    """Posiciones de las filas por departamento normalizado y nombre original de cada uno."""
+    col_dept = get_schema(gdf).get("departamento")
+    if col_dept is None:
+        return {}, {}
+    values = gdf[col_dept].astype(str)
+    keys = normalize_values(values).to_numpy()
+    positions = pd.Series(np.arange(len(gdf))).groupby(keys).indices
+    names = values.groupby(keys).first().to_dict()
+    return positions, names
+
+def department_partition(gdf_hospitals, gdf_districts):
+    """
+    Índice de partición por departamento, calculado una sola vez para todo
+    el atlas (en lugar de filtrar ambas capas en cada mapa).
+
+    Returns:
+        dict {departamento normalizado: (nombre, posiciones de hospitales,
+        posiciones de distritos)}, solo para departamentos con distritos
+    """
+    hosp_pos, hosp_names = _groups(gdf_hospitals)
+    dist_pos, dist_names = _groups(gdf_districts)
+    empty = np.empty(0, dtype=np.int64)
+    return {
+        key: (hosp_names.get(key, dist_names[key]), hosp_pos.get(key, empty), rows)
+        for key, rows in sorted(dist_pos.items())
+    }
+
+def _render_job(job):
+    """Trabajo de un proceso: dibuja un mapa y lo guarda (escritura atómica)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import plots
+
+    func_name, args, kwargs, path, fmt, dpi = job
+    fig = getattr(plots, func_name)(*args, **kwargs)
+    if fig is None:
+        return path, False
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fig.savefig(tmp_path, format=fmt, dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+    os.replace(tmp_path, path)
+    return path, True
+
+def load_manifest(output_dir=ATLAS_DIR):
+    """Manifest del atlas (None si todavía no se exportó)."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def atlas_image(map_id, key, output_dir=ATLAS_DIR, manifest=None):
+    """
+    Ruta de la imagen pre-renderizada 'map_id' si el atlas se generó con los
+    mismos datos ('key', ver atlas_key); None en otro caso.
+    """
+    manifest = manifest or load_manifest(output_dir)
+    if manifest is None or manifest.get("key") != key:
+        return None
+    entry = manifest["maps"].get(map_id)
+    if entry is None:
+        return None
+    path = os.path.join(output_dir, entry["file"])
+    return path if os.path.exists(path) else None
+
+@instrumented("atlas.export", rows_out=lambda manifest: len(manifest["maps"]))
+def export_atlas(gdf_hospitals, gdf_districts_merged, output_dir=ATLAS_DIR, fmt="png", dpi=100,
+                 max_workers=None, force=False):
+    """
+    Renderiza los mapas nacionales y un mapa por departamento en un pool de
+    procesos y los guarda en 'output_dir' con un manifest.json.
+
+    Si el manifest existente corresponde a los mismos datos y formato, solo
+    se renderizan las imágenes que falten (force=True rehace todo).
+
+    Args:
+        gdf_hospitals: GeoDataFrame de hospitales
+        gdf_districts_merged: salida de merge_hospitals_with_districts
+        output_dir: carpeta de salida
+        fmt: 'png' o 'svg'
+        dpi: resolución de los PNG
+        max_workers: procesos (None = núcleos disponibles; 1 = sin pool)
+        force: volver a renderizar aunque las imágenes estén al día
+
+    Returns:
+        dict con el manifest escrito
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    key = atlas_key(gdf_hospitals, gdf_districts_merged)
+    previous = load_manifest(output_dir)
+    up_to_date = (not force and previous is not None and previous.get("key") == key
+                  and previous.get("format") == fmt and previous.get("dpi") == dpi)
+
+    # La pirámide de geometrías nacional queda en disco antes de repartir el trabajo
+    from lod import build_pyramid
+    build_pyramid(gdf_districts_merged)
+
+    maps = {}
+    jobs = []
+    for map_id, (func_name, title) in NATIONAL_MAPS.items():
+        maps[map_id] = {"tipo": "nacional", "titulo": title, "file": f"{map_id}.{fmt}",
+                        "n_distritos": len(gdf_districts_merged)}
+        jobs.append((func_name, (gdf_districts_merged,), {"title": title}, map_id))
+
+    partition = department_partition(gdf_hospitals, gdf_districts_merged)
+    for name, hosp_rows, dist_rows in partition.values():
+        map_id = department_id(name)
+        maps[map_id] = {"tipo": "departamento", "departamento": name, "file": f"{map_id}.{fmt}",
+                        "n_hospitales": int(len(hosp_rows)), "n_distritos": int(len(dist_rows))}
+        args = (gdf_districts_merged.iloc[dist_rows], gdf_hospitals.iloc[hosp_rows], name)
+        jobs.append(("draw_department_map", args, {}, map_id))
+
+    pending = [
+        (func_name, args, kwargs, os.path.join(output_dir, maps[map_id]["file"]), fmt, dpi)
+        for func_name, args, kwargs, map_id in jobs
+        if not (up_to_date and os.path.exists(os.path.join(output_dir, maps[map_id]["file"])))
+    ]
+
+    results = None
+    if max_workers != 1 and len(pending) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(_render_job, pending))
+        except (BrokenProcessPool, OSError) as e:
+            warn(f"Pool de procesos no disponible ({e}); se renderiza en serie")
+    if results is None:
+        results = [_render_job(job) for job in pending]
+
+    failed = {os.path.basename(path) for path, ok in results if not ok}
+    maps = {map_id: entry for map_id, entry in maps.items() if entry["file"] not in failed}
+
+    manifest = {
+        "key": key,
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "format": fmt,
+        "dpi": dpi,
+        "maps": maps,
+    }
+    tmp_path = os.path.join(output_dir, f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_NAME))
+
+    note("carpeta", output_dir)
+    note("renderizados", len(pending))
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta el atlas de mapas estáticos (nacionales y por departamento).")
+    parser.add_argument("--ipress", default=os.path.join(DATA_DIR, "IPRESS.xlsx"), help="archivo IPRESS")
+    parser.add_argument("--districts", default=os.path.join(DATA_DIR, "v_distritos_2023.shp"), help="shapefile de distritos")
+    parser.add_argument("--output", default=ATLAS_DIR, help="carpeta de salida")
+    parser.add_argument("--format", choices=["png", "svg"], default="png")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="número de procesos")
+    parser.add_argument("--force", action="store_true", help="volver a renderizar todo")
+    args = parser.parse_args(argv)
+
+    from estimation import load_and_filter_ipress, load_districts_shapefile, merge_hospitals_with_districts
+
+    gdf_hospitals = load_and_filter_ipress(args.ipress)
+    gdf_districts = load_districts_shapefile(args.districts)
+    if gdf_districts is None:
+        raise SystemExit(f"No se pudo cargar {args.districts}")
+    gdf_merged = merge_hospitals_with_districts(gdf_hospitals, gdf_districts)
+    export_atlas(gdf_hospitals, gdf_merged, args.output, fmt=args.format, dpi=args.dpi,
+                 max_workers=args.workers, force=args.force)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,565 @@
+"""
+Benchmarks de las etapas de estimación y de gráficos con datos sintéticos:
+genera tablas tipo IPRESS y capas de puntos tipo CCPP de distintos tamaños
+(por defecto 10 mil, 100 mil y 1 millón de filas) sobre los polígonos
+reales de distritos y mide el tiempo y la memoria pico de cada etapa.
+
+Los resultados se guardan como JSON en output/benchmarks y se comparan con
+la corrida anterior (o con --compare): las etapas que se vuelven más lentas
+o usan más memoria que el umbral se reportan como regresiones.
+
+Si no está el shapefile de distritos en data/, se usa una grilla sintética
+de distritos sobre la extensión del Perú.
+
+Uso (desde code/streamlit/src):
+    python benchmark.py
+    python benchmark.py --sizes 10000 100000 --stages ingest merge proximity_national
+    python benchmark.py --compare ../../../output/benchmarks/bench-20250101-120000.json
+"""
+import argparse
+import gc
+import glob
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from context import DATA_DIRS, DATA_FILES, find_data_file
+from instrumentation import PeakMemory, warn
+from projection import DEPARTMENT_UTM_ZONE, PERU_BBOX, PERU_UTM_ZONES, get_transformer, infer_utm_zone
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = os.path.normpath(os.path.join(SRC_DIR, "..", "..", "..", "output", "benchmarks"))
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+# Una etapa es regresión si tarda (o usa memoria) más de este factor
+# respecto a la corrida de referencia
+REGRESSION_THRESHOLD = 1.25
+
+# Diferencias menores que esto son ruido de medición
+MIN_SECONDS = 0.05
+MIN_MEMORY_MB = 16
+
+# Proporción de filas IPRESS sin coordenadas (vacías o en cero)
+INVALID_COORDS_FRACTION = 0.05
+
+# Grilla de distritos sintéticos (filas x columnas sobre PERU_BBOX)
+SYNTHETIC_GRID = (50, 40)
+
+LIBRARIES = ("numpy", "pandas", "geopandas", "shapely", "pyproj", "pyogrio",
+             "pyarrow", "scipy", "matplotlib", "plotly", "folium")
+
+# ---------------------------------------------------------------------------
+# Datos sintéticos
+# ---------------------------------------------------------------------------
+
+def synthetic_districts(shape=SYNTHETIC_GRID, bbox=PERU_BBOX):
+    """
+    Grilla rectangular de distritos sobre 'bbox' con las columnas del
+    shapefile de distritos (UBIGEO, DEPARTAMEN, PROVINCIA, DISTRITO). Cada
+    departamento ocupa una franja de latitud dentro de su zona UTM, de modo
+    que la reproyección por departamento de IPRESS es coherente.
+    """
+    import geopandas as gpd
+    import shapely
+
+    n_rows, n_cols = shape
+    lon_min, lat_min, lon_max, lat_max = bbox
+    lon_edges = np.linspace(lon_min, lon_max, n_cols + 1)
+    lat_edges = np.linspace(lat_min, lat_max, n_rows + 1)
+    col, row = np.meshgrid(np.arange(n_cols), np.arange(n_rows))
+    col, row = col.ravel(), row.ravel()
+    geometry = shapely.box(lon_edges[col], lat_edges[row], lon_edges[col + 1], lat_edges[row + 1])
+
+    # Zona UTM por longitud del centro (17: oeste de -78°, 19: este de -72°)
+    center_lon = (lon_edges[col] + lon_edges[col + 1]) / 2
+    zones = np.where(center_lon < -78, 17, np.where(center_lon < -72, 18, 19))
+    departments = np.empty(len(col), dtype=object)
+    for zone in (17, 18, 19):
+        names = sorted(d for d, z in DEPARTMENT_UTM_ZONE.items() if z == zone)
+        band = np.minimum(row * len(names) // n_rows, len(names) - 1)
+        departments[zones == zone] = np.asarray(names, dtype=object)[band[zones == zone]]
+
+    dept_codes = {d: i + 1 for i, d in enumerate(sorted(DEPARTMENT_UTM_ZONE))}
+    codes = np.array([dept_codes[d] for d in departments])
+    # Dentro de cada departamento: provincias de hasta 20 distritos
+    seq = pd.Series(np.arange(len(codes))).groupby(codes).cumcount().to_numpy()
+    prov = seq // 20 + 1
+    dist = seq % 20 + 1
+    ubigeo = [f"{c:02d}{p:02d}{d:02d}" for c, p, d in zip(codes, prov, dist)]
+    return gpd.GeoDataFrame({
+        "UBIGEO": ubigeo,
+        "DEPARTAMEN": departments,
+        "PROVINCIA": [f"PROVINCIA {c:02d}{p:02d}" for c, p in zip(codes, prov)],
+        "DISTRITO": [f"DISTRITO {u}" for u in ubigeo],
+    }, geometry=geometry, crs="EPSG:4326")
+
+def reference_districts(path=None, data_dirs=DATA_DIRS):
+    """
+    Distritos sobre los que se generan los puntos: el shapefile real si está
+    disponible y, si no, la grilla sintética.
+
+    Returns:
+        (GeoDataFrame en EPSG:4326, descripción del origen)
+    """
+    from estimation import load_districts_shapefile
+
+    try:
+        path = path or find_data_file(DATA_FILES["districts"], data_dirs)
+    except FileNotFoundError:
+        path = None
+    if path is not None:
+        gdf = load_districts_shapefile(path)
+        if gdf is not None and len(gdf) > 0:
+            return gdf, os.path.abspath(path)
+    warn("Shapefile de distritos no disponible: se usa una grilla sintética")
+    return synthetic_districts(), "synthetic"
+
+def _district_columns(gdf_districts):
+    """Columnas (ubigeo, departamento, provincia, distrito) de los distritos."""
+    from schema import resolve_schema
+
+    schema = resolve_schema(gdf_districts)
+    return tuple(schema.get(name) for name in ("ubigeo", "departamento", "provincia", "distrito"))
+
+def sample_points(gdf_districts, n, rng):
+    """
+    'n' puntos uniformes dentro de distritos elegidos al azar (proporcional
+    al área). Se sortea en el rectángulo de cada distrito y se descartan los
+    puntos que caen fuera del polígono hasta completarlos.
+
+    Returns:
+        (lon, lat, posición del distrito de cada punto)
+    """
+    import shapely
+
+    geoms = gdf_districts.geometry.to_numpy()
+    shapely.prepare(geoms)
+    bounds = shapely.bounds(geoms)
+    area = shapely.area(geoms)
+    district = rng.choice(len(geoms), size=n, p=area / area.sum())
+
+    lon = np.empty(n)
+    lat = np.empty(n)
+    pending = np.arange(n)
+    while len(pending):
+        b = bounds[district[pending]]
+        x = rng.uniform(b[:, 0], b[:, 2])
+        y = rng.uniform(b[:, 1], b[:, 3])
+        inside = shapely.contains_xy(geoms[district[pending]], x, y)
+        lon[pending[inside]] = x[inside]
+        lat[pending[inside]] = y[inside]
+        pending = pending[~inside]
+    return lon, lat, district
+
+def synthetic_ipress(gdf_districts, n, rng):
+    """
+    Tabla con las columnas de IPRESS (ver ingest.IPRESS_COLUMNS): ubicación
+    administrativa del distrito que contiene a cada establecimiento y
+    coordenadas NORTE/ESTE en la zona UTM de su departamento. Una fracción
+    INVALID_COORDS_FRACTION de filas queda sin coordenadas o en cero, como en
+    el registro real.
+    """
+    lon, lat, district = sample_points(gdf_districts, n, rng)
+    col_ubigeo, col_dept, col_prov, col_dist = _district_columns(gdf_districts)
+
+    def district_values(col, default=""):
+        if col is None:
+            return np.full(n, default, dtype=object)
+        return gdf_districts[col].astype(str).to_numpy(dtype=object)[district]
+
+    departments = district_values(col_dept, "LIMA")
+    zones = infer_utm_zone(departments)
+    este = np.empty(n)
+    norte = np.empty(n)
+    for zone in np.unique(zones):
+        mask = zones == zone
+        transformer = get_transformer("EPSG:4326", PERU_UTM_ZONES[zone])
+        este[mask], norte[mask] = transformer.transform(lon[mask], lat[mask])
+
+    invalid = rng.random(n) < INVALID_COORDS_FRACTION
+    este[invalid] = np.where(rng.random(int(invalid.sum())) < 0.5, np.nan, 0.0)
+    norte[invalid] = np.where(np.isnan(este[invalid]), np.nan, 0.0)
+
+    codigo = np.arange(1, n + 1)
+    categorias = np.array(["I-1", "I-2", "I-3", "I-4", "II-1", "II-2", "III-1", "SIN CATEGORÍA"], dtype=object)
+    return pd.DataFrame({
+        "Institución": rng.choice(np.array(["MINSA", "ESSALUD", "PRIVADO", "GOBIERNO REGIONAL"], dtype=object), n),
+        "Código Único": codigo,
+        "Nombre del establecimiento": [f"ESTABLECIMIENTO {c}" for c in codigo],
+        "Clasificación": rng.choice(np.array(["PUESTOS DE SALUD", "CENTROS DE SALUD", "HOSPITALES"], dtype=object), n),
+        "Categoria": rng.choice(categorias, n),
+        "Departamento": departments,
+        "Provincia": district_values(col_prov),
+        "Distrito": district_values(col_dist),
+        "UBIGEO": district_values(col_ubigeo),
+        "Estado": "ACTIVADO",
+        "Condición": "EN FUNCIONAMIENTO",
+        "NORTE": norte,
+        "ESTE": este,
+        "Zona UTM": [f"{z}S" for z in zones],
+    })
+
+def synthetic_ccpp(gdf_districts, n, rng):
+    """Capa de puntos con las columnas de CCPP_IGN100K (NOM_POBLAD, DEPARTAMEN) en EPSG:4326."""
+    import geopandas as gpd
+
+    lon, lat, district = sample_points(gdf_districts, n, rng)
+    col_dept = _district_columns(gdf_districts)[1]
+    departments = (gdf_districts[col_dept].astype(str).to_numpy(dtype=object)[district]
+                   if col_dept else np.full(n, "", dtype=object))
+    return gpd.GeoDataFrame({
+        "NOM_POBLAD": [f"CENTRO POBLADO {i}" for i in range(1, n + 1)],
+        "DEPARTAMEN": departments,
+    }, geometry=gpd.points_from_xy(lon, lat), crs="EPSG:4326")
+
+def write_datasets(workdir, gdf_districts, size, seed=0, ipress_format="parquet"):
+    """
+    Escribe IPRESS y CCPP sintéticos de 'size' filas (y los distritos) en
+    'workdir', en los formatos que lee el dashboard. Excel no admite más de
+    ~1 millón de filas, por eso IPRESS se escribe en Parquet o CSV.
+
+    Returns:
+        dict {hospitals, districts, ccpp: ruta}
+    """
+    os.makedirs(workdir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = {
+        "hospitals": os.path.join(workdir, f"IPRESS-{size}.{ipress_format}"),
+        "districts": os.path.join(workdir, "distritos.shp"),
+        "ccpp": os.path.join(workdir, f"CCPP-{size}.shp"),
+    }
+    if not os.path.exists(paths["districts"]):
+        gdf_districts.to_file(paths["districts"], engine="pyogrio")
+
+    df = synthetic_ipress(gdf_districts, size, rng)
+    if ipress_format == "csv":
+        df.to_csv(paths["hospitals"], index=False)
+    else:
+        df.to_parquet(paths["hospitals"], index=False)
+    synthetic_ccpp(gdf_districts, size, rng).to_file(paths["ccpp"], engine="pyogrio")
+    return paths
+
+# ---------------------------------------------------------------------------
+# Etapas
+# ---------------------------------------------------------------------------
+
+# Cada etapa recibe el estado (rutas y resultados de etapas anteriores) y
+# devuelve (filas de entrada, filas de salida, valores a agregar al estado).
+# Las lecturas se hacen sin caché para medir el costo en frío.
+
+def _stage_ingest(state):
+    from estimation import load_and_filter_ipress
+    gdf = load_and_filter_ipress(state["paths"]["hospitals"], use_cache=False)
+    return state["size"], len(gdf), {"hospitals": gdf}
+
+def _stage_districts(state):
+    from estimation import load_districts_shapefile
+    gdf = load_districts_shapefile(state["paths"]["districts"], use_cache=False)
+    return len(gdf), len(gdf), {"districts": gdf}
+
+def _stage_merge(state):
+    from estimation import merge_hospitals_with_districts
+    gdf = merge_hospitals_with_districts(state["hospitals"], state["districts"])
+    return len(state["hospitals"]), len(gdf), {"merged": gdf}
+
+def _stage_ccpp(state):
+    from estimation import load_ccpp_shapefile
+    gdf = load_ccpp_shapefile(state["paths"]["ccpp"], use_cache=False)
+    return state["size"], len(gdf), {"ccpp": gdf}
+
+def _stage_proximity_national(state):
+    from proximity import analyze_proximity_national
+    resultado = analyze_proximity_national(state["ccpp"], state["hospitals"])
+    return len(state["ccpp"]), len(resultado), {}
+
+def _stage_proximity_departments(state):
+    from proximity import analyze_proximity_all_departments
+    resultado = analyze_proximity_all_departments(state["ccpp"], state["hospitals"], use_cache=False)
+    return len(state["ccpp"]), len(resultado), {}
+
+def _stage_proximity_sweep(state):
+    from pipeline import RADII
+    from proximity import analyze_proximity_sweep
+    resultado, _ = analyze_proximity_sweep(state["ccpp"], state["hospitals"], radii=RADII)
+    return len(state["ccpp"]), len(resultado), {}
+
+def _save_figure(fig):
+    """Renderiza una figura de matplotlib a PNG en memoria y la cierra."""
+    import matplotlib.pyplot as plt
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=100, bbox_inches="tight")
+    plt.close(fig)
+    return buf.tell()
+
+def _stage_plot_choropleth(state):
+    from plots import create_static_choropleth_map
+    _save_figure(create_static_choropleth_map(state["merged"]))
+    return len(state["merged"]), 1, {}
+
+def _stage_plot_department(state):
+    from plots import create_department_static_map
+    department = state["department"]
+    fig = create_department_static_map(state["districts"], state["hospitals"], department)
+    if fig is not None:
+        _save_figure(fig)
+    return len(state["hospitals"]), int(fig is not None), {}
+
+def _stage_plot_hospital_map(state):
+    from plots import create_hospital_map
+    # Serializar la figura es lo que hace Streamlit antes de enviarla
+    fig = create_hospital_map(state["hospitals"], state["districts"], zoom=5)
+    return len(state["hospitals"]), len(fig.to_json()), {}
+
+def _stage_plot_national_map(state):
+    from plots import create_national_hospital_map
+    html = create_national_hospital_map(state["hospitals"]).get_root().render()
+    return len(state["hospitals"]), len(html), {}
+
+# Etapas en orden de ejecución: nombre -> (etapas de las que depende, función)
+STAGES = {
+    "ingest": ((), _stage_ingest),
+    "districts": ((), _stage_districts),
+    "merge": (("ingest", "districts"), _stage_merge),
+    "ccpp": ((), _stage_ccpp),
+    "proximity_national": (("ingest", "ccpp"), _stage_proximity_national),
+    "proximity_departments": (("ingest", "ccpp"), _stage_proximity_departments),
+    "proximity_sweep": (("ingest", "ccpp"), _stage_proximity_sweep),
+    "plot_choropleth": (("merge",), _stage_plot_choropleth),
+    "plot_department": (("ingest", "districts"), _stage_plot_department),
+    "plot_hospital_map": (("ingest", "districts"), _stage_plot_hospital_map),
+    "plot_national_map": (("ingest",), _stage_plot_national_map),
+}
+
+def _with_dependencies(names):
+    """Etapas pedidas más las que necesitan, en el orden de STAGES."""
+    wanted = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in STAGES:
+            raise KeyError(f"Etapa desconocida: {name} (disponibles: {', '.join(STAGES)})")
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(STAGES[name][0])
+    return [name for name in STAGES if name in wanted]
+
+def _busiest_department(gdf_hospitals):
+    """Departamento con más hospitales (el mapa departamental más pesado)."""
+    from schema import get_schema
+
+    col_dept = get_schema(gdf_hospitals).get("departamento")
+    if not col_dept or len(gdf_hospitals) == 0:
+        return "LIMA"
+    return str(gdf_hospitals[col_dept].value_counts().index[0])
+
+def run_stage(name, state, repeat=1):
+    """
+    Ejecuta la etapa 'name' 'repeat' veces y mide cada corrida.
+
+    Returns:
+        dict con stage, rows_in, rows_out, seconds (la mejor corrida), times,
+        peak_mb y delta_mb (la mayor de las corridas)
+    """
+    func = STAGES[name][1]
+    times = []
+    peak_mb = delta_mb = 0.0
+    for _ in range(repeat):
+        gc.collect()
+        with PeakMemory() as mem:
+            start = time.perf_counter()
+            rows_in, rows_out, produced = func(state)
+            times.append(time.perf_counter() - start)
+        peak_mb = max(peak_mb, mem.peak_mb or 0.0)
+        delta_mb = max(delta_mb, mem.delta_mb or 0.0)
+    state.update(produced)
+    return {
+        "stage": name,
+        "rows_in": int(rows_in),
+        "rows_out": int(rows_out),
+        "seconds": min(times),
+        "times": times,
+        "peak_mb": round(peak_mb, 1),
+        "delta_mb": round(delta_mb, 1),
+    }
+
+def run_benchmarks(sizes=DEFAULT_SIZES, stages=None, repeat=1, workdir=None,
+                   districts_path=None, seed=0, ipress_format="parquet"):
+    """
+    Genera los datos de cada tamaño y mide las etapas pedidas (todas por
+    defecto, más sus dependencias).
+
+    Returns:
+        dict con created, environment, config y results (una entrada por
+        tamaño y etapa)
+    """
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    names = _with_dependencies(stages or list(STAGES))
+    gdf_districts, districts_source = reference_districts(districts_path)
+
+    tmp = None
+    if workdir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="hospitals-bench-")
+        workdir = tmp.name
+
+    results = []
+    try:
+        for size in sizes:
+            start = time.time()
+            paths = write_datasets(workdir, gdf_districts, size, seed=seed, ipress_format=ipress_format)
+            print(f"Datos sintéticos de {size} filas generados en {time.time() - start:.1f} s")
+
+            state = {"size": size, "paths": paths}
+            for name in names:
+                if name == "plot_department" and "department" not in state:
+                    state["department"] = _busiest_department(state["hospitals"])
+                result = run_stage(name, state, repeat=repeat)
+                result["size"] = size
+                results.append(result)
+                print(f"  {size:>9} {name:<22} {result['seconds']:8.2f} s  "
+                      f"pico {result['peak_mb']:7.0f} MB (+{result['delta_mb']:.0f})")
+            del state
+            gc.collect()
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "config": {
+            "sizes": list(sizes),
+            "stages": names,
+            "repeat": repeat,
+            "seed": seed,
+            "ipress_format": ipress_format,
+            "districts": districts_source,
+            "n_districts": len(gdf_districts),
+        },
+        "results": results,
+    }
+
+def environment():
+    """Versiones de Python y de las librerías, y datos de la máquina."""
+    from importlib import metadata
+
+    versions = {}
+    for library in LIBRARIES:
+        try:
+            versions[library] = metadata.version(library)
+        except metadata.PackageNotFoundError:
+            versions[library] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "libraries": versions,
+    }
+
+# ---------------------------------------------------------------------------
+# Resultados
+# ---------------------------------------------------------------------------
+
+def save_results(report, output_dir=BENCHMARK_DIR):
+    """Guarda el reporte como bench-<fecha>.json en 'output_dir' y devuelve la ruta."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+def latest_results(output_dir=BENCHMARK_DIR, exclude=None):
+    """Ruta del reporte más reciente en 'output_dir' (None si no hay)."""
+    paths = sorted(glob.glob(os.path.join(output_dir, "bench-*.json")))
+    paths = [p for p in paths if exclude is None or os.path.abspath(p) != os.path.abspath(exclude)]
+    return paths[-1] if paths else None
+
+def compare_results(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compara dos reportes etapa por etapa (mismo tamaño y etapa).
+
+    Returns:
+        lista de dicts con size, stage, metric ('seconds' o 'peak_mb'),
+        before, after y ratio para las etapas que superan 'threshold'
+    """
+    before = {(r["size"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        previous = before.get((result["size"], result["stage"]))
+        if previous is None:
+            continue
+        for metric, noise in (("seconds", MIN_SECONDS), ("peak_mb", MIN_MEMORY_MB)):
+            old, new = previous[metric], result[metric]
+            if new - old <= noise or old <= 0:
+                continue
+            ratio = new / old
+            if ratio > threshold:
+                regressions.append({
+                    "size": result["size"], "stage": result["stage"], "metric": metric,
+                    "before": old, "after": new, "ratio": ratio,
+                })
+    return regressions
+
+def print_comparison(regressions, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Imprime las regresiones respecto al reporte 'baseline_path'."""
+    print(f"Comparación con {baseline_path} (umbral x{threshold:.2f}):")
+    if not regressions:
+        print("  Sin regresiones")
+        return
+    for r in regressions:
+        unit = "s" if r["metric"] == "seconds" else "MB"
+        print(f"  REGRESIÓN {r['size']:>9} {r['stage']:<22} {r['metric']:<8} "
+              f"{r['before']:.2f} {unit} -> {r['after']:.2f} {unit} (x{r['ratio']:.2f})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de estimación y gráficos con datos sintéticos.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="filas de IPRESS y CCPP sintéticos")
+    parser.add_argument("--stages", nargs="+", help="etapas a medir (con sus dependencias)")
+    parser.add_argument("--repeat", type=int, default=1, help="corridas por etapa (se guarda la mejor)")
+    parser.add_argument("--districts", help="shapefile de distritos (por defecto data/v_distritos_2023.shp)")
+    parser.add_argument("--format", choices=("parquet", "csv"), default="parquet",
+                        help="formato del IPRESS sintético")
+    parser.add_argument("--seed", type=int, default=0, help="semilla de los datos sintéticos")
+    parser.add_argument("--workdir", help="carpeta para los datos sintéticos (por defecto una temporal)")
+    parser.add_argument("--output", default=BENCHMARK_DIR, help="carpeta de resultados")
+    parser.add_argument("--compare", help="reporte de referencia (por defecto el más reciente)")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="factor a partir del cual una etapa es regresión")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="terminar con código 1 si hay regresiones")
+    parser.add_argument("--list", action="store_true", help="mostrar las etapas disponibles")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (deps, _) in STAGES.items():
+            print(f"{name:<22} depende de: {', '.join(deps) or '-'}")
+        return 0
+
+    report = run_benchmarks(args.sizes, stages=args.stages, repeat=args.repeat, workdir=args.workdir,
+                            districts_path=args.districts, seed=args.seed, ipress_format=args.format)
+    path = save_results(report, args.output)
+    print(f"Resultados guardados en {path}")
+
+    baseline_path = args.compare or latest_results(args.output, exclude=path)
+    if baseline_path is None:
+        return 0
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_results(report, baseline, args.threshold)
+    print_comparison(regressions, baseline_path, args.threshold)
+    return 1 if regressions and args.fail_on_regression else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from instrumentation import warn
+
+# Versión del formato de caché. Incrementar cuando cambie la limpieza de datos
+# para invalidar automáticamente los archivos generados con la lógica anterior.
+CACHE_VERSION = 2
+
+# Hashes ya calculados: ruta -> ((tamaño, mtime), hash). Un archivo solo se
+# vuelve a leer completo si cambia su tamaño o su fecha de modificación.
+_file_hashes = OrderedDict()
+_MAX_FILE_HASHES = 64
+_file_hashes_lock = threading.Lock()
+
+def file_hash(filepath, chunk_size=1 << 20):
+    """
+    Calcula el hash SHA-256 del contenido de un archivo (lectura por bloques).
+    Se recuerda por (ruta, tamaño, mtime): las llamadas siguientes sobre el
+    mismo archivo sin modificar no lo vuelven a leer.
+    """
+    path = os.path.abspath(filepath)
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _file_hashes_lock:
+        entry = _file_hashes.get(path)
+        if entry is not None and entry[0] == stamp:
+            _file_hashes.move_to_end(path)
+            return entry[1]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _file_hashes_lock:
+        _file_hashes[path] = (stamp, digest)
+        _file_hashes.move_to_end(path)
+        if len(_file_hashes) > _MAX_FILE_HASHES:
+            _file_hashes.popitem(last=False)
+    return digest
+
+def array_hash(*arrays):
+    """Hash SHA-256 del contenido binario de uno o varios arrays de numpy."""
+    h = hashlib.sha256()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        h.update(str((arr.dtype.str, arr.shape)).encode("utf-8"))
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+def cache_key(source_hash, settings):
+    """
+    Construye la clave de caché a partir del hash del archivo fuente y de los
+    parámetros de filtrado. Cualquier cambio en alguno de ellos genera otra clave.
+    """
+    payload = json.dumps(
+        {"source": source_hash, "settings": settings, "version": CACHE_VERSION},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def default_cache_dir(filepath):
+    """Carpeta de caché por defecto: '.cache' junto al archivo fuente."""
+    return os.path.join(os.path.dirname(os.path.abspath(filepath)), ".cache")
+
+def cache_path(cache_dir, prefix, key):
+    """Ruta del archivo GeoParquet correspondiente a una clave."""
+    return os.path.join(cache_dir, f"{prefix}-{key}.parquet")
+
+def read_cached_gdf(path):
+    """
+    Lee un GeoDataFrame desde la caché columnar.
+    Retorna None si no existe o si no se puede leer (p. ej. falta pyarrow).
+    """
+    if not os.path.exists(path):
+        return None
+    import geopandas as gpd
+    
+    try:
+        return gpd.read_parquet(path)
+    except Exception as e:
+        warn(f"No se pudo leer la caché {path}: {e}")
+        return None
+
+def write_cached_gdf(gdf, path, **kwargs):
+    """
+    Guarda un GeoDataFrame en formato GeoParquet ('kwargs' se pasan a
+    to_parquet, p. ej. row_group_size).
+    La escritura es atómica (archivo temporal + rename) para que una sesión
+    concurrente nunca lea un archivo a medio escribir.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        gdf.to_parquet(tmp_path, **kwargs)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        warn(f"No se pudo escribir la caché {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+def prune_cache(cache_dir, prefix, keep, recent=0):
+    """
+    Elimina archivos de caché antiguos con el mismo prefijo (excepto 'keep'
+    y, si 'recent' > 0, los 'recent' usados más recientemente según su fecha
+    de modificación; quien los lee puede renovarla con os.utime).
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    paths = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+             if name.startswith(f"{prefix}-") and name.endswith(".parquet")]
+    paths = [p for p in paths if p != keep]
+    if recent:
+        paths.sort(key=os.path.getmtime, reverse=True)
+        paths = paths[recent:]
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def read_cached_array(path):
+    """Lee un array de numpy (.npy) desde la caché; None si no existe o falla."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return np.load(path, allow_pickle=False)
+    except Exception as e:
+        warn(f"No se pudo leer la caché {path}: {e}")
+        return None
+
+def write_cached_array(arr, path):
+    """Guarda un array de numpy (.npy) con escritura atómica."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    try:
+        np.save(tmp_path, arr, allow_pickle=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        warn(f"No se pudo escribir la caché {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+def read_cached_bytes(path):
+    """Lee un archivo binario (p. ej. una imagen renderizada); None si no existe."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        warn(f"No se pudo leer la caché {path}: {e}")
+        return None
+
+def write_cached_bytes(data, path):
+    """Guarda bytes con escritura atómica."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        warn(f"No se pudo escribir la caché {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
@@ -0,0 +1,265 @@
+"""
+Capa de datos compartida del dashboard: cada conjunto de datos se carga una
+sola vez por proceso y los productos derivados se calculan la primera vez
+que una pestaña los pide.
+
+Los objetos se comparten entre reruns y sesiones (st.cache_resource), así
+que son de solo lectura: quien necesite modificarlos debe trabajar sobre
+una copia.
+"""
+import os
+import threading
+
+from instrumentation import stage, warn
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Carpetas donde se busca cada archivo, en orden (relativas al directorio de
+# trabajo, como en el dashboard, y a este módulo)
+DATA_DIRS = ("../data", "data", os.path.normpath(os.path.join(SRC_DIR, "..", "data")))
+
+DATA_FILES = {
+    "hospitals": "IPRESS.xlsx",
+    "districts": "v_distritos_2023.shp",
+    "ccpp": "CCPP_IGN100K.shp",
+}
+
+# Con esta variable en 1 el dashboard no calcula lo que pipeline.py debería
+# haber precalculado: si falta un artefacto, el producto falla con un aviso
+REQUIRE_ARTIFACTS_ENV = "HOSPITALS_REQUIRE_ARTIFACTS"
+
+class ProductError(RuntimeError):
+    """Un producto no se pudo calcular (p. ej. un shapefile que no se pudo leer)."""
+
+def find_data_file(filename, data_dirs=DATA_DIRS):
+    """Ruta del primer 'filename' existente en 'data_dirs' (FileNotFoundError si no hay)."""
+    for data_dir in data_dirs:
+        path = os.path.join(data_dir, filename)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No se encontró {filename}")
+
+# Cada producto se lee de los artefactos de pipeline.py si están al día con
+# los datos; si no, se calcula aquí.
+
+def _load_hospitals(context):
+    gdf = context.artifact("hospitals")
+    if gdf is not None:
+        return gdf
+    from estimation import load_and_filter_ipress
+    return load_and_filter_ipress(context.data_file("hospitals"))
+
+def _load_districts(context):
+    gdf = context.artifact("districts")
+    if gdf is not None:
+        return gdf
+    from estimation import load_districts_shapefile
+    return load_districts_shapefile(context.data_file("districts"))
+
+def _load_ccpp(context, gdf_districts):
+    gdf = context.artifact("ccpp")
+    if gdf is not None:
+        return gdf
+    from estimation import assign_ccpp_districts, load_ccpp_shapefile
+    gdf = load_ccpp_shapefile(context.data_file("ccpp"))
+    # Distrito (y departamento, si falta) de cada centro poblado
+    return None if gdf is None else assign_ccpp_districts(gdf, gdf_districts)
+
+def _merge(context, gdf_hospitals, gdf_districts):
+    gdf = context.artifact("merged")
+    if gdf is not None:
+        return gdf
+    from estimation import merge_hospitals_with_districts
+    return merge_hospitals_with_districts(gdf_hospitals, gdf_districts)
+
+def _proximity(context, gdf_ccpp, gdf_hospitals, buffer_distance):
+    from pipeline import proximity_stage
+    resultado = context.artifact(proximity_stage(buffer_distance))
+    if resultado is not None:
+        return resultado
+    from proximity import analyze_proximity_all_departments
+    # Sin pool de procesos dentro del servidor de Streamlit (fork con hilos);
+    # query_ball_point ya usa todos los núcleos
+    return analyze_proximity_all_departments(gdf_ccpp, gdf_hospitals, buffer_distance=buffer_distance,
+                                             max_workers=1)
+
+def _coverage(context, gdf_ccpp, gdf_hospitals):
+    coverage = context.artifact("coverage")
+    if coverage is not None:
+        return coverage
+    from pipeline import RADII
+    from proximity import analyze_proximity_sweep
+    return analyze_proximity_sweep(gdf_ccpp, gdf_hospitals, radii=RADII)[1]
+
+def _nearest(context, gdf_ccpp, gdf_hospitals):
+    nearest = context.artifact("nearest")
+    if nearest is not None:
+        return nearest
+    from proximity import nearest_hospital_table
+    return nearest_hospital_table(gdf_ccpp, gdf_hospitals)
+
+def _maps(context):
+    """Mapas HTML pre-generados {nombre: ruta} ({} si no hay)."""
+    return context.artifact("maps", required=False) or {}
+
+def _atlas_key(context, gdf_hospitals, gdf_merged):
+    from atlas import atlas_key
+    return atlas_key(gdf_hospitals, gdf_merged)
+
+def _hex_counts(context, gdf_hospitals, gdf_ccpp):
+    """Conteos de hospitales y centros poblados por celda en la resolución más fina."""
+    from hexgrid import MAX_RESOLUTION, cell_counts, points_to_cells
+    return (cell_counts(points_to_cells(gdf_hospitals, MAX_RESOLUTION)),
+            cell_counts(points_to_cells(gdf_ccpp, MAX_RESOLUTION)))
+
+def _hex_density(context, hex_counts, resolution):
+    from hexgrid import density_from_counts
+    return density_from_counts(*hex_counts, resolution)
+
+# Productos: nombre -> (dependencias, función que lo calcula). La función
+# recibe el contexto, los productos de los que depende (en orden) y los
+# parámetros con que se pidió el producto.
+PRODUCTS = {
+    "hospitals": ((), _load_hospitals),
+    "districts": ((), _load_districts),
+    "ccpp": (("districts",), _load_ccpp),
+    "merged": (("hospitals", "districts"), _merge),
+    "proximity": (("ccpp", "hospitals"), _proximity),
+    "coverage": (("ccpp", "hospitals"), _coverage),
+    "nearest": (("ccpp", "hospitals"), _nearest),
+    "maps": ((), _maps),
+    "atlas_key": (("hospitals", "merged"), _atlas_key),
+    "hex_counts": (("hospitals", "ccpp"), _hex_counts),
+    "hex_density": (("hex_counts",), _hex_density),
+}
+
+class DataContext:
+    """
+    Productos de datos calculados bajo demanda y compartidos entre hilos.
+
+    Cada producto se calcula una sola vez por combinación de parámetros
+    (p. ej. 'proximity' por radio); si dos sesiones lo piden a la vez, la
+    segunda espera el resultado de la primera.
+    """
+
+    def __init__(self, data_dirs=DATA_DIRS, products=PRODUCTS, artifacts_dir=None, require_artifacts=None):
+        self.data_dirs = tuple(data_dirs)
+        self.products = dict(products)
+        self.artifacts_dir = artifacts_dir
+        if require_artifacts is None:
+            require_artifacts = os.environ.get(REQUIRE_ARTIFACTS_ENV, "") == "1"
+        self.require_artifacts = require_artifacts
+        # Artefactos de pipeline.py que faltaban y se calcularon aquí
+        self.fallbacks = set()
+        self._values = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._artifacts_lock = threading.Lock()
+        self._artifact_state = None
+
+    def data_file(self, name):
+        """Ruta del archivo de datos del producto 'name' (ver DATA_FILES)."""
+        return find_data_file(DATA_FILES[name], self.data_dirs)
+
+    def artifact(self, name, required=True):
+        """
+        Artefacto 'name' de pipeline.py, o None si no se generó o si los
+        archivos de data/ cambiaron desde entonces. El manifest y las claves
+        de los datos actuales se calculan una sola vez.
+
+        Si falta un artefacto 'required', el producto se calcula en el
+        dashboard: queda en self.fallbacks con una advertencia, o se lanza
+        ProductError si el contexto exige artefactos (REQUIRE_ARTIFACTS_ENV).
+        """
+        value = self._read_artifact(name)
+        if value is None and required:
+            if self.require_artifacts:
+                raise ProductError(f"Falta el artefacto '{name}' o está desactualizado: "
+                                   "ejecuta python pipeline.py")
+            warn(f"Sin artefacto '{name}' al día: se calcula en el dashboard (ejecuta python pipeline.py)")
+            with self._lock:
+                self.fallbacks.add(name)
+        return value
+
+    def _read_artifact(self, name):
+        import pipeline
+
+        with self._artifacts_lock:
+            if self._artifact_state is None:
+                output_dir = self.artifacts_dir or pipeline.PIPELINE_DIR
+                manifest = pipeline.load_manifest(output_dir)
+                keys = None
+                if manifest is not None:
+                    stages = pipeline.build_stages(manifest.get("radii", pipeline.RADII))
+                    keys = pipeline.stage_keys(stages, pipeline.find_sources(data_dirs=self.data_dirs))
+                self._artifact_state = (output_dir, manifest, keys)
+            output_dir, manifest, keys = self._artifact_state
+        if manifest is None:
+            return None
+        return pipeline.load_artifact(name, output_dir, manifest=manifest, keys=keys)
+
+    def _key(self, name, params):
+        return (name, tuple(sorted(params.items())))
+
+    def get(self, name, **params):
+        """
+        Valor del producto 'name' con los parámetros dados, calculándolo
+        (junto con sus dependencias) si todavía no existe.
+
+        Si la función del producto devuelve None (los cargadores de
+        estimation.py lo hacen cuando falla la lectura) se lanza ProductError
+        y no se guarda nada: la próxima llamada lo vuelve a intentar.
+        """
+        deps, builder = self.products[name]
+        key = self._key(name, params)
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Las dependencias se resuelven fuera del lock del producto (el grafo
+        # no tiene ciclos, así que no hay esperas cruzadas)
+        values = [self.get(dep) for dep in deps]
+        with key_lock:
+            with self._lock:
+                if key in self._values:
+                    return self._values[key]
+            with stage(f"context.{name}") as s:
+                for param, param_value in params.items():
+                    s.note(param, param_value)
+                value = builder(self, *values, **params)
+                if value is None:
+                    s.fail("el producto no se pudo calcular")
+            if value is None:
+                raise ProductError(f"No se pudo calcular '{name}' (el detalle está en la terminal); "
+                                   "se volverá a intentar en la próxima ejecución")
+            with self._lock:
+                self._values[key] = value
+        return value
+
+    def is_loaded(self, name):
+        """True si el producto ya se calculó (con cualquier parámetro)."""
+        with self._lock:
+            return any(key[0] == name for key in self._values)
+
+    def dependents(self, name):
+        """Productos que dependen de 'name', directa o indirectamente."""
+        found = set()
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            for product, (deps, _) in self.products.items():
+                if current in deps and product not in found:
+                    found.add(product)
+                    pending.append(product)
+        return found
+
+    def invalidate(self, name):
+        """Descarta el producto 'name' y todos los que dependen de él."""
+        names = {name} | self.dependents(name)
+        with self._lock:
+            for key in [key for key in self._values if key[0] in names]:
+                del self._values[key]
+        # El manifest y las claves de los datos se vuelven a leer
+        with self._artifacts_lock:
+            self._artifact_state = None
@@ -1,72 +1,295 @@
+import os
+
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 
-def _col(df, name):
-    """Devuelve el nombre real de una columna (case-insensible y con espacios)."""
-    key = name.strip().lower()
-    for c in df.columns:
-        if c.strip().lower() == key:
-            return c
-    raise KeyError(f"No se encontró la columna '{name}' en el archivo. Columnas disponibles: {list(df.columns)}")
+from cache import (
+    file_hash, cache_key, default_cache_dir, cache_path,
+    read_cached_gdf, write_cached_gdf, prune_cache,
+)
+from ingest import IPRESS_COLUMNS, DEFAULT_CHUNKSIZE, iter_ipress_chunks
+from instrumentation import current_stage, instrumented
+from projection import DEFAULT_UTM_ZONE, PERU_UTM_ZONES, infer_utm_zone, parse_utm_zone, utm_to_crs
+from spatial import assign_districts, district_fingerprint
+from vector import read_vector
+from schema import Schema, attach_schema, get_schema, normalize_values, resolve_schema
 
-def load_and_filter_ipress(filepath):
+@instrumented("ipress.load")
+def load_and_filter_ipress(filepath, use_cache=True, cache_dir=None,
+                           utm_zone="auto", dst_crs="EPSG:4326",
+                           columns=IPRESS_COLUMNS, chunksize=DEFAULT_CHUNKSIZE,
+                           aliases=None, gdf_districts=None):
     """
-    Carga IPRESS desde Excel y filtra:
+    Carga IPRESS (Excel, CSV o Parquet) y filtra:
     - Solo registros con NORTE y ESTE válidos (no vacíos, no cero)
     - Estado == ACTIVO (opcional, comentado por ahora)
-    Convierte UTM 18S -> WGS84.
+    Convierte UTM (17S, 18S o 19S) -> WGS84.
+
+    'utm_zone' indica la zona de origen: un entero (misma zona para todas las
+    filas), el nombre de una columna con la zona por fila, "auto" (usa la
+    columna de zona si existe y, si no, 18S como el notebook original) o
+    "department" (opcional: infiere la zona de las filas sin zona a partir
+    del departamento). Con "department" y 'gdf_districts', cada fila se queda
+    con la primera zona candidata cuyo punto cae en su departamento (según
+    el UBIGEO o el nombre); sin polígonos se usa la zona predominante del
+    departamento, sin verificar.
+
+    La lectura es por bloques de 'chunksize' filas y solo parsea 'columns'
+    (None = todas). Cada bloque se filtra antes de acumularse, de modo que la
+    memoria pico depende del tamaño del bloque y no del registro completo.
+    'filepath' puede ser una lista (registro nacional + snapshots históricos).
+
+    Las columnas se resuelven una sola vez (ver schema.py; 'aliases' permite
+    nombres de otras versiones de IPRESS) y el esquema queda adjunto al
+    GeoDataFrame resultante en gdf.attrs['schema'].
+
+    Los conteos y diagnósticos de la carga quedan en el registro de la etapa
+    'ipress.load' (ver instrumentation.py).
+
+    El resultado limpio y reproyectado se guarda en una caché GeoParquet
+    (por defecto en '.cache/' junto al archivo). La clave combina el hash del
+    contenido del archivo y los parámetros de filtrado, por lo que la caché se
+    invalida sola cuando cambia cualquiera de los dos. En un arranque en
+    caliente no se vuelve a leer el Excel ni a reproyectar.
     """
-    # Leer archivo Excel (primer sheet por defecto)
-    df = pd.read_excel(filepath, sheet_name=0)
-    
-    print(f"Datos cargados: {len(df)} registros, {len(df.columns)} columnas")
-    print(f"Primeras columnas: {df.columns[:5].tolist()}")
+    if not use_cache:
+        return _load_and_filter_ipress(filepath, utm_zone, dst_crs, columns, chunksize, aliases,
+                                       gdf_districts)
 
-    try:
-        col_norte  = _col(df, "NORTE")
-        col_este   = _col(df, "ESTE")
-        col_dept   = _col(df, "Departamento")
-        col_prov   = _col(df, "Provincia")
-        col_dist   = _col(df, "Distrito")
-    except KeyError as e:
-        print(f"Error: {e}")
-        raise
-
-    # Convertir coordenadas a numérico
-    df[col_norte] = pd.to_numeric(df[col_norte], errors="coerce")
-    df[col_este]  = pd.to_numeric(df[col_este],  errors="coerce")
-
-    # Contar registros con coordenadas antes del filtro
-    total_con_coords = df[[col_norte, col_este]].notna().all(axis=1).sum()
-    print(f"Registros con NORTE y ESTE no vacíos: {total_con_coords}")
-
-    # Filtrar coordenadas válidas (no nulas y diferentes de 0)
-    df_valid = df.dropna(subset=[col_norte, col_este])
-    df_valid = df_valid[(df_valid[col_norte] != 0) & (df_valid[col_este] != 0)].copy()
-    
-    print(f"Registros con coordenadas válidas (no vacías y != 0): {len(df_valid)}")
+    paths = [filepath] if isinstance(filepath, (str, os.PathLike)) else list(filepath)
+    settings = {
+        "utm_zone": utm_zone,
+        "dst_crs": dst_crs,
+        "columns": None if columns is None else sorted(columns),
+        "aliases": aliases,
+    }
+    if utm_zone == "department" and gdf_districts is not None:
+        settings["districts"] = district_fingerprint(gdf_districts)
+    cache_dir = cache_dir or default_cache_dir(paths[0])
+    key = cache_key([file_hash(p) for p in paths], settings)
+    path = cache_path(cache_dir, "ipress", key)
+
+    gdf = read_cached_gdf(path)
+    if gdf is not None:
+        current_stage().note("cache", path)
+        attach_schema(gdf, resolve_schema(gdf, aliases))
+        return gdf
+
+    gdf = _load_and_filter_ipress(paths, utm_zone, dst_crs, columns, chunksize, aliases, gdf_districts)
+    if len(gdf) > 0 and write_cached_gdf(gdf, path):
+        prune_cache(cache_dir, "ipress", keep=path)
+    return gdf
+
+def _filter_valid_coords(df, schema):
+    """Filtra un bloque: coordenadas no nulas y diferentes de 0."""
+    col_norte = schema["norte"]
+    col_este  = schema["este"]
+    df = df.dropna(subset=[col_norte, col_este])
+    return df[(df[col_norte] != 0) & (df[col_este] != 0)]
+
+def _resolve_utm_zones(df, utm_zone, schema, gdf_districts=None):
+    """Zona UTM de origen para cada fila según el parámetro 'utm_zone'."""
+    if isinstance(utm_zone, (int, np.integer)):
+        return np.full(len(df), utm_zone, dtype=np.int8)
+
+    if utm_zone in ("auto", "department"):
+        col_zone = schema.get("zona")
+    else:
+        col_zone = utm_zone
+    explicit = parse_utm_zone(df[col_zone]) if col_zone else np.full(len(df), np.nan)
+    missing = np.isnan(explicit)
+    zones = np.where(missing, DEFAULT_UTM_ZONE, explicit).astype(np.int8)
+
+    if utm_zone == "department" and missing.any():
+        inferred = infer_utm_zone(df[schema["departamento"]].astype(object))
+        if gdf_districts is None:
+            current_stage().warn("Zona UTM inferida por departamento sin polígonos para verificarla")
+            zones[missing] = inferred[missing]
+        else:
+            zones[missing] = _verified_utm_zones(df[missing], schema, inferred[missing], gdf_districts)
+    return zones
+
+def _verified_utm_zones(df, schema, inferred, gdf_districts):
+    """
+    Zona UTM de cada fila comprobada contra los polígonos de distritos.
+
+    Se prueba primero la zona predominante del departamento y luego las
+    demás; cada fila se queda con la primera cuyo punto cae en un distrito de
+    su departamento (según su UBIGEO o, si no lo tiene, el nombre). Las filas
+    que no caen en ninguno conservan la zona predominante.
+    """
+    s = current_stage()
+    este = df[schema["este"]].to_numpy(dtype=float)
+    norte = df[schema["norte"]].to_numpy(dtype=float)
+    own = ubigeo_key(df[schema["ubigeo"]]) if "ubigeo" in schema else np.full(len(df), -1, dtype=np.int32)
+    dept = normalize_values(df[schema["departamento"]].astype(object).fillna("")).to_numpy()
+
+    district_keys = _district_keys(gdf_districts)
+    col_dept = get_schema(gdf_districts).get("departamento")
+    if district_keys is None or col_dept is None:
+        s.warn("Distritos sin UBIGEO o departamento: no se verifica la zona UTM")
+        return inferred
+    dept_of = pd.Series(normalize_values(gdf_districts[col_dept].astype(object).fillna("")).to_numpy(),
+                        index=district_keys)
+    dept_of = dept_of[~dept_of.index.duplicated()]
+
+    zones = inferred.copy()
+    verified = np.zeros(len(df), dtype=bool)
+    candidates = [inferred] + [np.full(len(df), zone, dtype=np.int8) for zone in PERU_UTM_ZONES]
+    for rank, candidate in enumerate(candidates):
+        rows = np.flatnonzero(~verified & ((rank == 0) | (candidate != inferred)))
+        if len(rows) == 0:
+            continue
+        x, y = utm_to_crs(este[rows], norte[rows], candidate[rows], validate=False)
+        points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(x, y), crs="EPSG:4326")
+        found = assign_districts(points, gdf_districts)
+        found_dept = pd.Series(found).map(dept_of).to_numpy()
+        # Mismo departamento: por los dos primeros dígitos del UBIGEO o por nombre
+        ok = (found >= 0) & np.where(own[rows] >= 0, found // 10_000 == own[rows] // 10_000,
+                                     found_dept == dept[rows])
+        zones[rows[ok]] = candidate[rows[ok]]
+        verified[rows[ok]] = True
+
+    s.note("zona_por_poligono", int((zones != inferred).sum()))
+    if not verified.all():
+        s.note("zona_sin_verificar", int((~verified).sum()))
+    return zones
+
+def _load_and_filter_ipress(filepath, utm_zone, dst_crs, columns, chunksize, aliases, gdf_districts=None):
+    """Lectura por bloques, limpieza y reproyección (sin caché)."""
+    s = current_stage()
+    total = 0
+    total_con_coords = 0
+    valid_chunks = []
+    schema = None
+    for chunk in iter_ipress_chunks(filepath, columns=columns, chunksize=chunksize, aliases=aliases):
+        chunk_schema = resolve_schema(chunk, aliases)
+        if schema is None:
+            schema = chunk_schema
+            s.note("columnas", len(chunk.columns))
+            for name in ("norte", "este", "departamento", "provincia", "distrito"):
+                schema.require(name)
+        elif chunk_schema != schema:
+            # Otra versión de exportación (p. ej. un snapshot histórico):
+            # llevar sus columnas a los nombres del primer archivo
+            chunk = chunk.rename(columns=chunk_schema.rename_map(schema))
+
+        total += len(chunk)
+        total_con_coords += int(chunk[[schema["norte"], schema["este"]]].notna().all(axis=1).sum())
+
+        # Filtrar el bloque antes de acumularlo (memoria acotada)
+        valid_chunks.append(_filter_valid_coords(chunk, schema))
+
+    s.rows_in = total
+    s.note("con_coordenadas", total_con_coords)
+
+    if not valid_chunks:
+        s.warn("No se encontraron registros con coordenadas válidas")
+        return gpd.GeoDataFrame()
+
+    df_valid = pd.concat(valid_chunks, ignore_index=True)
+    del valid_chunks
+
+    s.note("coordenadas_validas", len(df_valid))
 
     if len(df_valid) == 0:
-        print("ADVERTENCIA: No se encontraron registros con coordenadas válidas")
+        s.warn("No se encontraron registros con coordenadas válidas")
         return gpd.GeoDataFrame()
 
-    # Crear GeoDataFrame en UTM 18S
+    col_norte  = schema["norte"]
+    col_este   = schema["este"]
+    col_dept   = schema["departamento"]
+    col_prov   = schema["provincia"]
+    col_dist   = schema["distrito"]
+
+    # Reproyectar por grupos de zona UTM (una llamada vectorizada por zona)
+    zones = _resolve_utm_zones(df_valid, utm_zone, schema, gdf_districts)
+    x, y = utm_to_crs(df_valid[col_este].to_numpy(), df_valid[col_norte].to_numpy(), zones, dst_crs)
     gdf = gpd.GeoDataFrame(
         df_valid,
-        geometry=gpd.points_from_xy(df_valid[col_este], df_valid[col_norte]),
-        crs="EPSG:32718"
+        geometry=gpd.points_from_xy(x, y),
+        crs=dst_crs
     )
     
-    # Convertir a WGS84
-    gdf = gdf.to_crs("EPSG:4326")
-    
-    print(f"Convertido a WGS84 (EPSG:4326)")
-    print(f"Departamentos únicos: {gdf[col_dept].nunique()}")
-    print(f"Provincias únicas: {gdf[col_prov].nunique()}")
-    print(f"Distritos únicos: {gdf[col_dist].nunique()}")
+    s.note("zonas_utm", pd.Series(zones).value_counts().sort_index().to_dict())
+    s.note("crs", dst_crs)
+    s.note("departamentos", gdf[col_dept].nunique())
+    s.note("provincias", gdf[col_prov].nunique())
+    s.note("distritos", gdf[col_dist].nunique())
+
+    gdf = compact_hospitals(gdf, schema)
+    s.note("memoria_tabla_mb", round(memory_footprint(gdf)['total_mb'], 2))
 
     return gdf
 
+# Columnas (nombres canónicos, ver schema.py) que conserva la tabla compacta
+COMPACT_COLUMNS = [
+    "institucion",
+    "codigo",
+    "nombre",
+    "clasificacion",
+    "categoria",
+    "departamento",
+    "provincia",
+    "distrito",
+    "ubigeo",
+    "estado",
+    "condicion",
+    "norte",
+    "este",
+]
+
+# Columnas de baja cardinalidad que se guardan como categóricas
+CATEGORICAL_COLUMNS = [
+    "institucion",
+    "clasificacion",
+    "categoria",
+    "departamento",
+    "provincia",
+    "distrito",
+    "estado",
+    "condicion",
+]
+
+def compact_hospitals(gdf, schema=None):
+    """
+    Representación compacta de la tabla de hospitales:
+    - Solo las columnas de COMPACT_COLUMNS que usa el pipeline (+ geometry)
+    - Categóricas para ubicación administrativa, categoría e institución
+    - NORTE/ESTE en float32 (precisión ~1 m, suficiente para UTM)
+    - UBIGEO como entero (Int32, admite nulos)
+    """
+    if len(gdf) == 0:
+        return gdf
+
+    schema = schema or get_schema(gdf)
+    keep = [schema[name] for name in COMPACT_COLUMNS if name in schema]
+    gdf = gdf[keep + [gdf.geometry.name]].copy()
+
+    for name in CATEGORICAL_COLUMNS:
+        if name in schema:
+            gdf[schema[name]] = gdf[schema[name]].astype("category")
+    for name in ("norte", "este"):
+        gdf[schema[name]] = gdf[schema[name]].astype("float32")
+    if "ubigeo" in schema:
+        gdf[schema["ubigeo"]] = pd.to_numeric(gdf[schema["ubigeo"]], errors="coerce").astype("Int32")
+
+    return attach_schema(gdf, Schema({k: v for k, v in schema.columns.items() if v in gdf.columns}))
+
+def memory_footprint(gdf):
+    """
+    Memoria ocupada por la tabla (deep=True), total y por columna.
+
+    Returns:
+        dict con 'total_mb' y 'columns' ({columna: bytes})
+    """
+    usage = gdf.memory_usage(deep=True, index=True)
+    return {
+        "total_mb": usage.sum() / 1024 ** 2,
+        "columns": usage.to_dict(),
+    }
+
 def get_data_summary(gdf):
     """Genera resumen estadístico del GeoDataFrame."""
     if len(gdf) == 0:
@@ -77,131 +300,269 @@ def get_data_summary(gdf):
             "districts": 0,
         }
     
-    def safe_nunique(colname):
-        for c in gdf.columns:
-            if c.strip().lower() == colname.strip().lower():
-                return gdf[c].nunique()
-        return 0
+    schema = get_schema(gdf)
+
+    def safe_nunique(name):
+        col = schema.get(name)
+        return gdf[col].nunique() if col else 0
 
     summary = {
         "total_hospitals": len(gdf),
-        "departments": safe_nunique("Departamento"),
-        "provinces":   safe_nunique("Provincia"),
-        "districts":   safe_nunique("Distrito"),
+        "departments": safe_nunique("departamento"),
+        "provinces":   safe_nunique("provincia"),
+        "districts":   safe_nunique("distrito"),
     }
     
     return summary
 
 def get_departments_list(gdf):
     """Obtiene lista ordenada de departamentos únicos."""
-    for c in gdf.columns:
-        if c.strip().lower() == "departamento":
-            return sorted(gdf[c].dropna().unique().tolist())
-    return []
+    col_dept = get_schema(gdf).get("departamento")
+    if col_dept is None:
+        return []
+    return sorted(gdf[col_dept].dropna().unique().tolist())
 
 def count_hospitals_by_district(gdf):
     """Cuenta hospitales por distrito y retorna un DataFrame."""
-    # Buscar columnas de ubicación
-    col_dept = None
-    col_prov = None
-    col_dist = None
-    col_ubigeo = None
-    
-    for c in gdf.columns:
-        c_lower = c.strip().lower()
-        if c_lower == "departamento":
-            col_dept = c
-        elif c_lower == "provincia":
-            col_prov = c
-        elif c_lower == "distrito":
-            col_dist = c
-        elif c_lower == "ubigeo":
-            col_ubigeo = c
+    # Columnas de ubicación (esquema resuelto al cargar)
+    schema = get_schema(gdf)
+    col_dept = schema.get("departamento")
+    col_prov = schema.get("provincia")
+    col_dist = schema.get("distrito")
+    col_ubigeo = schema.get("ubigeo")
     
     if not col_dist:
         return pd.DataFrame()
     
-    # Contar por distrito
-    counts = gdf.groupby([col_dept, col_prov, col_dist]).size().reset_index(name='n_hospitales')
+    # Contar por distrito (observed=True: con categóricas solo combinaciones existentes)
+    keys = [c for c in (col_dept, col_prov, col_dist) if c]
+    grouped = gdf.groupby(keys, observed=True)
+    counts = grouped.size().reset_index(name='n_hospitales')
     
-    # Agregar UBIGEO si existe
+    # Agregar UBIGEO si existe (por departamento/provincia/distrito, no solo por
+    # nombre: hay muchos distritos homónimos, p. ej. "SANTA ROSA")
     if col_ubigeo:
-        ubigeo_map = gdf.groupby(col_dist)[col_ubigeo].first().to_dict()
-        counts['UBIGEO'] = counts[col_dist].map(ubigeo_map)
+        counts['UBIGEO'] = grouped[col_ubigeo].first().to_numpy()
     
     return counts
 
-def load_districts_shapefile(filepath):
+# Los UBIGEO de distrito tienen 6 dígitos (DDPPDD): caben en un índice directo
+UBIGEO_MAX = 999_999
+
+def ubigeo_key(values):
+    """
+    Clave entera de UBIGEO (equivale al zfill(6) del notebook, sin pasar por texto).
+    Valores vacíos o inválidos -> -1.
     """
-    Carga el shapefile de distritos del Perú.
-    Asume que está en EPSG:4326 (WGS84).
+    s = pd.Series(values)
+    if not pd.api.types.is_numeric_dtype(s):
+        s = s.astype(str).str.strip().str.replace(r"\.0$", "", regex=True)
+    keys = pd.to_numeric(s, errors="coerce")
+    keys = keys.where((keys > 0) & (keys <= UBIGEO_MAX))
+    return keys.fillna(-1).to_numpy(dtype=np.int32)
+
+@instrumented("districts.load")
+def load_districts_shapefile(filepath, department=None, columns=None, bbox=None,
+                             crs="EPSG:4326", use_cache=True):
+    """
+    Carga el shapefile de distritos del Perú (por defecto en EPSG:4326).
+    Agrega la columna entera UBIGEO_KEY (índice para el join con hospitales).
+    La ruta queda en gdf.attrs['source'] (la caché espacial se guarda a su lado).
+
+    'department', 'columns' y 'bbox' limitan lo que se lee (ver
+    vector.read_vector); crs=None conserva el CRS nativo de la capa.
     """
     try:
-        gdf_districts = gpd.read_file(filepath)
+        gdf_districts = read_vector(filepath, columns=columns, bbox=bbox, department=department,
+                                    crs=crs, use_cache=use_cache)
+        
+        current_stage().note("columnas", gdf_districts.columns.tolist())
         
-        # Asegurar que esté en WGS84
-        if gdf_districts.crs != "EPSG:4326":
-            gdf_districts = gdf_districts.to_crs("EPSG:4326")
+        schema = resolve_schema(gdf_districts)
+        if "ubigeo" in schema:
+            gdf_districts["UBIGEO_KEY"] = ubigeo_key(gdf_districts[schema["ubigeo"]])
         
-        print(f"Shapefile de distritos cargado: {len(gdf_districts)} distritos")
-        print(f"Columnas disponibles: {gdf_districts.columns.tolist()}")
+        gdf_districts.attrs["source"] = os.path.abspath(filepath)
+        return attach_schema(gdf_districts, schema)
+    
+    except Exception as e:
+        current_stage().fail(f"Error al cargar shapefile: {e}")
+        return None
+
+@instrumented("ccpp.load")
+def load_ccpp_shapefile(filepath, department=None, columns=None, bbox=None,
+                        crs="EPSG:4326", use_cache=True):
+    """
+    Carga el shapefile de centros poblados (CCPP_IGN100K), por defecto en WGS84.
+    Acepta los mismos filtros que load_districts_shapefile.
+    """
+    try:
+        gdf_ccpp = read_vector(filepath, columns=columns, bbox=bbox, department=department,
+                               crs=crs, use_cache=use_cache)
         
-        return gdf_districts
+        gdf_ccpp.attrs["source"] = os.path.abspath(filepath)
+        return attach_schema(gdf_ccpp, resolve_schema(gdf_ccpp))
     
     except Exception as e:
-        print(f"Error al cargar shapefile: {e}")
+        current_stage().fail(f"Error al cargar shapefile: {e}")
         return None
 
+@instrumented("ccpp.districts", rows_in=lambda gdf_ccpp, *args, **kwargs: len(gdf_ccpp))
+def assign_ccpp_districts(gdf_ccpp, gdf_districts):
+    """
+    Asigna cada centro poblado al distrito que lo contiene (STRtree, ver
+    spatial.assign_districts) y completa su departamento con el del distrito
+    cuando falta (o cuando la capa no tiene columna de departamento).
+
+    Args:
+        gdf_ccpp: GeoDataFrame de centros poblados
+        gdf_districts: capa de distritos con UBIGEO
+
+    Returns:
+        Copia de gdf_ccpp con UBIGEO_KEY (-1 fuera de todo distrito); sin
+        UBIGEO en los distritos se devuelve gdf_ccpp sin cambios.
+    """
+    s = current_stage()
+    district_keys = _district_keys(gdf_districts)
+    if district_keys is None:
+        s.warn("El shapefile de distritos no tiene UBIGEO: los centros poblados quedan sin distrito")
+        return gdf_ccpp
+
+    keys = assign_districts(gdf_ccpp, gdf_districts)
+    gdf = gdf_ccpp.copy()
+    gdf["UBIGEO_KEY"] = keys
+    schema = get_schema(gdf).to_dict()
+    s.note("dentro_de_distrito", int((keys >= 0).sum()))
+
+    dist_dept = get_schema(gdf_districts).get("departamento")
+    if dist_dept is not None:
+        lookup = pd.Series(gdf_districts[dist_dept].to_numpy(), index=district_keys)
+        lookup = lookup[~lookup.index.duplicated()]
+        from_district = pd.Series(keys, index=gdf.index).map(lookup)
+        col_dept = schema.get("departamento")
+        if col_dept is None:
+            col_dept = "Departamento"
+            gdf[col_dept] = from_district
+            missing = from_district.notna()
+        else:
+            current = gdf[col_dept].astype(object)
+            missing = (current.isna() | (current.astype(str).str.strip() == "")) & from_district.notna()
+            gdf[col_dept] = current.where(~missing, from_district)
+        schema["departamento"] = col_dept
+        s.note("departamento_por_distrito", int(missing.sum()))
+
+    return attach_schema(gdf, Schema(schema))
+
+def _district_keys(gdf_districts):
+    """UBIGEO_KEY de los distritos (precalculado al cargar o calculado aquí)."""
+    if "UBIGEO_KEY" in gdf_districts.columns:
+        return gdf_districts["UBIGEO_KEY"].to_numpy()
+    col_ubigeo = get_schema(gdf_districts).get("ubigeo")
+    if col_ubigeo is None:
+        return None
+    return ubigeo_key(gdf_districts[col_ubigeo])
+
+def _name_keys(df, schema):
+    """Clave textual normalizada DEPARTAMENTO|PROVINCIA|DISTRITO (las que existan)."""
+    cols = [schema.get(c) for c in ("departamento", "provincia", "distrito")]
+    cols = [c for c in cols if c]
+    parts = [normalize_values(df[c]) for c in cols]
+    key = parts[0]
+    for part in parts[1:]:
+        key = key + "|" + part
+    return key
+
+def _fallback_keys_by_name(gdf_hospitals, gdf_districts, district_keys):
+    """
+    UBIGEO_KEY por nombre para hospitales sin UBIGEO válido. Usa
+    departamento + provincia + distrito cuando ambos lados los tienen, y solo
+    nombres de distrito únicos (los homónimos no se asignan por nombre).
+    """
+    hosp_schema = get_schema(gdf_hospitals)
+    dist_schema = get_schema(gdf_districts)
+    shared = [c for c in ("departamento", "provincia", "distrito")
+              if c in hosp_schema and c in dist_schema]
+    if "distrito" not in shared:
+        return np.full(len(gdf_hospitals), -1, dtype=np.int32)
+
+    hosp_names = _name_keys(gdf_hospitals, Schema({c: hosp_schema[c] for c in shared}))
+    dist_names = _name_keys(gdf_districts, Schema({c: dist_schema[c] for c in shared}))
+
+    lookup = pd.Series(district_keys, index=dist_names.to_numpy())
+    lookup = lookup[~lookup.index.duplicated(keep=False)]
+    return hosp_names.map(lookup).fillna(-1).to_numpy(dtype=np.int32)
+
+@instrumented("districts.ubigeo_keys", rows_in=lambda gdf_hospitals, *args, **kwargs: len(gdf_hospitals))
+def hospital_ubigeo_keys(gdf_hospitals, gdf_districts, district_keys=None):
+    """
+    UBIGEO_KEY de cada hospital: su UBIGEO si existe en el shapefile; si no,
+    el distrito que contiene el punto (STRtree) y, como último recurso, el
+    emparejamiento por nombres. Sin coincidencia -> -1.
+    Si se pasan 'district_keys' sintéticas (shapefile sin UBIGEO) solo se
+    empareja por nombres.
+    """
+    synthetic = district_keys is not None
+    if district_keys is None:
+        district_keys = _district_keys(gdf_districts)
+    col_ubigeo = get_schema(gdf_hospitals).get("ubigeo")
+    if col_ubigeo is not None and not synthetic:
+        keys = ubigeo_key(gdf_hospitals[col_ubigeo])
+    else:
+        keys = np.full(len(gdf_hospitals), -1, dtype=np.int32)
+
+    valid = np.zeros(UBIGEO_MAX + 1, dtype=bool)
+    valid[district_keys[district_keys >= 0]] = True
+    missing = (keys < 0) | ~valid[np.clip(keys, 0, UBIGEO_MAX)]
+    if missing.any() and not synthetic:
+        keys = keys.copy()
+        keys[missing] = assign_districts(gdf_hospitals[missing], gdf_districts)
+        current_stage().note("por_ubicacion", f"{int((keys[missing] >= 0).sum())} de {int(missing.sum())}")
+        missing = keys < 0
+    if missing.any():
+        fallback = _fallback_keys_by_name(gdf_hospitals[missing], gdf_districts, district_keys)
+        keys = keys.copy()
+        keys[missing] = fallback
+        current_stage().note("por_nombre", f"{int((fallback >= 0).sum())} de {int(missing.sum())}")
+    return keys
+
+@instrumented("districts.merge", rows_in=lambda gdf_hospitals, gdf_districts: len(gdf_hospitals))
 def merge_hospitals_with_districts(gdf_hospitals, gdf_districts):
     """
     Cuenta hospitales por distrito y hace merge con el shapefile.
     Retorna un GeoDataFrame con geometrías de distritos y conteo de hospitales.
+
+    El join es por clave entera de UBIGEO (conteo con np.bincount e indexación
+    directa, O(n)). El emparejamiento por nombres solo se usa como respaldo
+    para hospitales sin UBIGEO válido.
     """
-    # Buscar columna de distrito en hospitales
-    col_dist_hosp = None
-    for c in gdf_hospitals.columns:
-        if c.strip().lower() == "distrito":
-            col_dist_hosp = c
-            break
-    
-    if not col_dist_hosp:
-        print("No se encontró columna 'Distrito' en hospitales")
-        return gdf_districts
-    
-    # Contar hospitales por distrito
-    hospital_counts = gdf_hospitals[col_dist_hosp].value_counts().reset_index()
-    hospital_counts.columns = ['DISTRITO', 'n_hospitales']
-    
-    # Normalizar nombres de distritos (mayúsculas y sin espacios extra)
-    hospital_counts['DISTRITO'] = hospital_counts['DISTRITO'].str.upper().str.strip()
-    
-    # Buscar columna de distrito en shapefile (puede ser NOMBDIST, DISTRITO, etc.)
-    dist_col_shape = None
-    for col in gdf_districts.columns:
-        col_lower = col.lower()
-        if 'dist' in col_lower or 'nombdist' in col_lower:
-            dist_col_shape = col
-            break
-    
-    if dist_col_shape:
-        # Normalizar nombres en shapefile
-        gdf_districts = gdf_districts.copy()
-        gdf_districts['DISTRITO_NORM'] = gdf_districts[dist_col_shape].str.upper().str.strip()
-        
-        # Hacer merge
-        gdf_merged = gdf_districts.merge(
-            hospital_counts, 
-            left_on='DISTRITO_NORM', 
-            right_on='DISTRITO',
-            how='left'
-        )
-        
-        # Llenar NaN con 0 (distritos sin hospitales)
-        gdf_merged['n_hospitales'] = gdf_merged['n_hospitales'].fillna(0).astype(int)
-        
-        print(f"Merge completado: {len(gdf_merged)} distritos, {gdf_merged['n_hospitales'].sum()} hospitales totales")
-        
-        return gdf_merged
+    s = current_stage()
+    district_keys = _district_keys(gdf_districts)
+    dist_col_shape = get_schema(gdf_districts).get("distrito")
+
+    if district_keys is None:
+        if not dist_col_shape:
+            s.warn("No se encontró columna de distrito ni UBIGEO en shapefile")
+            return gdf_districts
+        # Sin UBIGEO en el shapefile: claves sintéticas por fila y join por nombres
+        s.warn("No se encontró columna 'UBIGEO' en shapefile: se empareja por nombres")
+        district_keys = np.arange(1, len(gdf_districts) + 1, dtype=np.int32)
+        hosp_keys = hospital_ubigeo_keys(gdf_hospitals, gdf_districts, district_keys)
     else:
-        print("No se encontró columna de distrito en shapefile")
-        return gdf_districts
\ No newline at end of file
+        hosp_keys = hospital_ubigeo_keys(gdf_hospitals, gdf_districts)
+
+    # Conteo por UBIGEO: índice directo de 10^6 posiciones
+    counts = np.bincount(hosp_keys[hosp_keys >= 0], minlength=UBIGEO_MAX + 1)
+
+    gdf_merged = gdf_districts.copy()
+    gdf_merged["UBIGEO_KEY"] = district_keys
+    gdf_merged["n_hospitales"] = np.where(district_keys >= 0, counts[np.clip(district_keys, 0, UBIGEO_MAX)], 0).astype(int)
+    if dist_col_shape:
+        gdf_merged["DISTRITO_NORM"] = gdf_merged[dist_col_shape].astype(str).str.upper().str.strip()
+
+    sin_distrito = int((hosp_keys < 0).sum())
+    s.note("distritos", len(gdf_merged))
+    s.note("hospitales", int(gdf_merged['n_hospitales'].sum()))
+    if sin_distrito:
+        s.note("sin_distrito", sin_distrito)
+
+    return gdf_merged
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from projection import get_transformer
+from proximity import METRIC_CRS, projected_xy
+
+# Grilla hexagonal jerárquica sobre coordenadas métricas (UTM 18S). En la
+# resolución 0 el hexágono mide HEX_BASE_SIZE metros de lado; cada resolución
+# siguiente divide el lado entre 2 (4 hijos por celda en promedio, apertura 4).
+HEX_BASE_SIZE = 64_000
+MAX_RESOLUTION = 10
+DEFAULT_RESOLUTIONS = (2, 3, 4, 5, 6)
+
+# Empaquetado del id en int64: 4 bits de resolución y 29 bits para cada
+# coordenada axial (q, r) desplazada para que sea positiva
+_RES_SHIFT = 58
+_COORD_BITS = 29
+_COORD_MASK = (1 << _COORD_BITS) - 1
+_COORD_OFFSET = 1 << (_COORD_BITS - 1)
+
+_SQRT3 = np.sqrt(3.0)
+
+def cell_size(resolution):
+    """Lado del hexágono (metros) en una resolución."""
+    return HEX_BASE_SIZE / 2 ** resolution
+
+def _pack(q, r, resolution):
+    res = np.int64(resolution) << _RES_SHIFT
+    return res | ((q + _COORD_OFFSET).astype(np.int64) << _COORD_BITS) | (r + _COORD_OFFSET).astype(np.int64)
+
+def _unpack(ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    res = ids >> _RES_SHIFT
+    q = ((ids >> _COORD_BITS) & _COORD_MASK) - _COORD_OFFSET
+    r = (ids & _COORD_MASK) - _COORD_OFFSET
+    return q, r, res
+
+def cell_resolution(ids):
+    """Resolución de cada celda."""
+    return _unpack(ids)[2]
+
+def _axial_round(qf, rf):
+    """Redondeo cúbico vectorizado de coordenadas axiales fraccionarias."""
+    sf = -qf - rf
+    q, r, s = np.round(qf), np.round(rf), np.round(sf)
+    dq, dr, ds = np.abs(q - qf), np.abs(r - rf), np.abs(s - sf)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    q = np.where(fix_q, -r - s, q)
+    r = np.where(fix_r, -q - s, r)
+    return q.astype(np.int64), r.astype(np.int64)
+
+def xy_to_cells(x, y, resolution):
+    """Celda (hexágono de vértice arriba) de cada punto en coordenadas métricas."""
+    size = cell_size(resolution)
+    qf = (_SQRT3 / 3 * x - y / 3) / size
+    rf = (2 / 3 * y) / size
+    q, r = _axial_round(qf, rf)
+    return _pack(q, r, resolution)
+
+def cell_centers(ids):
+    """Centro (x, y) de cada celda en coordenadas métricas."""
+    q, r, res = _unpack(ids)
+    size = HEX_BASE_SIZE / 2.0 ** res
+    x = size * _SQRT3 * (q + r / 2)
+    y = size * 1.5 * r
+    return x, y
+
+def cell_parent(ids, parent_resolution=None):
+    """
+    Celda padre: la celda de la resolución 'parent_resolution' (por defecto la
+    inmediata superior) que contiene el centro de cada celda. Aplicado en
+    cadena define una jerarquía exacta (cada celda tiene un único padre).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    res = cell_resolution(ids)
+    target = res - 1 if parent_resolution is None else np.full_like(res, parent_resolution)
+    out = ids.copy()
+    for level in range(int(res.max(initial=0)) - 1, int(target.min(initial=0)) - 1, -1):
+        step = cell_resolution(out) > np.maximum(target, level)
+        if step.any():
+            x, y = cell_centers(out[step])
+            out[step] = xy_to_cells(x, y, level)
+    return out
+
+def cell_children(cell_id):
+    """Celdas de la resolución siguiente cuyo padre es 'cell_id'."""
+    q, r, res = (int(v[0]) for v in _unpack([cell_id]))
+    # Candidatas alrededor de la posición equivalente (q, r) * 2
+    dq, dr = np.meshgrid(np.arange(-2, 3), np.arange(-2, 3))
+    candidates = _pack(2 * q + dq.ravel(), 2 * r + dr.ravel(), res + 1)
+    return candidates[cell_parent(candidates) == cell_id]
+
+def points_to_cells(gdf, resolution=MAX_RESOLUTION, crs=METRIC_CRS):
+    """
+    Celda de cada punto de 'gdf' en una resolución, como array int64
+    compacto alineado con las filas (-1 para puntos sin coordenadas).
+    """
+    xy = projected_xy(gdf, crs)
+    ids = np.full(len(xy), -1, dtype=np.int64)
+    valid = np.isfinite(xy).all(axis=1)
+    ids[valid] = xy_to_cells(xy[valid, 0], xy[valid, 1], resolution)
+    return ids
+
+def hex_index(gdf, resolutions=DEFAULT_RESOLUTIONS, crs=METRIC_CRS):
+    """
+    Índice de celdas para varias resoluciones. Los puntos se asignan una vez
+    en la resolución más fina y las demás se obtienen subiendo por la
+    jerarquía, así los conteos de cualquier nivel son consistentes entre sí.
+
+    Returns:
+        dict {resolución: array int64 de ids alineado con las filas}
+    """
+    resolutions = sorted(resolutions)
+    finest = points_to_cells(gdf, resolutions[-1], crs)
+    valid = finest >= 0
+    index = {resolutions[-1]: finest}
+    for res in resolutions[:-1]:
+        ids = np.full(len(finest), -1, dtype=np.int64)
+        ids[valid] = cell_parent(finest[valid], res)
+        index[res] = ids
+    return index
+
+def cell_counts(ids, weights=None):
+    """Conteo (o suma de 'weights') por celda, ignorando las celdas -1."""
+    ids = np.asarray(ids)
+    valid = ids >= 0
+    values = np.ones(valid.sum()) if weights is None else np.asarray(weights)[valid]
+    return pd.Series(values).groupby(ids[valid]).sum()
+
+def rollup(counts, parent_resolution):
+    """Agrega una serie {celda: valor} a sus celdas padre en 'parent_resolution'."""
+    parents = cell_parent(counts.index.to_numpy(dtype=np.int64), parent_resolution)
+    return counts.groupby(parents).sum()
+
+def density_table(gdf_hospitals, gdf_ccpp, resolution, base_resolution=MAX_RESOLUTION):
+    """
+    Hospitales, centros poblados y hospitales por centro poblado en cada celda.
+
+    Los puntos se asignan en 'base_resolution' y se agregan hacia arriba, de
+    modo que las tablas de distintas resoluciones suman lo mismo.
+
+    Returns:
+        DataFrame indexado por cell_id con n_hospitales, n_ccpp y
+        hosp_por_ccpp (NaN en celdas sin centros poblados)
+    """
+    base_resolution = max(base_resolution, resolution)
+    return density_from_counts(cell_counts(points_to_cells(gdf_hospitals, base_resolution)),
+                               cell_counts(points_to_cells(gdf_ccpp, base_resolution)), resolution)
+
+def density_from_counts(hosp_counts, ccpp_counts, resolution):
+    """
+    Como density_table, a partir de los conteos por celda de una resolución
+    más fina (ver cell_counts): el dashboard asigna los puntos una sola vez y
+    solo repite este agregado al cambiar el tamaño de celda.
+    """
+    hosp = rollup(hosp_counts, resolution)
+    ccpp = rollup(ccpp_counts, resolution)
+    table = pd.DataFrame({"n_hospitales": hosp, "n_ccpp": ccpp}).fillna(0).astype(int)
+    table.index.name = "cell_id"
+    table["hosp_por_ccpp"] = table["n_hospitales"] / table["n_ccpp"].where(table["n_ccpp"] > 0)
+    return table
+
+def cell_polygons(ids, crs="EPSG:4326"):
+    """Hexágonos de las celdas como GeoSeries (para mapas)."""
+    ids = np.asarray(ids, dtype=np.int64)
+    x, y = cell_centers(ids)
+    size = HEX_BASE_SIZE / 2.0 ** cell_resolution(ids)
+    angles = np.radians(30 + 60 * np.arange(6))
+    vx = x[:, None] + size[:, None] * np.cos(angles)
+    vy = y[:, None] + size[:, None] * np.sin(angles)
+    if crs is not None and crs != METRIC_CRS:
+        vx, vy = get_transformer(METRIC_CRS, crs).transform(vx, vy)
+    rings = np.stack([vx, vy], axis=-1)
+    return gpd.GeoSeries(shapely.polygons(rings), index=pd.Index(ids, name="cell_id"), crs=crs)
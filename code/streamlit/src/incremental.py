@@ -0,0 +1,284 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from estimation import _district_keys, hospital_ubigeo_keys, ubigeo_key
+from instrumentation import instrumented, note
+from proximity import DEFAULT_BUFFER, build_point_index, projected_xy
+from schema import get_schema
+
+# Desplazamiento mínimo (metros) para considerar que un establecimiento se
+# movió. Con 0 cualquier cambio de coordenadas cuenta y los conteos de
+# proximidad actualizados son idénticos a recalcularlos; con una tolerancia
+# positiva un establecimiento que se movió menos que ella conserva su
+# posición anterior, y los centros poblados a esa distancia del borde del
+# radio pueden quedar con un hospital de más o de menos.
+MOVE_TOLERANCE = 0.0
+
+@dataclass
+class SnapshotDiff:
+    """
+    Cambios entre dos snapshots de IPRESS, por código de establecimiento.
+
+    Atributos:
+        added: establecimientos nuevos
+        removed: establecimientos que ya no están
+        moved_old: establecimientos con nueva ubicación o UBIGEO (fila anterior)
+        moved_new: los mismos establecimientos (fila nueva), en el mismo orden
+    """
+    added: gpd.GeoDataFrame
+    removed: gpd.GeoDataFrame
+    moved_old: gpd.GeoDataFrame
+    moved_new: gpd.GeoDataFrame
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.moved_new)
+
+    def outgoing(self):
+        """Filas cuyo aporte hay que restar (eliminados + posición anterior de los movidos)."""
+        return _concat(self.removed, self.moved_old)
+
+    def incoming(self):
+        """Filas cuyo aporte hay que sumar (nuevos + posición nueva de los movidos)."""
+        return _concat(self.added, self.moved_new)
+
+    def summary(self):
+        return {
+            "nuevos": len(self.added),
+            "eliminados": len(self.removed),
+            "movidos": len(self.moved_new),
+        }
+
+def _concat(a, b):
+    if len(b) == 0:
+        return a
+    if len(a) == 0:
+        return b
+    return pd.concat([a, b.to_crs(a.crs) if a.crs != b.crs else b])
+
+def _codes(gdf):
+    col_codigo = get_schema(gdf).require("codigo")
+    return gdf[col_codigo].astype(str).str.strip().to_numpy()
+
+def _ubigeo_changed(old, new):
+    col_old = get_schema(old).get("ubigeo")
+    col_new = get_schema(new).get("ubigeo")
+    if col_old is None or col_new is None:
+        return np.zeros(len(new), dtype=bool)
+    return ubigeo_key(old[col_old]) != ubigeo_key(new[col_new])
+
+def _moved(old, new, tolerance):
+    """Filas emparejadas (mismo orden) cuya posición cambió más de 'tolerance' metros."""
+    geoms_old = old.geometry
+    if old.crs is not None and new.crs is not None and old.crs != new.crs:
+        geoms_old = geoms_old.to_crs(new.crs)
+    # Primero la comparación exacta en el CRS original; solo se proyectan los candidatos
+    candidates = ~shapely.equals_exact(geoms_old.to_numpy(), new.geometry.to_numpy(), tolerance=0)
+    moved = np.zeros(len(new), dtype=bool)
+    if candidates.any():
+        xy_old = projected_xy(old[candidates])
+        xy_new = projected_xy(new[candidates])
+        dist = np.hypot(*(xy_new - xy_old).T)
+        moved[candidates] = ~(dist <= tolerance)
+    return moved
+
+@instrumented("incremental.diff", rows_in=lambda old, new, *args, **kwargs: len(new), rows_out=None)
+def diff_snapshots(old, new, tolerance=MOVE_TOLERANCE):
+    """
+    Compara dos snapshots de IPRESS (ya filtrados y georreferenciados) por
+    código único de establecimiento.
+
+    Los códigos repetidos dentro de un snapshot no se pueden emparejar: todas
+    sus filas anteriores cuentan como eliminadas y todas las nuevas como
+    agregadas (el resultado de los conteos sigue siendo exacto).
+
+    Args:
+        old: GeoDataFrame del snapshot anterior
+        new: GeoDataFrame del snapshot nuevo
+        tolerance: desplazamiento mínimo en metros para considerar un
+            movimiento (ver MOVE_TOLERANCE)
+
+    Returns:
+        SnapshotDiff
+    """
+    codes_old = pd.Series(_codes(old))
+    codes_new = pd.Series(_codes(new))
+
+    unique_old = ~codes_old.duplicated(keep=False)
+    unique_new = ~codes_new.duplicated(keep=False)
+    matchable = set(codes_old[unique_old]) & set(codes_new[unique_new])
+
+    matched_old = codes_old.isin(matchable).to_numpy() & unique_old.to_numpy()
+    matched_new = codes_new.isin(matchable).to_numpy() & unique_new.to_numpy()
+
+    # Filas emparejadas en el mismo orden (por posición del snapshot nuevo)
+    pos_new = np.flatnonzero(matched_new)
+    pos_old = pd.Index(codes_old[matched_old]).get_indexer(codes_new[matched_new])
+    pos_old = np.flatnonzero(matched_old)[pos_old]
+
+    pair_old = old.iloc[pos_old]
+    pair_new = new.iloc[pos_new]
+    changed = _moved(pair_old, pair_new, tolerance) | _ubigeo_changed(pair_old, pair_new)
+
+    diff = SnapshotDiff(
+        added=new[~matched_new],
+        removed=old[~matched_old],
+        moved_old=pair_old[changed],
+        moved_new=pair_new[changed],
+    )
+    note("diferencias", diff.summary())
+    return diff
+
+def _key_delta(diff, gdf_districts, district_keys):
+    """Variación del número de hospitales por UBIGEO_KEY (solo claves afectadas)."""
+    parts = []
+    for frame, sign in ((diff.outgoing(), -1), (diff.incoming(), 1)):
+        if len(frame) == 0:
+            continue
+        keys = hospital_ubigeo_keys(frame, gdf_districts, district_keys)
+        keys = keys[keys >= 0]
+        parts.append(pd.Series(sign, index=keys))
+    if not parts:
+        return pd.Series(dtype=int)
+    delta = pd.concat(parts).groupby(level=0).sum()
+    return delta[delta != 0]
+
+@instrumented("incremental.district_counts")
+def update_district_counts(gdf_merged, diff, gdf_districts):
+    """
+    Actualiza n_hospitales de la salida de merge_hospitals_with_districts con
+    los cambios de un snapshot, sin recontar todos los hospitales: solo se
+    asignan a distrito las filas del diff.
+
+    Args:
+        gdf_merged: resultado de merge_hospitals_with_districts (snapshot anterior)
+        diff: SnapshotDiff
+        gdf_districts: shapefile de distritos usado en el merge
+
+    Returns:
+        Copia de gdf_merged con n_hospitales actualizado
+    """
+    # Shapefile sin UBIGEO: el merge usó claves sintéticas por fila
+    synthetic = _district_keys(gdf_districts) is None
+    district_keys = gdf_merged["UBIGEO_KEY"].to_numpy() if synthetic else None
+
+    delta = _key_delta(diff, gdf_districts, district_keys)
+    gdf = gdf_merged.copy()
+    if len(delta):
+        affected = gdf["UBIGEO_KEY"].isin(delta.index).to_numpy()
+        gdf.loc[affected, "n_hospitales"] += delta.reindex(gdf.loc[affected, "UBIGEO_KEY"]).to_numpy()
+    note("distritos_afectados", len(delta))
+    return gdf
+
+def _neighbor_rows(xy, ccpp_index, radius, target_index):
+    """Posiciones en 'target_index' de los centros poblados a menos de 'radius' de cada punto."""
+    xy = xy[np.isfinite(xy).all(axis=1)]
+    if len(xy) == 0 or len(ccpp_index) == 0:
+        return np.empty(0, dtype=np.int64)
+    hits = ccpp_index.tree.query_ball_point(xy, r=radius)
+    hits = np.concatenate([np.asarray(h, dtype=np.int64) for h in hits])
+    rows = target_index.get_indexer(ccpp_index.labels[hits])
+    return rows[rows >= 0]
+
+def _ranks(counts):
+    """
+    RankAislado y RankConcentrado (rank 'min') a partir del histograma de
+    conteos: O(n) sin ordenar la tabla.
+    """
+    hist = np.bincount(counts)
+    below = np.cumsum(hist) - hist
+    above = len(counts) - np.cumsum(hist)
+    return (1 + below[counts]).astype(int), (1 + above[counts]).astype(int)
+
+def _reorder(order_counts, names, changed):
+    """
+    Posiciones que dejan la tabla ordenada por conteo descendente y nombre
+    (el orden de analyze_proximity_all_departments). Las filas que no
+    cambiaron conservan su orden relativo; solo se ubican las de 'changed'
+    con búsqueda binaria. Devuelve None si el orden anterior no sirve.
+    """
+    keep = np.ones(len(order_counts), dtype=bool)
+    keep[changed] = False
+    rest = np.flatnonzero(keep)
+    rest_key = -order_counts[rest]
+    if (np.diff(rest_key) < 0).any():
+        return None
+    rest_names = names[rest]
+    rest_na = pd.isna(rest_names)
+    na_before = np.concatenate([[0], np.cumsum(rest_na)])
+
+    moved = changed[np.lexsort((names[changed].astype(str), pd.isna(names[changed]), -order_counts[changed]))]
+    positions = np.empty(len(moved), dtype=np.int64)
+    for j, row in enumerate(moved):
+        lo = np.searchsorted(rest_key, -order_counts[row], side="left")
+        hi = np.searchsorted(rest_key, -order_counts[row], side="right")
+        if pd.isna(names[row]):
+            positions[j] = hi
+            continue
+        # Los nombres nulos van al final de cada grupo de conteo
+        valid = hi - (na_before[hi] - na_before[lo])
+        try:
+            positions[j] = lo + np.searchsorted(rest_names[lo:valid], names[row], side="right")
+        except TypeError:
+            return None
+    return np.insert(rest, positions, moved)
+
+@instrumented("incremental.proximity_counts")
+def update_proximity_counts(resultado, gdf_ccpp, diff, buffer_distance=DEFAULT_BUFFER,
+                            column="NumHosp", ccpp_index=None):
+    """
+    Actualiza los conteos de proximidad de los centros poblados con los
+    cambios de un snapshot. Con un KD-tree sobre los centros poblados se
+    buscan solo los que están a menos de 'buffer_distance' de la posición
+    anterior (se resta 1) o nueva (se suma 1) de cada establecimiento del diff.
+
+    Los rankings se recalculan con el histograma de conteos y solo las filas
+    cuyo conteo cambió se reubican en el orden de la tabla, sin ordenarla.
+
+    Args:
+        resultado: salida de analyze_proximity_* (nacional o de un departamento)
+        gdf_ccpp: GeoDataFrame de centros poblados con que se calculó 'resultado'
+        diff: SnapshotDiff
+        buffer_distance: radio en metros con que se calculó 'column'
+        column: columna de conteo a actualizar (p. ej. 'NumHosp_20km' de un barrido)
+        ccpp_index: índice de centros poblados ya construido; por defecto
+            build_point_index(gdf_ccpp), que se reutiliza para la misma capa
+
+    Returns:
+        Copia de resultado con 'column' actualizada (y los rankings, si
+        existen, con el mismo orden que analyze_proximity_all_departments)
+    """
+    if len(diff) == 0:
+        note("conteos_modificados", 0)
+        return resultado.copy()
+    if ccpp_index is None:
+        ccpp_index = build_point_index(gdf_ccpp)
+
+    counts = resultado[column].to_numpy().copy()
+    touched = []
+    for frame, sign in ((diff.outgoing(), -1), (diff.incoming(), 1)):
+        if len(frame) == 0:
+            continue
+        rows = _neighbor_rows(projected_xy(frame, ccpp_index.crs), ccpp_index,
+                              buffer_distance, resultado.index)
+        np.add.at(counts, rows, sign)
+        touched.append(rows)
+    touched = np.concatenate(touched) if touched else np.empty(0, dtype=np.int64)
+    changed = np.unique(touched)
+    changed = changed[counts[changed] != resultado[column].to_numpy()[changed]]
+
+    resultado = resultado.copy()
+    resultado[column] = counts
+    if "RankAislado" in resultado.columns and len(changed):
+        resultado["RankAislado"], resultado["RankConcentrado"] = _ranks(counts)
+        order = _reorder(counts, resultado["CentroPoblado"].to_numpy(dtype=object), changed)
+        if order is None:
+            resultado = resultado.sort_values(["RankConcentrado", "CentroPoblado"])
+        else:
+            resultado = resultado.iloc[order]
+    note("conteos_modificados", len(touched))
+    note("filas_reordenadas", len(changed))
+    return resultado
@@ -0,0 +1,156 @@
+import os
+
+import pandas as pd
+
+from schema import expand_aliases, normalize_name
+
+# Columnas de IPRESS que usa el pipeline (coordenadas, ubicación y campos de
+# visualización). El resto de columnas del registro no se parsea.
+IPRESS_COLUMNS = [
+    "Institución",
+    "Código Único",
+    "Nombre del establecimiento",
+    "Clasificación",
+    "Categoria",
+    "Departamento",
+    "Provincia",
+    "Distrito",
+    "UBIGEO",
+    "Estado",
+    "Condición",
+    "NORTE",
+    "ESTE",
+    # Opcional: zona UTM por fila (si la exportación la incluye)
+    "Zona UTM",
+]
+
+COORD_COLUMNS = ("NORTE", "ESTE")
+
+DEFAULT_CHUNKSIZE = 50_000
+
+_norm = normalize_name
+
+def _wanted(columns, aliases=None):
+    """
+    Conjunto de nombres normalizados a conservar (None = todas las columnas).
+    Incluye los alias de cada columna para aceptar otras versiones de IPRESS.
+    """
+    if columns is None:
+        return None
+    return expand_aliases(columns, aliases)
+
+def _normalize_chunk(df):
+    """
+    Homogeniza tipos entre bloques: coordenadas numéricas y el resto como texto.
+    Así todos los bloques (y todas las fuentes) tienen el mismo esquema.
+    """
+    coord_keys = expand_aliases(COORD_COLUMNS)
+    for c in df.columns:
+        if _norm(c) in coord_keys:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+        else:
+            df[c] = df[c].astype(str).where(df[c].notna(), None)
+    return df
+
+def _sniff_csv(filepath):
+    """Detecta codificación y separador (como en el notebook: utf-8-sig o latin1, ',' o ';')."""
+    for encoding in ("utf-8-sig", "latin1"):
+        try:
+            with open(filepath, encoding=encoding) as f:
+                header = f.readline()
+            break
+        except UnicodeDecodeError:
+            continue
+    sep = ";" if header.count(";") > header.count(",") else ","
+    return encoding, sep
+
+def _iter_csv(filepath, wanted, chunksize):
+    encoding, sep = _sniff_csv(filepath)
+    usecols = None if wanted is None else (lambda c: _norm(c) in wanted)
+    reader = pd.read_csv(
+        filepath,
+        sep=sep,
+        encoding=encoding,
+        usecols=usecols,
+        dtype=str,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        yield chunk
+
+def _iter_parquet(filepath, wanted, chunksize):
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(filepath)
+    names = pf.schema_arrow.names
+    cols = names if wanted is None else [c for c in names if _norm(c) in wanted]
+    for batch in pf.iter_batches(batch_size=chunksize, columns=cols):
+        yield batch.to_pandas()
+
+def _iter_xlsx(filepath, wanted, chunksize):
+    """Lectura en modo streaming (openpyxl read_only): solo se materializan 'chunksize' filas."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        idx = [i for i, h in enumerate(header)
+               if h is not None and (wanted is None or _norm(h) in wanted)]
+        names = [str(header[i]) for i in idx]
+
+        buffer = []
+        for row in rows:
+            buffer.append([row[i] if i < len(row) else None for i in idx])
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=names)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=names)
+    finally:
+        wb.close()
+
+def _iter_xls(filepath, wanted, chunksize):
+    # El formato .xls antiguo no permite lectura por bloques: se lee una vez,
+    # pero solo con las columnas necesarias.
+    usecols = None if wanted is None else (lambda c: _norm(c) in wanted)
+    df = pd.read_excel(filepath, sheet_name=0, usecols=usecols)
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize].copy()
+
+_READERS = {
+    ".csv": _iter_csv,
+    ".txt": _iter_csv,
+    ".parquet": _iter_parquet,
+    ".xlsx": _iter_xlsx,
+    ".xlsm": _iter_xlsx,
+    ".xls": _iter_xls,
+}
+
+def iter_ipress_chunks(filepaths, columns=IPRESS_COLUMNS, chunksize=DEFAULT_CHUNKSIZE,
+                       aliases=None):
+    """
+    Lee uno o varios archivos IPRESS (Excel, CSV o Parquet) por bloques de filas.
+
+    Args:
+        filepaths: ruta o lista de rutas (registro actual + snapshots históricos)
+        columns: columnas a parsear (comparación case-insensible); None = todas
+        chunksize: número de filas por bloque
+        aliases: alias adicionales {canónico: [nombres]} (ver schema.COLUMN_ALIASES)
+
+    Yields:
+        DataFrame con como máximo 'chunksize' filas y solo las columnas pedidas
+    """
+    if isinstance(filepaths, (str, os.PathLike)):
+        filepaths = [filepaths]
+    wanted = _wanted(columns, aliases)
+
+    for filepath in filepaths:
+        ext = os.path.splitext(str(filepath))[1].lower()
+        reader = _READERS.get(ext)
+        if reader is None:
+            raise ValueError(f"Formato no soportado para IPRESS: '{ext}' ({filepath})")
+        for chunk in reader(filepath, wanted, chunksize):
+            yield _normalize_chunk(chunk)
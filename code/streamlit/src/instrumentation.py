@@ -0,0 +1,460 @@
+"""
+Instrumentación de las etapas de carga y análisis: cada etapa registra su
+duración, las filas de entrada y de salida, la memoria pico y sus
+diagnósticos (lo que antes se imprimía en la terminal), y el registro se
+envía a los destinos configurados.
+
+    with stage("ipress.load", rows_in=len(df)) as s:
+        ...
+        s.note("departamentos", n)
+        s.rows_out = len(gdf)
+
+    @instrumented("districts.merge", rows_in=lambda gdf_h, gdf_d: len(gdf_h))
+    def merge(...): ...
+
+Destinos: LoggerSink (por defecto; logger 'hospitals'), JsonLinesSink (un
+JSON por etapa, también con la variable de entorno HOSPITALS_INSTRUMENTATION)
+y MemorySink. collect() junta además los registros del hilo actual (una
+ejecución del dashboard).
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+
+try:
+    import resource
+except ImportError:
+    # Windows: sin getrusage (ni /proc) no se mide la memoria
+    resource = None
+
+# Archivo JSON lines al que se agregan todos los registros (opcional)
+ENV_JSONL = "HOSPITALS_INSTRUMENTATION"
+
+LOGGER_NAME = "hospitals"
+
+# ---------------------------------------------------------------------------
+# Memoria
+# ---------------------------------------------------------------------------
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss():
+    """Memoria residente del proceso en bytes (None si /proc no está disponible)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _max_rss():
+    """Máximo de memoria residente del proceso desde que arrancó (bytes; None sin 'resource')."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo reporta en KB y macOS en bytes
+    return usage if sys.platform == "darwin" else usage * 1024
+
+class PeakMemory:
+    """
+    Memoria pico de un bloque de código, muestreando la memoria residente en
+    un hilo aparte cada 'interval' segundos (tracemalloc haría las etapas
+    varias veces más lentas y no ve la memoria de GEOS ni de pyproj).
+
+    La memoria es la del proceso: con varias sesiones del dashboard a la vez
+    el pico incluye lo que hacen los otros hilos. Sin /proc se usa el máximo
+    del proceso (ru_maxrss), que solo aumenta: el pico de una etapa queda
+    bien medido solo si supera a los anteriores. Sin ninguno de los dos
+    (Windows) peak_mb y delta_mb son None.
+
+        with PeakMemory() as mem:
+            ...
+        mem.peak_mb, mem.delta_mb
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def __enter__(self):
+        self.start = current_rss()
+        if self.start is None:
+            self.start = self.peak = _max_rss()
+        else:
+            self.peak = self.start
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, current_rss() or 0)
+        elif self.peak is not None:
+            self.peak = max(self.peak, _max_rss())
+        return False
+
+    @property
+    def peak_mb(self):
+        return None if self.peak is None else self.peak / 2**20
+
+    @property
+    def delta_mb(self):
+        return None if self.peak is None else (self.peak - self.start) / 2**20
+
+# ---------------------------------------------------------------------------
+# Registros y destinos
+# ---------------------------------------------------------------------------
+
+@dataclass
+class StageRecord:
+    """Resultado de una etapa instrumentada."""
+    name: str
+    started: float
+    seconds: float = 0.0
+    rows_in: int = None
+    rows_out: int = None
+    peak_mb: float = None
+    delta_mb: float = None
+    parent: str = None
+    depth: int = 0
+    thread: str = None
+    notes: dict = field(default_factory=dict)
+    warnings: list = field(default_factory=list)
+    error: str = None
+
+    def as_dict(self):
+        return asdict(self)
+
+    def summary(self):
+        """Una línea legible: duración, filas, memoria y diagnósticos."""
+        parts = [f"{self.seconds:.2f} s"]
+        if self.rows_in is not None or self.rows_out is not None:
+            rows_in = "?" if self.rows_in is None else f"{self.rows_in:,}"
+            rows_out = "?" if self.rows_out is None else f"{self.rows_out:,}"
+            parts.append(f"filas {rows_in} -> {rows_out}")
+        if self.peak_mb is not None:
+            parts.append(f"pico {self.peak_mb:.0f} MB (+{self.delta_mb:.0f})")
+        text = f"{self.name}: {', '.join(parts)}"
+        if self.notes:
+            text += " | " + ", ".join(f"{k}={v}" for k, v in self.notes.items())
+        return text
+
+class LoggerSink:
+    """
+    Envía cada registro a un logger: una línea INFO por etapa, sus
+    advertencias como WARNING y el error (si lo hubo) como ERROR.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger or default_logger()
+
+    def emit(self, record):
+        for message in record.warnings:
+            self.logger.warning(f"{record.name}: {message}")
+        if record.error:
+            self.logger.error(f"{record.name}: {record.error}")
+        self.logger.info(record.summary())
+
+class JsonLinesSink:
+    """Agrega cada registro como una línea JSON a 'path'."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def emit(self, record):
+        line = json.dumps(record.as_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+class MemorySink:
+    """Guarda los últimos 'maxlen' registros en memoria."""
+
+    def __init__(self, maxlen=1000):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    @property
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+def default_logger():
+    """
+    Logger 'hospitals'. Si la aplicación no configuró logging, los mensajes
+    se escriben en la terminal (como los print que reemplaza).
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    return logger
+
+_sinks = []
+_sinks_lock = threading.Lock()
+_local = threading.local()
+
+def _default_sinks():
+    sinks = [LoggerSink()]
+    path = os.environ.get(ENV_JSONL)
+    if path:
+        sinks.append(JsonLinesSink(path))
+    return sinks
+
+_sinks.extend(_default_sinks())
+
+def configure(sinks):
+    """Reemplaza los destinos de todos los registros (lista vacía = ninguno)."""
+    with _sinks_lock:
+        _sinks[:] = list(sinks)
+
+def add_sink(sink):
+    """Agrega un destino (cualquier objeto con emit(record))."""
+    with _sinks_lock:
+        _sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+def _emit(record):
+    with _sinks_lock:
+        sinks = list(_sinks) + [c.sink for c in getattr(_local, "collectors", ())]
+    for sink in sinks:
+        try:
+            sink.emit(record)
+        except Exception as e:
+            # Un destino que falla no debe interrumpir el análisis (al logger
+            # y no a warn(), que volvería a pasar por los destinos)
+            default_logger().warning(f"Instrumentación: error en {type(sink).__name__}: {e}")
+
+class collect:
+    """
+    Junta en un MemorySink los registros de las etapas que corren en el hilo
+    actual, además de enviarlos a los destinos globales. En el dashboard se
+    usa una por ejecución del script.
+
+    Como contexto ('with collect() as sink') o con start()/stop() cuando el
+    bloque no se puede envolver. Con 'key', start() reemplaza al colector con
+    la misma clave que haya quedado activo en el hilo sin llamar a stop().
+    """
+
+    def __init__(self, maxlen=1000, key=None):
+        self.sink = MemorySink(maxlen)
+        self.key = key
+
+    def start(self):
+        collectors = getattr(_local, "collectors", None)
+        if collectors is None:
+            collectors = _local.collectors = []
+        if self.key is not None:
+            collectors[:] = [c for c in collectors if c.key != self.key]
+        collectors.append(self)
+        return self.sink
+
+    def stop(self):
+        collectors = getattr(_local, "collectors", [])
+        if self in collectors:
+            collectors.remove(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+# ---------------------------------------------------------------------------
+# Etapas
+# ---------------------------------------------------------------------------
+
+class stage:
+    """
+    Contexto que mide una etapa y envía su StageRecord al terminar (también
+    si la etapa falla; el error queda en record.error y la excepción sigue).
+
+    Dentro del bloque se pueden fijar rows_in / rows_out y agregar
+    diagnósticos con note(), warn() y fail(). Las etapas anidadas registran
+    a su etapa padre.
+
+    Args:
+        name: nombre de la etapa ('modulo.etapa')
+        rows_in: filas de entrada (si se conocen al empezar)
+        track_memory: medir la memoria pico (un hilo de muestreo por etapa)
+    """
+
+    def __init__(self, name, rows_in=None, track_memory=True):
+        self.record = StageRecord(name=name, started=time.time(), rows_in=rows_in)
+        self.track_memory = track_memory
+        self._memory = None
+        self._start = None
+
+    @property
+    def rows_in(self):
+        return self.record.rows_in
+
+    @rows_in.setter
+    def rows_in(self, value):
+        self.record.rows_in = None if value is None else int(value)
+
+    @property
+    def rows_out(self):
+        return self.record.rows_out
+
+    @rows_out.setter
+    def rows_out(self, value):
+        self.record.rows_out = None if value is None else int(value)
+
+    def note(self, key, value):
+        """Agrega un diagnóstico (clave -> valor) al registro."""
+        self.record.notes[key] = value
+
+    def warn(self, message):
+        """Agrega una advertencia al registro."""
+        self.record.warnings.append(message)
+
+    def fail(self, message):
+        """Marca la etapa como fallida (para errores que se manejan sin excepción)."""
+        self.record.error = message
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        if stack:
+            self.record.parent = stack[-1].record.name
+            self.record.depth = len(stack)
+        self.record.thread = threading.current_thread().name
+        stack.append(self)
+        if self.track_memory:
+            self._memory = PeakMemory().__enter__()
+        self.record.started = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record.seconds = time.perf_counter() - self._start
+        if self._memory is not None:
+            self._memory.__exit__(exc_type, exc, tb)
+            if self._memory.peak_mb is not None:
+                self.record.peak_mb = round(self._memory.peak_mb, 1)
+                self.record.delta_mb = round(self._memory.delta_mb, 1)
+        if exc is not None:
+            self.record.error = f"{exc_type.__name__}: {exc}"
+        _local.stack.remove(self)
+        _emit(self.record)
+        return False
+
+def current_stage():
+    """Etapa en curso en este hilo (None si no hay)."""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+def note(key, value):
+    """
+    Agrega un diagnóstico a la etapa en curso. Fuera de una etapa se envía
+    directamente al logger (p. ej. al llamar una función desde un script).
+    """
+    current = current_stage()
+    if current is not None:
+        current.note(key, value)
+    else:
+        default_logger().info(f"{key}: {value}")
+
+def warn(message):
+    """Agrega una advertencia a la etapa en curso (o al logger, fuera de una etapa)."""
+    current = current_stage()
+    if current is not None:
+        current.warn(message)
+    else:
+        default_logger().warning(message)
+
+def _count_rows(value):
+    if value is None:
+        return None
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+def instrumented(name=None, rows_in=None, rows_out=_count_rows, track_memory=True):
+    """
+    Decorador que ejecuta la función dentro de stage(name).
+
+    Args:
+        name: nombre de la etapa (por defecto 'modulo.funcion')
+        rows_in: función que recibe los mismos argumentos y devuelve las
+            filas de entrada (None = no se registran)
+        rows_out: función que recibe el resultado y devuelve las filas de
+            salida (por defecto len(resultado))
+    """
+    def decorator(func):
+        stage_name = name or f"{func.__module__}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name, track_memory=track_memory) as s:
+                if rows_in is not None:
+                    s.rows_in = rows_in(*args, **kwargs)
+                result = func(*args, **kwargs)
+                if rows_out is not None and s.rows_out is None:
+                    s.rows_out = rows_out(result)
+                return result
+        return wrapper
+    return decorator
+
+def breakdown(records):
+    """
+    Tabla de los registros (uno por fila, en orden de inicio) para mostrar
+    en el dashboard: etapa con sangría por nivel, segundos, filas y memoria.
+    """
+    import pandas as pd
+
+    rows = []
+    for record in sorted(records, key=lambda r: r.started):
+        rows.append({
+            "Etapa": ("   " * (record.depth - 1) + "└ " if record.depth else "") + record.name,
+            "Segundos": round(record.seconds, 3),
+            "Filas entrada": record.rows_in,
+            "Filas salida": record.rows_out,
+            "Memoria pico (MB)": record.peak_mb,
+            "Δ memoria (MB)": record.delta_mb,
+            "Detalle": "; ".join(
+                [f"{k}={v}" for k, v in record.notes.items()] + record.warnings
+                + ([record.error] if record.error else [])
+            ),
+        })
+    return pd.DataFrame(rows)
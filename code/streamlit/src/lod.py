@@ -0,0 +1,164 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import geopandas as gpd
+import shapely
+
+from cache import cache_key, cache_path, default_cache_dir, prune_cache, read_cached_gdf, write_cached_gdf
+from instrumentation import note, stage, warn
+from spatial import district_fingerprint
+
+# Tolerancias de simplificación por nivel, en metros. El nivel 0 es la
+# geometría original; cada nivel siguiente tiene menos vértices.
+LOD_TOLERANCES = (0, 100, 500, 2_000, 8_000)
+
+METERS_PER_DEGREE = 111_320
+
+# Metros por píxel a zoom 0 en el ecuador (teselas web de 256 px)
+WEB_MERCATOR_M_PER_PX = 156_543.03
+
+# Pirámides recientes por huella de la capa
+_pyramids = OrderedDict()
+_MAX_PYRAMIDS = 4
+# Pirámides guardadas en disco (una por capa o subconjunto de distritos); se
+# eliminan las menos usadas
+MAX_DISK_PYRAMIDS = 8
+_lock = threading.Lock()
+
+def _level_column(level):
+    return f"lod_{level}"
+
+def _crs_units(gdf, meters):
+    """Convierte metros a unidades del CRS de la capa (grados si es geográfico)."""
+    if gdf.crs is not None and gdf.crs.is_geographic:
+        return meters / METERS_PER_DEGREE
+    return meters
+
+def _simplify(geoms, tolerance):
+    """
+    Simplificación que conserva la topología de la cobertura (los límites
+    compartidos entre distritos se simplifican igual a ambos lados). Si la
+    versión de shapely no la tiene o la capa no es una cobertura válida, se
+    simplifica cada polígono con preserve_topology=True.
+    """
+    if hasattr(shapely, "coverage_simplify"):
+        try:
+            return shapely.coverage_simplify(geoms, tolerance)
+        except Exception as e:
+            warn(f"coverage_simplify no disponible para esta capa ({e}); se usa simplify")
+    return shapely.simplify(geoms, tolerance, preserve_topology=True)
+
+def _build_levels(gdf_districts, tolerances):
+    geoms = gdf_districts.geometry.to_numpy()
+    levels = {}
+    previous = geoms
+    for level, meters in enumerate(tolerances):
+        if level == 0:
+            continue
+        simplified = _simplify(geoms, _crs_units(gdf_districts, meters))
+        # Un polígono muy pequeño puede colapsar: se conserva el nivel anterior
+        empty = shapely.is_empty(simplified) | shapely.is_missing(simplified)
+        simplified = np.where(empty, previous, simplified)
+        levels[level] = simplified
+        previous = simplified
+    return levels
+
+def build_pyramid(gdf_districts, tolerances=LOD_TOLERANCES, cache_dir=None):
+    """
+    Pirámide de geometrías simplificadas de los distritos (una por nivel de
+    'tolerances'), alineada fila a fila con 'gdf_districts'.
+
+    Se calcula una vez por capa: queda en memoria y en un GeoParquet en
+    '.cache/' junto al shapefile (una columna de geometría por nivel y la
+    columna UBIGEO_KEY, si existe, para identificar cada distrito). En disco
+    se conservan las MAX_DISK_PYRAMIDS pirámides usadas más recientemente.
+
+    Returns:
+        dict {nivel: array de geometrías}; el nivel 0 es la geometría original
+    """
+    tolerances = tuple(tolerances)
+    key = cache_key(district_fingerprint(gdf_districts), {"tolerances": tolerances})
+    with _lock:
+        levels = _pyramids.get(key)
+        if levels is not None:
+            _pyramids.move_to_end(key)
+            return levels
+
+    source = gdf_districts.attrs.get("source")
+    cache_dir = cache_dir or (default_cache_dir(source) if source else None)
+    path = cache_path(cache_dir, "districts-lod", key) if cache_dir else None
+
+    stored = read_cached_gdf(path) if path else None
+    if stored is not None and len(stored) == len(gdf_districts):
+        levels = {level: stored[_level_column(level)].to_numpy() for level in range(1, len(tolerances))}
+        os.utime(path)
+    else:
+        with stage("lod.build_pyramid", rows_in=len(gdf_districts)):
+            levels = _build_levels(gdf_districts, tolerances)
+            n_vertices = [int(shapely.get_num_coordinates(gdf_districts.geometry.to_numpy()).sum())]
+            n_vertices += [int(shapely.get_num_coordinates(levels[lv]).sum()) for lv in sorted(levels)]
+            note("vertices_por_nivel", n_vertices)
+        if path:
+            data = {}
+            if "UBIGEO_KEY" in gdf_districts.columns:
+                data["UBIGEO_KEY"] = gdf_districts["UBIGEO_KEY"].to_numpy()
+            for level, geoms in levels.items():
+                data[_level_column(level)] = gpd.GeoSeries(geoms, crs=gdf_districts.crs)
+            stored = gpd.GeoDataFrame(data, geometry=_level_column(1), crs=gdf_districts.crs)
+            if write_cached_gdf(stored, path):
+                prune_cache(cache_dir, "districts-lod", keep=path, recent=MAX_DISK_PYRAMIDS - 1)
+
+    levels = {0: gdf_districts.geometry.to_numpy(), **levels}
+    with _lock:
+        _pyramids[key] = levels
+        if len(_pyramids) > _MAX_PYRAMIDS:
+            _pyramids.popitem(last=False)
+    return levels
+
+def level_for_resolution(meters_per_pixel, tolerances=LOD_TOLERANCES):
+    """Nivel más simplificado cuya tolerancia no supera el tamaño de un píxel."""
+    level = 0
+    for i, meters in enumerate(tolerances):
+        if meters <= meters_per_pixel:
+            level = i
+    return level
+
+def level_for_size(gdf, width_px, tolerances=LOD_TOLERANCES):
+    """Nivel para dibujar la extensión completa de 'gdf' en 'width_px' píxeles de ancho."""
+    minx, miny, maxx, maxy = gdf.total_bounds
+    width = maxx - minx
+    if gdf.crs is not None and gdf.crs.is_geographic:
+        width *= METERS_PER_DEGREE * math.cos(math.radians((miny + maxy) / 2))
+    return level_for_resolution(width / max(width_px, 1), tolerances)
+
+def level_for_zoom(zoom, latitude=-9.2, tolerances=LOD_TOLERANCES):
+    """Nivel para un mapa web (Folium/Leaflet) a un nivel de zoom dado."""
+    meters_per_pixel = WEB_MERCATOR_M_PER_PX * math.cos(math.radians(latitude)) / 2 ** zoom
+    return level_for_resolution(meters_per_pixel, tolerances)
+
+def simplified(gdf_districts, width_px=None, zoom=None, level=None, tolerances=LOD_TOLERANCES):
+    """
+    Copia de 'gdf_districts' con la geometría del nivel adecuado de la
+    pirámide: el nivel explícito, el del zoom web o el del ancho en píxeles
+    (en ese orden de prioridad). Sin ninguno de ellos, devuelve la capa tal cual.
+    """
+    if level is None and zoom is not None:
+        level = level_for_zoom(zoom, tolerances=tolerances)
+    if level is None and width_px is not None:
+        level = level_for_size(gdf_districts, width_px, tolerances)
+    if not level or len(gdf_districts) == 0:
+        return gdf_districts
+    levels = build_pyramid(gdf_districts, tolerances)
+    gdf = gdf_districts.copy()
+    gdf[gdf.geometry.name] = gpd.GeoSeries(levels[level], index=gdf.index, crs=gdf.crs)
+    return gdf
+
+def simplified_geojson(gdf_districts, zoom, columns=None):
+    """GeoJSON de los distritos con la geometría del nivel para 'zoom' (para Folium)."""
+    gdf = simplified(gdf_districts, zoom=zoom)
+    if columns is not None:
+        gdf = gdf[list(columns) + [gdf.geometry.name]]
+    return gdf.to_json()
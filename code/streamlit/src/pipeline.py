@@ -0,0 +1,605 @@
+"""
+Pipeline sin interfaz: calcula todos los productos del dashboard (ingesta y
+reproyección de las capas, join de hospitales con distritos, proximidad,
+cobertura, resúmenes, mapas HTML y atlas) y los guarda como artefactos
+versionados en output/pipeline, con un manifest.json que el dashboard usa
+para leerlos en lugar de calcularlos.
+
+Cada etapa tiene una clave que combina el contenido de sus archivos fuente,
+las claves de las etapas de las que depende y sus parámetros: si la clave no
+cambió y el artefacto existe, la etapa se salta. Las etapas independientes
+se ejecutan en paralelo. Con --update, un nuevo IPRESS se aplica como diff
+sobre los artefactos anteriores (ver update_pipeline).
+
+Uso (desde code/streamlit/src):
+    python pipeline.py
+    python pipeline.py --only merged summary --workers 4
+    python pipeline.py --force
+    python pipeline.py --update --ipress nuevo/IPRESS.xlsx
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import instrumentation
+from cache import cache_key, file_hash, write_cached_gdf
+from context import DATA_DIRS, DATA_FILES, find_data_file
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_DIR = os.path.normpath(os.path.join(SRC_DIR, "..", "..", "..", "output", "pipeline"))
+MANIFEST_NAME = "manifest.json"
+
+# Incrementar cuando cambie la lógica de alguna etapa
+PIPELINE_VERSION = 1
+
+# Radios del dashboard (metros) y el de los mapas de proximidad pre-generados
+RADII = (5_000, 10_000, 20_000, 50_000)
+MAP_RADIUS = 10_000
+PROXIMITY_DEPARTMENTS = ("LIMA", "LORETO")
+
+# Versiones de cada artefacto que se conservan en disco
+KEEP_VERSIONS = 3
+
+def proximity_stage(radius):
+    """Nombre de la etapa de proximidad para un radio en metros."""
+    return f"proximity_{radius / 1000:g}km"
+
+def map_name(department, tipo, radius=MAP_RADIUS):
+    """Nombre del mapa HTML de proximidad (p. ej. 'lima_concentracion_10km')."""
+    sufijo = "aislado" if tipo == "aislado" else "concentracion"
+    return f"{department.lower()}_{sufijo}_{radius / 1000:g}km"
+
+# --- Etapas: funciones de nivel superior (se ejecutan en otros procesos) ---
+
+def _stage_hospitals(inputs, sources, params, path):
+    from estimation import load_and_filter_ipress
+    gdf = load_and_filter_ipress(sources[0])
+    if len(gdf) == 0:
+        raise RuntimeError(f"No se encontraron hospitales válidos en {sources[0]}")
+    return gdf
+
+def _stage_districts(inputs, sources, params, path):
+    from estimation import load_districts_shapefile
+    gdf = load_districts_shapefile(sources[0])
+    if gdf is None:
+        raise RuntimeError(f"No se pudo cargar {sources[0]}")
+    return gdf
+
+def _stage_ccpp(inputs, sources, params, path):
+    from estimation import assign_ccpp_districts, load_ccpp_shapefile
+    gdf = load_ccpp_shapefile(sources[0])
+    if gdf is None:
+        raise RuntimeError(f"No se pudo cargar {sources[0]}")
+    return assign_ccpp_districts(gdf, inputs["districts"])
+
+def _stage_merged(inputs, sources, params, path):
+    from estimation import merge_hospitals_with_districts
+    return merge_hospitals_with_districts(inputs["hospitals"], inputs["districts"])
+
+def _stage_proximity(inputs, sources, params, path):
+    from proximity import analyze_proximity_all_departments
+    # Las etapas de proximidad ya corren en paralelo entre sí: cada una en serie
+    return analyze_proximity_all_departments(inputs["ccpp"], inputs["hospitals"],
+                                             buffer_distance=params["radius"],
+                                             max_workers=1, use_cache=False)
+
+def _stage_coverage(inputs, sources, params, path):
+    from proximity import analyze_proximity_sweep
+    _, coverage = analyze_proximity_sweep(inputs["ccpp"], inputs["hospitals"], radii=params["radii"])
+    return coverage
+
+def _stage_nearest(inputs, sources, params, path):
+    from proximity import nearest_hospital_table
+    return nearest_hospital_table(inputs["ccpp"], inputs["hospitals"])
+
+def _extremes(resultado):
+    """Centro poblado más aislado y más concentrado de cada departamento."""
+    extremes = {}
+    for dept, group in resultado.groupby("Departamento"):
+        rows = {"aislado": group["NumHosp"].idxmin(), "concentrado": group["NumHosp"].idxmax()}
+        extremes[str(dept)] = {
+            tipo: {
+                "centro_poblado": str(group.at[row, "CentroPoblado"]),
+                "num_hosp": int(group.at[row, "NumHosp"]),
+                "lat": float(group.geometry[row].y),
+                "lon": float(group.geometry[row].x),
+            }
+            for tipo, row in rows.items()
+        }
+    return extremes
+
+def _stage_summary(inputs, sources, params, path):
+    merged = inputs["merged"]
+    top10 = merged.nlargest(10, "n_hospitales")
+    return {
+        "distritos": {
+            "total": int(len(merged)),
+            "total_hospitales": int(merged["n_hospitales"].sum()),
+            "con_hospitales": int((merged["n_hospitales"] > 0).sum()),
+            "sin_hospitales": int((merged["n_hospitales"] == 0).sum()),
+        },
+        "top10": [
+            {"distrito": str(d), "n_hospitales": int(n)}
+            for d, n in zip(top10.get("DISTRITO_NORM", top10.index), top10["n_hospitales"])
+        ],
+        "extremos": {
+            f"{radius / 1000:g}km": _extremes(inputs[proximity_stage(radius)])
+            for radius in params["radii"]
+        },
+    }
+
+def _stage_maps(inputs, sources, params, path):
+    from plots import create_ccpp_proximity_map, create_national_hospital_map
+    from proximity import proximity_for_department
+
+    os.makedirs(path)
+    hospitals = inputs["hospitals"]
+    create_national_hospital_map(hospitals).save(os.path.join(path, "hospitales_nacional.html"))
+
+    resultado = inputs[proximity_stage(params["radius"])]
+    for dept in params["departments"]:
+        resultado_dept, hosp_dept = proximity_for_department(resultado, hospitals, dept)
+        if resultado_dept is None:
+            continue
+        puntos = {
+            "aislado": resultado_dept.loc[resultado_dept["NumHosp"].idxmin()],
+            "concentrado": resultado_dept.loc[resultado_dept["NumHosp"].idxmax()],
+        }
+        for tipo, punto in puntos.items():
+            m = create_ccpp_proximity_map(resultado_dept, hosp_dept, dept, punto, tipo=tipo,
+                                          buffer_distance=params["radius"])
+            m.save(os.path.join(path, f"{map_name(dept, tipo, params['radius'])}.html"))
+    return sorted(os.listdir(path))
+
+def _stage_atlas(inputs, sources, params, path):
+    from atlas import export_atlas
+    # El atlas tiene su propia carpeta (output/atlas) y su propio pool de procesos
+    return export_atlas(inputs["hospitals"], inputs["merged"])
+
+def build_stages(radii=RADII):
+    """
+    Grafo de etapas: nombre -> dict con la función, las etapas de las que
+    depende ('deps'), los archivos fuente ('sources', claves de DATA_FILES),
+    los parámetros, el tipo de artefacto ('gdf', 'df', 'json' o 'dir') y si
+    puede correr en el pool de procesos ('pool').
+    """
+    radii = tuple(sorted(radii))
+    map_radius = MAP_RADIUS if MAP_RADIUS in radii else radii[0]
+    stages = {
+        "hospitals": dict(func=_stage_hospitals, sources=("hospitals",), kind="gdf"),
+        "districts": dict(func=_stage_districts, sources=("districts",), kind="gdf"),
+        "ccpp": dict(func=_stage_ccpp, deps=("districts",), sources=("ccpp",), kind="gdf"),
+        "merged": dict(func=_stage_merged, deps=("hospitals", "districts"), kind="gdf"),
+        "coverage": dict(func=_stage_coverage, deps=("ccpp", "hospitals"), kind="df",
+                         params={"radii": list(radii)}),
+        "nearest": dict(func=_stage_nearest, deps=("ccpp", "hospitals"), kind="df"),
+    }
+    for radius in radii:
+        stages[proximity_stage(radius)] = dict(func=_stage_proximity, deps=("ccpp", "hospitals"),
+                                               kind="gdf", params={"radius": radius})
+    stages["summary"] = dict(func=_stage_summary, kind="json", params={"radii": list(radii)},
+                             deps=("merged",) + tuple(proximity_stage(r) for r in radii))
+    stages["maps"] = dict(func=_stage_maps, kind="dir",
+                          deps=("hospitals", proximity_stage(map_radius)),
+                          params={"radius": map_radius, "departments": list(PROXIMITY_DEPARTMENTS)})
+    stages["atlas"] = dict(func=_stage_atlas, deps=("hospitals", "merged"), kind="json", pool=False)
+
+    for stage in stages.values():
+        stage.setdefault("deps", ())
+        stage.setdefault("sources", ())
+        stage.setdefault("params", {})
+        stage.setdefault("pool", True)
+    return stages
+
+def find_sources(paths=None, data_dirs=DATA_DIRS):
+    """Rutas de los archivos fuente (DATA_FILES), con las de 'paths' por encima."""
+    paths = dict(paths or {})
+    for name, filename in DATA_FILES.items():
+        if not paths.get(name):
+            try:
+                paths[name] = find_data_file(filename, data_dirs)
+            except FileNotFoundError:
+                paths[name] = None
+    return paths
+
+def _source_hashes(path):
+    # Para un shapefile cuentan todas sus partes (.dbf, .prj...)
+    from vector import _source_hash
+    return _source_hash(path) if path.lower().endswith(".shp") else [file_hash(path)]
+
+def stage_keys(stages, sources):
+    """
+    Clave de cada etapa (no necesita ejecutar nada): hash de sus archivos
+    fuente + claves de sus dependencias + parámetros. None si falta un
+    archivo fuente de la etapa o de alguna dependencia.
+    """
+    hashes = {name: _source_hashes(path) for name, path in sources.items() if path and os.path.exists(path)}
+    keys = {}
+    for name in _topological_order(stages):
+        stage = stages[name]
+        if any(s not in hashes for s in stage["sources"]) or any(keys[d] is None for d in stage["deps"]):
+            keys[name] = None
+            continue
+        keys[name] = cache_key(
+            [name, [hashes[s] for s in stage["sources"]], [keys[d] for d in stage["deps"]]],
+            {"params": stage["params"], "pipeline": PIPELINE_VERSION},
+        )
+    return keys
+
+def _topological_order(stages):
+    order = []
+    done = set()
+    pending = list(stages)
+    while pending:
+        ready = [n for n in pending if all(d in done for d in stages[n]["deps"])]
+        if not ready:
+            raise ValueError(f"Dependencias circulares o desconocidas en: {pending}")
+        for name in ready:
+            order.append(name)
+            done.add(name)
+            pending.remove(name)
+    return order
+
+def load_manifest(output_dir=PIPELINE_DIR):
+    """Manifest del pipeline (None si todavía no se ejecutó)."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_manifest(manifest, output_dir):
+    tmp_path = os.path.join(output_dir, f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_NAME))
+
+_EXTENSIONS = {"gdf": ".parquet", "df": ".parquet", "json": ".json", "dir": ""}
+
+def _artifact_path(output_dir, name, key, kind):
+    return os.path.join(output_dir, "artifacts", f"{name}-{key[:16]}{_EXTENSIONS[kind]}")
+
+def read_artifact(path, kind, source=None):
+    """Lee un artefacto del tipo dado ('source' se restaura en attrs de los GeoDataFrame)."""
+    if kind == "gdf":
+        import geopandas as gpd
+        from schema import attach_schema, resolve_schema
+
+        gdf = gpd.read_parquet(path)
+        if source:
+            gdf.attrs["source"] = source
+        return attach_schema(gdf, resolve_schema(gdf))
+    if kind == "df":
+        import pandas as pd
+
+        df = pd.read_parquet(path)
+        # Los nombres de columna numéricos se guardan como texto
+        try:
+            df.columns = df.columns.astype(float)
+        except ValueError:
+            pass
+        return df
+    if kind == "json":
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {os.path.splitext(f)[0]: os.path.join(path, f) for f in sorted(os.listdir(path))}
+
+def _write_artifact(value, path, kind):
+    """Escritura atómica (archivo o carpeta temporal + rename)."""
+    if kind == "gdf":
+        if not write_cached_gdf(value, path):
+            raise RuntimeError(f"No se pudo escribir {path}")
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if kind == "df":
+        value = value.copy()
+        value.columns = value.columns.map(str).rename(value.columns.name)
+        value.to_parquet(tmp_path)
+    elif kind == "json":
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+def _run_stage(job):
+    """
+    Ejecuta una etapa: lee los artefactos de sus dependencias, calcula y
+    escribe el suyo.
+
+    Returns:
+        (nombre, segundos, filas o None, source de la capa o None)
+    """
+    name, func, inputs, sources, params, path, kind = job
+    with instrumentation.stage(f"pipeline.{name}") as s:
+        values = {dep: read_artifact(*spec) for dep, spec in inputs.items()}
+        if kind == "dir":
+            # La etapa escribe en una carpeta temporal que se renombra al final
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            try:
+                func(values, sources, params, tmp_path)
+            except Exception:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+            value = None
+        else:
+            value = func(values, sources, params, path)
+            _write_artifact(value, path, kind)
+        rows = len(value) if hasattr(value, "shape") else None
+        s.rows_out = rows
+    source = getattr(value, "attrs", {}).get("source")
+    return name, s.record.seconds, rows, source
+
+def _prune_versions(output_dir, name, keep_path, keep=KEEP_VERSIONS):
+    """Deja solo las 'keep' versiones más recientes del artefacto 'name'."""
+    folder = os.path.join(output_dir, "artifacts")
+    versions = [os.path.join(folder, f) for f in os.listdir(folder)
+                if f.rsplit("-", 1)[0] == name and not f.endswith(".tmp")]
+    versions.sort(key=os.path.getmtime, reverse=True)
+    for path in versions[keep:]:
+        if path == keep_path:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+def _manifest_entry(output_dir, path, key, kind, seconds, rows, source):
+    return {
+        "key": key,
+        "file": os.path.relpath(path, output_dir),
+        "kind": kind,
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": round(seconds, 2),
+        "rows": rows,
+        "source": source,
+    }
+
+@instrumentation.instrumented("pipeline.run", rows_out=None)
+def run_pipeline(sources=None, output_dir=PIPELINE_DIR, radii=RADII, only=None, force=False,
+                 max_workers=None):
+    """
+    Ejecuta las etapas que no están al día, por olas: cada ola contiene las
+    etapas cuyas dependencias ya terminaron y se ejecuta en un pool de
+    procesos (las etapas con pool=False, como el atlas, corren en este
+    proceso mientras tanto).
+
+    Args:
+        sources: {nombre de DATA_FILES: ruta} (por defecto, carpeta data/)
+        output_dir: carpeta de artefactos
+        radii: radios de proximidad en metros
+        only: etapas a producir (y sus dependencias); None = todas
+        force: volver a ejecutar aunque estén al día
+        max_workers: procesos (None = núcleos disponibles; 1 = sin pool)
+
+    Returns:
+        dict con el manifest escrito
+    """
+    os.makedirs(os.path.join(output_dir, "artifacts"), exist_ok=True)
+    stages = build_stages(radii)
+    sources = find_sources(sources)
+    keys = stage_keys(stages, sources)
+
+    wanted = set(only or stages)
+    unknown = wanted - set(stages)
+    if unknown:
+        raise ValueError(f"Etapas desconocidas: {sorted(unknown)}")
+    pending_deps = list(wanted)
+    while pending_deps:
+        for dep in stages[pending_deps.pop()]["deps"]:
+            if dep not in wanted:
+                wanted.add(dep)
+                pending_deps.append(dep)
+
+    missing = sorted(n for n in wanted if keys[n] is None)
+    if missing:
+        absent = sorted(name for name, path in sources.items() if not path)
+        raise FileNotFoundError(f"Faltan archivos fuente {absent} para las etapas {missing}")
+
+    previous = load_manifest(output_dir) or {}
+    entries = dict(previous.get("stages", {}))
+
+    def up_to_date(name):
+        entry = entries.get(name)
+        return (not force and entry is not None and entry["key"] == keys[name]
+                and os.path.exists(os.path.join(output_dir, entry["file"])))
+
+    done = {n for n in wanted if up_to_date(n)}
+    for name in sorted(done):
+        instrumentation.note(name, "al día")
+    pending = [n for n in _topological_order(stages) if n in wanted and n not in done]
+
+    def job(name):
+        stage = stages[name]
+        path = _artifact_path(output_dir, name, keys[name], stage["kind"])
+        inputs = {
+            dep: (os.path.join(output_dir, entries[dep]["file"]), stages[dep]["kind"], entries[dep].get("source"))
+            for dep in stage["deps"]
+        }
+        stage_sources = [sources[s] for s in stage["sources"]]
+        return (name, stage["func"], inputs, stage_sources, stage["params"], path, stage["kind"])
+
+    pool = None
+    if max_workers != 1 and len(pending) > 1:
+        try:
+            pool = ProcessPoolExecutor(max_workers=max_workers)
+        except (OSError, NotImplementedError) as e:
+            instrumentation.warn(f"Pool de procesos no disponible ({e}); las etapas corren en serie")
+    try:
+        while pending:
+            wave = [n for n in pending if all(d in done for d in stages[n]["deps"])]
+            jobs = {name: job(name) for name in wave}
+            results = []
+            futures = {}
+            if pool is not None:
+                try:
+                    futures = {name: pool.submit(_run_stage, jobs[name]) for name in wave if stages[name]["pool"]}
+                except (BrokenProcessPool, RuntimeError) as e:
+                    instrumentation.warn(f"Pool de procesos no disponible ({e}); las etapas corren en serie")
+                    pool, futures = None, {}
+            results += [_run_stage(jobs[name]) for name in wave if name not in futures]
+            for name, future in futures.items():
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool as e:
+                    instrumentation.warn(f"Pool de procesos no disponible ({e}); la etapa {name} corre en serie")
+                    pool = None
+                    results.append(_run_stage(jobs[name]))
+
+            for name, seconds, rows, source in results:
+                path = jobs[name][5]
+                entries[name] = _manifest_entry(output_dir, path, keys[name], stages[name]["kind"],
+                                                seconds, rows, source)
+                _prune_versions(output_dir, name, path)
+                done.add(name)
+                pending.remove(name)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        manifest = {"pipeline": PIPELINE_VERSION, "radii": list(radii), "stages": entries}
+        _write_manifest(manifest, output_dir)
+
+    instrumentation.note("carpeta", output_dir)
+    return manifest
+
+# Etapas que la actualización incremental corrige a partir de su artefacto anterior
+INCREMENTAL_STAGES = ("hospitals", "merged")
+
+@instrumentation.instrumented("pipeline.update", rows_out=None)
+def update_pipeline(sources=None, output_dir=PIPELINE_DIR, radii=RADII, only=None, max_workers=None):
+    """
+    Actualiza los artefactos con un nuevo snapshot de IPRESS sin recalcular
+    todo: compara el artefacto 'hospitals' anterior con el archivo nuevo
+    (incremental.diff_snapshots) y corrige solo los conteos afectados de
+    'merged' y de las etapas de proximidad. Después run_pipeline recalcula
+    las etapas que dependen de ellas (cobertura, resumen, mapas, atlas).
+
+    Si falta algún artefacto anterior, o si cambiaron los distritos o los
+    centros poblados, se ejecuta el pipeline completo.
+
+    Args:
+        sources, output_dir, radii, only, max_workers: como en run_pipeline
+
+    Returns:
+        dict con el manifest escrito
+    """
+    from incremental import diff_snapshots, update_district_counts, update_proximity_counts
+    from proximity import build_point_index
+
+    stages = build_stages(radii)
+    sources = find_sources(sources)
+    keys = stage_keys(stages, sources)
+    manifest = load_manifest(output_dir) or {}
+    entries = dict(manifest.get("stages", {}))
+    targets = INCREMENTAL_STAGES + tuple(proximity_stage(r) for r in radii)
+
+    def exists(name):
+        entry = entries.get(name)
+        return entry is not None and os.path.exists(os.path.join(output_dir, entry["file"]))
+
+    def current(name):
+        return exists(name) and keys[name] is not None and entries[name]["key"] == keys[name]
+
+    def read(name):
+        entry = entries[name]
+        return read_artifact(os.path.join(output_dir, entry["file"]), entry["kind"], entry.get("source"))
+
+    if keys["hospitals"] is not None and not current("hospitals"):
+        if not (all(exists(n) for n in targets) and current("districts") and current("ccpp")):
+            instrumentation.warn("Sin artefactos anteriores compatibles: se ejecuta el pipeline completo")
+            return run_pipeline(sources, output_dir, radii=radii, only=only, max_workers=max_workers)
+
+        old = read("hospitals")
+        with instrumentation.stage("pipeline.hospitals") as s:
+            new = _stage_hospitals({}, [sources["hospitals"]], {}, None)
+        updated = {"hospitals": (new, s.record.seconds)}
+        diff = diff_snapshots(old, new)
+
+        with instrumentation.stage("pipeline.merged") as s:
+            merged = update_district_counts(read("merged"), diff, read("districts"))
+        updated["merged"] = (merged, s.record.seconds)
+
+        gdf_ccpp = read("ccpp")
+        ccpp_index = build_point_index(gdf_ccpp)
+        for radius in radii:
+            name = proximity_stage(radius)
+            with instrumentation.stage(f"pipeline.{name}") as s:
+                resultado = update_proximity_counts(read(name), gdf_ccpp, diff, buffer_distance=radius,
+                                                    ccpp_index=ccpp_index)
+            updated[name] = (resultado, s.record.seconds)
+
+        for name, (value, seconds) in updated.items():
+            kind = stages[name]["kind"]
+            path = _artifact_path(output_dir, name, keys[name], kind)
+            _write_artifact(value, path, kind)
+            source = value.attrs.get("source") or entries[name].get("source")
+            entries[name] = _manifest_entry(output_dir, path, keys[name], kind, seconds, len(value), source)
+            _prune_versions(output_dir, name, path)
+        _write_manifest({"pipeline": PIPELINE_VERSION, "radii": list(radii), "stages": entries}, output_dir)
+        instrumentation.note("diferencias", diff.summary())
+
+    return run_pipeline(sources, output_dir, radii=radii, only=only, max_workers=max_workers)
+
+def load_artifact(name, output_dir=PIPELINE_DIR, manifest=None, keys=None):
+    """
+    Artefacto de la etapa 'name', o None si no existe o si 'keys' (ver
+    stage_keys) indica que los datos fuente cambiaron desde que se generó.
+    """
+    manifest = manifest or load_manifest(output_dir)
+    entry = (manifest or {}).get("stages", {}).get(name)
+    if entry is None:
+        return None
+    if keys is not None and keys.get(name) != entry["key"]:
+        instrumentation.warn(f"Artefacto {name} desactualizado: se vuelve a calcular")
+        return None
+    path = os.path.join(output_dir, entry["file"])
+    if not os.path.exists(path):
+        return None
+    return read_artifact(path, entry["kind"], entry.get("source"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcula y guarda todos los artefactos del dashboard.")
+    parser.add_argument("--ipress", help="archivo IPRESS (por defecto data/IPRESS.xlsx)")
+    parser.add_argument("--districts", help="shapefile de distritos")
+    parser.add_argument("--ccpp", help="shapefile de centros poblados")
+    parser.add_argument("--output", default=PIPELINE_DIR, help="carpeta de artefactos")
+    parser.add_argument("--radii", type=float, nargs="+", default=[r / 1000 for r in RADII],
+                        help="radios de proximidad en km")
+    parser.add_argument("--only", nargs="+", help="etapas a producir (con sus dependencias)")
+    parser.add_argument("--workers", type=int, default=None, help="número de procesos")
+    parser.add_argument("--force", action="store_true", help="volver a ejecutar todo")
+    parser.add_argument("--update", action="store_true",
+                        help="aplicar solo los cambios del nuevo IPRESS sobre los artefactos anteriores")
+    parser.add_argument("--list", action="store_true", help="mostrar las etapas y su estado")
+    args = parser.parse_args(argv)
+
+    sources = {"hospitals": args.ipress, "districts": args.districts, "ccpp": args.ccpp}
+    radii = tuple(int(r * 1000) for r in args.radii)
+    if args.list:
+        stages = build_stages(radii)
+        keys = stage_keys(stages, find_sources(sources))
+        entries = (load_manifest(args.output) or {}).get("stages", {})
+        for name in _topological_order(stages):
+            entry = entries.get(name)
+            if keys[name] is None:
+                status = "sin datos fuente"
+            elif entry is not None and entry["key"] == keys[name]:
+                status = f"al día ({entry['generated']})"
+            else:
+                status = "pendiente"
+            deps = ", ".join(stages[name]["deps"]) or "-"
+            print(f"{name:<16} {status:<32} depende de: {deps}")
+        return
+    if args.update:
+        update_pipeline(sources, args.output, radii=radii, only=args.only, max_workers=args.workers)
+        return
+    run_pipeline(sources, args.output, radii=radii, only=args.only, force=args.force,
+                 max_workers=args.workers)
+
+if __name__ == "__main__":
+    main()
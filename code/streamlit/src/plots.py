@@ -1,28 +1,236 @@
-import plotly.express as px
-import plotly.graph_objects as go
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import folium
-from folium import plugins
-import json
+import io
+import os
+import threading
+from collections import OrderedDict
 
-def create_hospital_map(gdf_hospitals, gdf_districts=None):
+import numpy as np
+import pandas as pd
+import shapely
+
+from cache import (
+    array_hash, cache_key, default_cache_dir, read_cached_bytes, write_cached_bytes,
+)
+from instrumentation import warn
+from schema import get_schema, normalize_values
+
+# Imágenes renderizadas recientes (clave: datos + función + parámetros)
+_render_cache = OrderedDict()
+_MAX_RENDERS = 32
+# Máximo de imágenes guardadas en disco (se eliminan las menos usadas)
+MAX_DISK_RENDERS = 200
+_render_lock = threading.Lock()
+
+def _figure_width_px(fig):
+    """Ancho de la figura en píxeles (elige el nivel de detalle de los polígonos)."""
+    return fig.get_size_inches()[0] * fig.dpi
+
+def data_hash(obj):
     """
-    Crea mapa interactivo de hospitales
+    Hash del contenido de un argumento de una función de mapa: para
+    (Geo)DataFrames, valores + índice + coordenadas de las geometrías;
+    para el resto, su representación.
+    """
+    if isinstance(obj, pd.DataFrame):
+        geom_cols = [c for c in obj.columns if str(obj[c].dtype) == "geometry"]
+        values = pd.util.hash_pandas_object(obj.drop(columns=geom_cols), index=True).to_numpy()
+        coords = [shapely.get_coordinates(obj[c].to_numpy()) for c in geom_cols]
+        return array_hash(values, *coords, np.array([str(c) for c in obj.columns]))
+    if isinstance(obj, pd.Series):
+        return array_hash(pd.util.hash_pandas_object(obj, index=True).to_numpy())
+    return repr(obj)
+
+def _render_dir(args):
+    for arg in args:
+        source = getattr(arg, "attrs", {}).get("source")
+        if source:
+            return os.path.join(default_cache_dir(source), "renders")
+    return None
+
+def _prune_renders(cache_dir, keep=MAX_DISK_RENDERS):
+    """Deja en disco solo las 'keep' imágenes usadas más recientemente."""
+    files = [os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.startswith("render-")]
+    if len(files) <= keep:
+        return
+    files.sort(key=os.path.getmtime, reverse=True)
+    for path in files[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def render_cached(func, *args, fmt="png", dpi=100, cache_dir=None, data_key=None, **kwargs):
+    """
+    Imagen (bytes PNG o SVG) de la figura de matplotlib que devuelve
+    func(*args, **kwargs), reutilizada mientras no cambien los datos, la
+    función ni sus parámetros. Las imágenes se guardan en memoria (LRU) y en
+    disco ('.cache/renders/' junto al shapefile de los datos, si se conoce).
+
+    Args:
+        func: función de este módulo que devuelve una figura de matplotlib
+        fmt: 'png' o 'svg'
+        dpi: resolución del PNG
+        cache_dir: carpeta de imágenes en disco (None = por defecto)
+        data_key: clave ya calculada de los (Geo)DataFrames de 'args' (p. ej.
+            el producto 'atlas_key' del contexto o spatial.district_fingerprint);
+            si se omite, se hashea su contenido en cada llamada
+
+    Returns:
+        bytes de la imagen, o None si la función no devolvió figura
     """
-    fig = px.scatter_mapbox(
-        gdf_hospitals,
-        lat=gdf_hospitals.geometry.y,
-        lon=gdf_hospitals.geometry.x,
-        hover_name='Nombre del establecimientos',
-        hover_data=['Departamento', 'Provincia', 'Distrito', 'Categoria'],
-        zoom=5,
-        height=600
+    if data_key is None:
+        arg_hashes = [data_hash(a) for a in args]
+    else:
+        arg_hashes = [data_key] + [data_hash(a) for a in args if not isinstance(a, (pd.DataFrame, pd.Series))]
+    key = cache_key(
+        [func.__module__, func.__qualname__] + arg_hashes,
+        {"kwargs": {k: data_hash(v) for k, v in sorted(kwargs.items())}, "fmt": fmt, "dpi": dpi},
     )
+    with _render_lock:
+        if key in _render_cache:
+            _render_cache.move_to_end(key)
+            return _render_cache[key]
+
+    cache_dir = cache_dir or _render_dir(args)
+    path = os.path.join(cache_dir, f"render-{func.__name__}-{key}.{fmt}") if cache_dir else None
+    image = read_cached_bytes(path) if path else None
+    if image is not None:
+        os.utime(path)
+    else:
+        import matplotlib.pyplot as plt
+        
+        fig = func(*args, **kwargs)
+        if fig is None:
+            return None
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight")
+        plt.close(fig)
+        image = buffer.getvalue()
+        if path and write_cached_bytes(image, path):
+            _prune_renders(cache_dir)
+
+    with _render_lock:
+        _render_cache[key] = image
+        if len(_render_cache) > _MAX_RENDERS:
+            _render_cache.popitem(last=False)
+    return image
+
+# Mapa Plotly de hospitales: por debajo de este zoom se envían celdas agregadas
+POINTS_MIN_ZOOM = 9
+# Lado de la celda de agregación en píxeles de pantalla (constante en cualquier zoom)
+GRID_CELL_PX = 24
+
+WEB_MERCATOR_M_PER_PX = 156_543.03
+_MERCATOR_R = 6_378_137.0
+
+# Agregaciones recientes por (coordenadas, zoom, celda)
+_grid_cache = OrderedDict()
+_MAX_GRIDS = 32
+_grid_lock = threading.Lock()
+
+def _mercator(lon, lat):
+    x = np.radians(lon) * _MERCATOR_R
+    y = np.arcsinh(np.tan(np.radians(np.clip(lat, -85.0511, 85.0511)))) * _MERCATOR_R
+    return x, y
+
+def _inverse_mercator(x, y):
+    return np.degrees(x / _MERCATOR_R), np.degrees(np.arctan(np.sinh(y / _MERCATOR_R)))
+
+def hospital_grid(gdf_hospitals, zoom, cell_px=GRID_CELL_PX):
+    """
+    Agrega los hospitales en una grilla cuadrada (Web Mercator) cuyo lado es
+    'cell_px' píxeles de pantalla al zoom dado: al alejar el mapa las celdas
+    crecen y su número baja. El resultado se guarda por zoom.
+    
+    Returns:
+        DataFrame con lat, lon (centro de la celda) y n_hospitales
+    """
+    lat, lon = _latlon(gdf_hospitals)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon = lat[valid], lon[valid]
+    
+    key = (array_hash(lat, lon), int(zoom), cell_px)
+    with _grid_lock:
+        if key in _grid_cache:
+            _grid_cache.move_to_end(key)
+            return _grid_cache[key]
+    
+    cell = cell_px * WEB_MERCATOR_M_PER_PX / 2 ** zoom
+    x, y = _mercator(lon, lat)
+    cells, counts = np.unique(np.column_stack([np.floor(x / cell), np.floor(y / cell)]).astype(np.int64),
+                              axis=0, return_counts=True)
+    cell_lon, cell_lat = _inverse_mercator((cells[:, 0] + 0.5) * cell, (cells[:, 1] + 0.5) * cell)
+    grid = pd.DataFrame({'lat': cell_lat, 'lon': cell_lon, 'n_hospitales': counts})
+    
+    with _grid_lock:
+        _grid_cache[key] = grid
+        if len(_grid_cache) > _MAX_GRIDS:
+            _grid_cache.popitem(last=False)
+    return grid
+
+def create_hospital_map(gdf_hospitals, gdf_districts=None, zoom=5, center=None, mode='auto'):
+    """
+    Crea mapa interactivo de hospitales
+    
+    Con zoom bajo se envían celdas agregadas con su conteo (ver hospital_grid)
+    en lugar de cada hospital; desde POINTS_MIN_ZOOM se envían todos los
+    puntos de 'gdf_hospitals' (Scattermapbox, WebGL) con sus datos de hover,
+    de modo que el mapa sigue completo si el usuario se desplaza o acerca en
+    el navegador. Para acotar los puntos, filtrar antes (p. ej. por
+    departamento).
+    
+    Args:
+        gdf_hospitals: GeoDataFrame de hospitales
+        gdf_districts: No se usa (compatibilidad)
+        zoom: Zoom del mapa
+        center: {'lat': ..., 'lon': ...} (por defecto, centro del Perú)
+        mode: 'auto', 'grid' (siempre agregado) o 'points' (siempre puntos)
+    
+    Returns:
+        fig: Figura de plotly
+    """
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
+    center = center or {"lat": -9.19, "lon": -75.0152}
+    aggregate = mode == 'grid' or (mode == 'auto' and zoom < POINTS_MIN_ZOOM)
+    
+    if aggregate:
+        grid = hospital_grid(gdf_hospitals, zoom)
+        fig = go.Figure(go.Scattermapbox(
+            lat=grid['lat'],
+            lon=grid['lon'],
+            mode='markers',
+            marker=dict(
+                size=np.clip(6 + 4 * np.sqrt(grid['n_hospitales']), 6, 40),
+                color=np.log1p(grid['n_hospitales']),
+                colorscale='Greens',
+                showscale=False,
+                opacity=0.8
+            ),
+            customdata=grid['n_hospitales'],
+            hovertemplate='%{customdata} hospitales<extra></extra>'
+        ))
+    else:
+        schema = get_schema(gdf_hospitals)
+        hover_data = [schema[c] for c in ('departamento', 'provincia', 'distrito', 'categoria') if c in schema]
+        lat, lon = _latlon(gdf_hospitals)
+        visible = gdf_hospitals[np.isfinite(lat) & np.isfinite(lon)]
+        
+        fig = px.scatter_mapbox(
+            visible,
+            lat=visible.geometry.y,
+            lon=visible.geometry.x,
+            hover_name=schema.get('nombre'),
+            hover_data=hover_data,
+            zoom=zoom,
+            height=600
+        )
     
     fig.update_layout(
         mapbox_style="open-street-map",
-        mapbox_center={"lat": -9.19, "lon": -75.0152},
+        mapbox_center=center,
+        mapbox_zoom=zoom,
+        height=600,
         margin={"r":0,"t":0,"l":0,"b":0}
     )
     
@@ -32,7 +240,10 @@ def create_department_bar(gdf_hospitals):
     """
     Gráfico de barras por departamento
     """
-    dept_counts = gdf_hospitals['Departamento'].dropna().value_counts().head(10)
+    import plotly.graph_objects as go
+    
+    col_dept = get_schema(gdf_hospitals).require('departamento')
+    dept_counts = gdf_hospitals[col_dept].dropna().value_counts().head(10)
     
     fig = go.Figure(data=[
         go.Bar(x=dept_counts.values, 
@@ -50,6 +261,89 @@ def create_department_bar(gdf_hospitals):
     
     return fig
 
+def create_coverage_curve_chart(coverage, departments=None):
+    """
+    Curvas de cobertura: proporción de centros poblados con al menos un
+    hospital dentro de cada radio.
+    
+    Args:
+        coverage: DataFrame (departamento x radio en km), ver proximity.coverage_curves
+        departments: Departamentos a graficar (None = todos)
+    
+    Returns:
+        fig: Figura de plotly
+    """
+    import plotly.graph_objects as go
+    
+    if departments:
+        coverage = coverage.loc[[d for d in departments if d in coverage.index]]
+    
+    fig = go.Figure()
+    for dept, row in coverage.iterrows():
+        fig.add_trace(go.Scatter(
+            x=row.index.astype(float),
+            y=row.values * 100,
+            mode='lines+markers',
+            name=str(dept)
+        ))
+    
+    fig.update_layout(
+        xaxis_title='Radio (km)',
+        yaxis_title='% de centros poblados con hospital',
+        yaxis=dict(range=[0, 100]),
+        height=400
+    )
+    
+    return fig
+
+def create_hex_density_map(density, value='hosp_por_ccpp', zoom=4.5):
+    """
+    Mapa coroplético sobre la grilla hexagonal: todas las celdas de una
+    resolución tienen la misma área, así el color no depende del tamaño
+    de los distritos.
+
+    Args:
+        density: DataFrame indexado por cell_id (ver hexgrid.density_table)
+        value: Columna a colorear ('hosp_por_ccpp', 'n_hospitales' o 'n_ccpp')
+        zoom: Zoom inicial del mapa
+
+    Returns:
+        fig: Figura de plotly
+    """
+    import plotly.graph_objects as go
+    from hexgrid import cell_polygons
+
+    cells = density[density[value].notna()]
+    polygons = cell_polygons(cells.index.to_numpy())
+    geojson = {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "id": str(cell_id), "geometry": shapely.geometry.mapping(geom)}
+            for cell_id, geom in zip(cells.index, polygons.to_numpy())
+        ]
+    }
+
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=geojson,
+        locations=cells.index.astype(str),
+        z=cells[value],
+        colorscale='YlOrRd',
+        marker_line_width=0,
+        marker_opacity=0.7,
+        customdata=cells[['n_hospitales', 'n_ccpp']],
+        hovertemplate='%{customdata[0]} hospitales / %{customdata[1]} centros poblados<extra></extra>'
+    ))
+
+    fig.update_layout(
+        mapbox_style="open-street-map",
+        mapbox_center={"lat": -9.19, "lon": -75.0152},
+        mapbox_zoom=zoom,
+        height=600,
+        margin={"r":0,"t":0,"l":0,"b":0}
+    )
+
+    return fig
+
 def create_static_choropleth_map(gdf_districts_with_counts, title="Hospitales por Distrito"):
     """
     Crea un mapa coroplético estático con matplotlib/geopandas.
@@ -61,8 +355,14 @@ def create_static_choropleth_map(gdf_districts_with_counts, title="Hospitales po
     Returns:
         fig: Figura de matplotlib
     """
+    import matplotlib.pyplot as plt
+    from lod import simplified
+    
     fig, ax = plt.subplots(1, 1, figsize=(10, 8))
     
+    # Geometrías simplificadas al tamaño de la figura
+    gdf_districts_with_counts = simplified(gdf_districts_with_counts, width_px=_figure_width_px(fig))
+    
     # Mapa coroplético
     gdf_districts_with_counts.plot(
         column='n_hospitales',
@@ -95,10 +395,14 @@ def create_zero_hospitals_map(gdf_districts_with_counts, title="Distritos sin Ho
     Returns:
         fig: Figura de matplotlib
     """
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as mpatches
+    from lod import simplified
+    
     fig, ax = plt.subplots(1, 1, figsize=(10, 8))
     
-    # Crear copia para no modificar original
-    gdf_plot = gdf_districts_with_counts.copy()
+    # Copia con geometrías simplificadas al tamaño de la figura
+    gdf_plot = simplified(gdf_districts_with_counts, width_px=_figure_width_px(fig)).copy()
     
     # Crear columna para colorear
     gdf_plot['color'] = gdf_plot['n_hospitales'].apply(
@@ -140,10 +444,13 @@ def create_top10_hospitals_map(gdf_districts_with_counts, title="Top 10 Distrito
     Returns:
         fig: Figura de matplotlib
     """
+    import matplotlib.pyplot as plt
+    from lod import simplified
+    
     fig, ax = plt.subplots(1, 1, figsize=(10, 8))
     
-    # Crear copia para no modificar original
-    gdf_plot = gdf_districts_with_counts.copy()
+    # Copia con geometrías simplificadas al tamaño de la figura
+    gdf_plot = simplified(gdf_districts_with_counts, width_px=_figure_width_px(fig)).copy()
     
     # Identificar top 10 distritos
     top10_threshold = gdf_plot.nlargest(10, 'n_hospitales')['n_hospitales'].min()
@@ -197,10 +504,14 @@ def create_static_map_with_points(gdf_districts, gdf_hospitals, title="Mapa de H
     Returns:
         fig: Figura de matplotlib
     """
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as mpatches
+    from lod import simplified
+    
     fig, ax = plt.subplots(1, 1, figsize=(15, 12))
     
     # Dibujar distritos (fondo gris claro)
-    gdf_districts.plot(
+    simplified(gdf_districts, width_px=_figure_width_px(fig)).plot(
         ax=ax,
         color='lightgray',
         edgecolor='black',
@@ -239,36 +550,43 @@ def create_department_static_map(gdf_districts, gdf_hospitals, department_name):
     Returns:
         fig: Figura de matplotlib
     """
-    # Buscar columna de departamento en hospitales
-    col_dept_hosp = None
-    for c in gdf_hospitals.columns:
-        if c.strip().lower() == "departamento":
-            col_dept_hosp = c
-            break
+    dept_key = normalize_values(pd.Series([department_name]))[0]
     
-    # Filtrar hospitales del departamento
+    # Filtrar hospitales y distritos del departamento (sin importar tildes ni mayúsculas)
+    col_dept_hosp = get_schema(gdf_hospitals).get("departamento")
     if col_dept_hosp:
-        gdf_hosp_dept = gdf_hospitals[gdf_hospitals[col_dept_hosp] == department_name]
+        gdf_hosp_dept = gdf_hospitals[(normalize_values(gdf_hospitals[col_dept_hosp]) == dept_key).to_numpy()]
     else:
         gdf_hosp_dept = gdf_hospitals
     
-    # Buscar columna de departamento en distritos
-    col_dept_dist = None
-    for col in gdf_districts.columns:
-        col_lower = col.lower()
-        if 'depa' in col_lower or 'nombdepa' in col_lower:
-            col_dept_dist = col
-            break
-    
-    # Filtrar distritos del departamento
+    col_dept_dist = get_schema(gdf_districts).get("departamento")
     if col_dept_dist:
-        gdf_dist_dept = gdf_districts[gdf_districts[col_dept_dist].str.upper() == department_name.upper()]
+        gdf_dist_dept = gdf_districts[(normalize_values(gdf_districts[col_dept_dist]) == dept_key).to_numpy()]
     else:
         gdf_dist_dept = gdf_districts
     
+    return draw_department_map(gdf_dist_dept, gdf_hosp_dept, department_name)
+
+def draw_department_map(gdf_dist_dept, gdf_hosp_dept, department_name):
+    """
+    Dibuja el mapa de un departamento a partir de sus distritos y hospitales
+    ya filtrados (ver create_department_static_map y atlas.py).
+    
+    Args:
+        gdf_dist_dept: GeoDataFrame de distritos del departamento
+        gdf_hosp_dept: GeoDataFrame de hospitales del departamento
+        department_name: Nombre del departamento (título)
+    
+    Returns:
+        fig: Figura de matplotlib (None si no hay distritos)
+    """
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as mpatches
+    from lod import simplified
+    
     # Verificar que hay datos
     if len(gdf_dist_dept) == 0:
-        print(f"No se encontraron distritos para {department_name}")
+        warn(f"No se encontraron distritos para {department_name}")
         return None
     
     # Calcular aspect ratio basado en los límites del departamento
@@ -286,7 +604,7 @@ def create_department_static_map(gdf_districts, gdf_hospitals, department_name):
     fig, ax = plt.subplots(1, 1, figsize=figsize)
     
     # Dibujar distritos con paleta azul
-    gdf_dist_dept.plot(
+    simplified(gdf_dist_dept, width_px=_figure_width_px(fig)).plot(
         ax=ax,
         color='#e3f2fd',
         edgecolor='#1976d2',
@@ -322,4 +640,184 @@ def create_department_static_map(gdf_districts, gdf_hospitals, department_name):
     ax.legend(handles=[green_patch], loc='upper right', fontsize=16, frameon=True, fancybox=True, shadow=True)
     
     plt.tight_layout()
-    return fig
\ No newline at end of file
+    return fig
+# Marcador de cada hospital en el cliente: fila = [lat, lon, popup HTML]
+_HOSPITAL_MARKER_JS = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 5, color: 'green', fill: true, fillColor: 'green', fillOpacity: 0.7
+    });
+    marker.bindPopup(row[2], {maxWidth: 300});
+    return marker;
+}
+"""
+
+def _latlon(gdf, decimals=5):
+    """Latitud y longitud (WGS84) como arrays, redondeadas (5 decimales ~ 1 m)."""
+    geoms = gdf.geometry
+    if gdf.crs is not None and gdf.crs != 'EPSG:4326':
+        geoms = geoms.to_crs('EPSG:4326')
+    geoms = geoms.to_numpy()
+    return np.round(shapely.get_y(geoms), decimals), np.round(shapely.get_x(geoms), decimals)
+
+def _escape_html(series):
+    """Escapa texto para HTML con operaciones de columna."""
+    return (series.astype(str)
+                  .str.replace('&', '&amp;', regex=False)
+                  .str.replace('<', '&lt;', regex=False)
+                  .str.replace('>', '&gt;', regex=False)
+                  .str.replace('"', '&quot;', regex=False))
+
+def _text_column(series, default=''):
+    """Columna como texto con 'default' en los nulos (también si es categórica)."""
+    return series.astype(object).fillna(default)
+
+def hospital_popups(gdf_hospitals):
+    """
+    HTML del popup de cada hospital (nombre, departamento y categoría),
+    construido con operaciones vectorizadas sobre las columnas.
+    
+    Returns:
+        Series de texto HTML alineada con gdf_hospitals
+    """
+    schema = get_schema(gdf_hospitals)
+    col_nombre = schema.get('nombre')
+    col_dept = schema.get('departamento')
+    col_cat = schema.get('categoria')
+    
+    if col_nombre:
+        popup = '<b>' + _escape_html(_text_column(gdf_hospitals[col_nombre], 'Hospital')) + '</b>'
+    else:
+        popup = pd.Series('<b>Hospital</b>', index=gdf_hospitals.index)
+    if col_dept:
+        popup = popup + '<br>Departamento: ' + _escape_html(_text_column(gdf_hospitals[col_dept]))
+    if col_cat:
+        popup = popup + '<br>Categoría: ' + _escape_html(_text_column(gdf_hospitals[col_cat]))
+    return popup
+
+def create_national_hospital_map(gdf_hospitals, zoom_start=6):
+    """
+    Mapa Folium con todos los hospitales agrupados en el navegador.
+    
+    Las coordenadas y los popups se envían como un único arreglo
+    [lat, lon, popup] a un FastMarkerCluster: los marcadores se crean en el
+    cliente y Python no construye un objeto por hospital.
+    
+    Args:
+        gdf_hospitals: GeoDataFrame de hospitales
+        zoom_start: Zoom inicial
+    
+    Returns:
+        m: Mapa de folium
+    """
+    import folium
+    from folium import plugins
+    
+    m = folium.Map(location=[-9.19, -75.0152], zoom_start=zoom_start, tiles='OpenStreetMap')
+    
+    lat, lon = _latlon(gdf_hospitals)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    popups = hospital_popups(gdf_hospitals).to_numpy()[valid]
+    data = list(map(list, zip(lat[valid].tolist(), lon[valid].tolist(), popups.tolist())))
+    
+    plugins.FastMarkerCluster(data, callback=_HOSPITAL_MARKER_JS, name='Hospitales').add_to(m)
+    folium.LayerControl().add_to(m)
+    return m
+
+def create_ccpp_proximity_map(resultado, gdf_hospitals, department_name, punto,
+                              tipo='concentrado', buffer_distance=10000):
+    """
+    Crea un mapa Folium centrado en un centro poblado con su buffer y los
+    hospitales del departamento.
+    
+    Args:
+        resultado: GeoDataFrame de centros poblados con 'NumHosp' (EPSG:4326)
+        gdf_hospitals: GeoDataFrame de hospitales del departamento
+        department_name: Nombre del departamento
+        punto: Fila de 'resultado' a destacar (más aislado o más concentrado)
+        tipo: 'aislado' o 'concentrado'
+        buffer_distance: Radio del buffer en metros
+    
+    Returns:
+        m: Mapa de folium
+    """
+    import folium
+    
+    color = 'red' if tipo == 'aislado' else 'darkgreen'
+    lat, lon = punto.geometry.y, punto.geometry.x
+    
+    m = folium.Map(location=[lat, lon], zoom_start=10, tiles='OpenStreetMap')
+    
+    # Buffer (radio en metros)
+    folium.Circle(
+        location=[lat, lon],
+        radius=buffer_distance,
+        color=color,
+        fill=True,
+        fill_opacity=0.1
+    ).add_to(m)
+    
+    # Centro poblado
+    folium.Marker(
+        [lat, lon],
+        tooltip=f"{punto['CentroPoblado']} ({department_name}) - {int(punto['NumHosp'])} hospitales",
+        icon=folium.Icon(color='red' if tipo == 'aislado' else 'green')
+    ).add_to(m)
+    
+    # Hospitales: una sola capa GeoJSON con marcadores circulares
+    lat, lon = _latlon(gdf_hospitals)
+    features = [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [x, y]}, "properties": {}}
+        for x, y in zip(lon.tolist(), lat.tolist())
+    ]
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name='Hospitales',
+        marker=folium.CircleMarker(radius=3, color='blue', fill=True, fill_opacity=0.7)
+    ).add_to(m)
+    
+    return m
+
+# Estilo de cada capa de las teselas vectoriales (ver tiles.py)
+VECTOR_TILE_STYLES = {
+    'distritos': {'fill': True, 'weight': 0.5, 'color': '#555555', 'fillColor': '#e0e0e0', 'fillOpacity': 0.3},
+    'hospitales': {'radius': 3, 'fill': True, 'weight': 1, 'color': 'green', 'fillColor': 'green', 'fillOpacity': 0.8},
+    'ccpp': {'radius': 1.5, 'fill': True, 'weight': 0, 'fillColor': '#d35400', 'fillOpacity': 0.6},
+}
+
+def create_vector_tile_map(tile_url, metadata=None, zoom_start=6):
+    """
+    Mapa Folium que carga distritos, hospitales y centros poblados desde
+    teselas vectoriales: el navegador solo descarga las teselas visibles y
+    el HTML no incluye geometrías.
+    
+    Args:
+        tile_url: plantilla de URL '.../{z}/{x}/{y}.pbf' (ver tiles.tile_url)
+        metadata: metadata.json de la pirámide (zoom máximo, capas y extensión)
+        zoom_start: Zoom inicial
+    
+    Returns:
+        m: Mapa de folium
+    """
+    import folium
+    from folium import plugins
+    
+    metadata = metadata or {}
+    bounds = metadata.get('bounds')
+    if bounds:
+        center = [(bounds[1] + bounds[3]) / 2, (bounds[0] + bounds[2]) / 2]
+    else:
+        center = [-9.19, -75.0152]
+    
+    m = folium.Map(location=center, zoom_start=zoom_start, tiles='OpenStreetMap')
+    
+    layers = metadata.get('layers', VECTOR_TILE_STYLES)
+    options = {
+        'vectorTileLayerStyles': {name: VECTOR_TILE_STYLES.get(name, {}) for name in layers},
+        'maxNativeZoom': metadata.get('maxzoom', 10),
+        'minNativeZoom': metadata.get('minzoom', 0),
+        'maxZoom': 18,
+    }
+    plugins.VectorGridProtobuf(tile_url, name='Teselas vectoriales', options=options).add_to(m)
+    folium.LayerControl().add_to(m)
+    return m
@@ -0,0 +1,133 @@
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+
+from schema import normalize_values
+
+# Zonas UTM (hemisferio sur) que cubren el territorio peruano
+PERU_UTM_ZONES = {
+    17: "EPSG:32717",
+    18: "EPSG:32718",
+    19: "EPSG:32719",
+}
+
+DEFAULT_UTM_ZONE = 18
+
+# Zona UTM predominante de cada departamento (según la longitud de su
+# centroide). Solo se usa si se pide inferir la zona por departamento
+# (utm_zone="department"): en departamentos partidos entre dos zonas
+# (Amazonas, Cusco, Loreto, Ucayali, ...) la zona minoritaria queda mal, por
+# eso las candidatas se verifican contra los polígonos de distritos.
+DEPARTMENT_UTM_ZONE = {
+    "TUMBES": 17,
+    "PIURA": 17,
+    "LAMBAYEQUE": 17,
+    "CAJAMARCA": 17,
+    "AMAZONAS": 17,
+    "LA LIBERTAD": 17,
+    "ANCASH": 18,
+    "LIMA": 18,
+    "CALLAO": 18,
+    "HUANUCO": 18,
+    "PASCO": 18,
+    "JUNIN": 18,
+    "SAN MARTIN": 18,
+    "LORETO": 18,
+    "UCAYALI": 18,
+    "HUANCAVELICA": 18,
+    "ICA": 18,
+    "AYACUCHO": 18,
+    "APURIMAC": 18,
+    "CUSCO": 18,
+    "AREQUIPA": 18,
+    "MOQUEGUA": 19,
+    "TACNA": 19,
+    "PUNO": 19,
+    "MADRE DE DIOS": 19,
+}
+
+# Extensión aproximada del Perú en WGS84 (lon_min, lat_min, lon_max, lat_max)
+PERU_BBOX = (-81.5, -18.5, -68.5, 0.2)
+
+# Los Transformer de pyproj no son thread-safe y Streamlit ejecuta cada sesión
+# en su propio hilo: se guarda una caché por hilo.
+_local = threading.local()
+
+def get_transformer(src_crs, dst_crs):
+    """Devuelve un Transformer (always_xy) reutilizable para el par de CRS."""
+    cache = getattr(_local, "transformers", None)
+    if cache is None:
+        cache = _local.transformers = {}
+    key = (str(src_crs), str(dst_crs))
+    transformer = cache.get(key)
+    if transformer is None:
+        transformer = Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+        cache[key] = transformer
+    return transformer
+
+def parse_utm_zone(values):
+    """Convierte valores como 18, '18', '18S' o 'Zona 19 Sur' a enteros (NaN si no aplica)."""
+    def _parse(v):
+        if v is None or (isinstance(v, float) and np.isnan(v)):
+            return np.nan
+        m = re.search(r"\d+", str(v))
+        return float(m.group()) if m else np.nan
+    return pd.Series(values).map(_parse).to_numpy(dtype=float)
+
+def infer_utm_zone(departments, default=DEFAULT_UTM_ZONE):
+    """Zona UTM por fila a partir del departamento (zona predominante del departamento)."""
+    dept = normalize_values(pd.Series(departments, dtype=object).fillna(""))
+    zones = dept.map(DEPARTMENT_UTM_ZONE).fillna(default)
+    return zones.to_numpy(dtype=np.int8)
+
+def _inside_peru(lon, lat):
+    lon_min, lat_min, lon_max, lat_max = PERU_BBOX
+    return (lon >= lon_min) & (lon <= lon_max) & (lat >= lat_min) & (lat <= lat_max)
+
+def utm_to_crs(este, norte, zones, dst_crs="EPSG:4326", validate=True):
+    """
+    Transforma coordenadas UTM sur con zona por fila a 'dst_crs'.
+
+    Agrupa las filas por zona y hace una sola llamada vectorizada de pyproj
+    por grupo (los Transformer se reutilizan entre llamadas). Si 'validate'
+    es True y el destino es WGS84, las filas que caen fuera del Perú se
+    reintentan con las otras zonas y se queda la primera que cae dentro.
+
+    Args:
+        este, norte: arrays de coordenadas UTM (metros)
+        zones: array de zonas UTM por fila (17, 18 o 19)
+        dst_crs: CRS de destino
+
+    Returns:
+        (x, y): arrays en el CRS de destino
+    """
+    este = np.asarray(este, dtype=float)
+    norte = np.asarray(norte, dtype=float)
+    zones = np.asarray(zones)
+    zones = np.where(np.isin(zones, list(PERU_UTM_ZONES)), zones, DEFAULT_UTM_ZONE)
+    x = np.full(len(este), np.nan)
+    y = np.full(len(este), np.nan)
+
+    for zone in np.unique(zones):
+        mask = zones == zone
+        transformer = get_transformer(PERU_UTM_ZONES[zone], dst_crs)
+        x[mask], y[mask] = transformer.transform(este[mask], norte[mask])
+
+    if validate and str(dst_crs).upper() == "EPSG:4326":
+        bad = ~_inside_peru(x, y)
+        for zone, src_crs in PERU_UTM_ZONES.items():
+            if not bad.any():
+                break
+            retry = bad & (zones != zone)
+            if not retry.any():
+                continue
+            tx, ty = get_transformer(src_crs, dst_crs).transform(este[retry], norte[retry])
+            ok = _inside_peru(tx, ty)
+            idx = np.flatnonzero(retry)[ok]
+            x[idx], y[idx] = tx[ok], ty[ok]
+            bad[idx] = False
+
+    return x, y
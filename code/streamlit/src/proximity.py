@@ -0,0 +1,539 @@
+import os
+import pickle
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from scipy.spatial import cKDTree
+
+from cache import (
+    array_hash, cache_key, cache_path, default_cache_dir,
+    read_cached_gdf, write_cached_gdf,
+)
+from instrumentation import instrumented, note, warn
+from projection import get_transformer
+from schema import get_schema, normalize_values
+
+# CRS métrico para distancias (UTM 18S, como en el notebook). A 10 km la
+# distorsión de escala en los extremos del país es menor al 1.5 %.
+METRIC_CRS = "EPSG:32718"
+
+DEFAULT_BUFFER = 10_000  # metros
+
+# Radios por defecto del barrido de accesibilidad (metros)
+DEFAULT_RADII = (5_000, 10_000, 20_000, 50_000)
+
+@dataclass
+class PointIndex:
+    """
+    Índice espacial (KD-tree) sobre una capa de puntos (hospitales, centros
+    poblados) en coordenadas métricas.
+
+    Atributos:
+        tree: cKDTree sobre 'xy'
+        xy: array (n, 2) de coordenadas proyectadas
+        labels: etiquetas de índice de los puntos en el GeoDataFrame original
+        ids: identificador de cada punto (código del establecimiento en los
+            hospitales; la etiqueta si no hay otro)
+        crs: CRS de 'xy'
+        categoria: filtro de categoría con que se construyó (None = todas)
+
+    Es serializable (ver save_hospital_index / load_hospital_index).
+    """
+    tree: cKDTree
+    xy: np.ndarray
+    labels: np.ndarray
+    ids: np.ndarray = None
+    crs: str = METRIC_CRS
+    categoria: tuple = None
+
+    def __len__(self):
+        return len(self.xy)
+
+# Índices recientes por huella de coordenadas (Lima y Loreto comparten el índice)
+_index_cache = OrderedDict()
+_MAX_INDEXES = 8
+# Índices ya pedidos para un mismo objeto GeoDataFrame (los productos del
+# contexto se comparten entre reruns): id -> (weakref, {parámetros: índice}).
+# Evita proyectar y hashear la capa en cada llamada; la capa no debe
+# modificarse en el lugar después de indexarla.
+_frame_indexes = OrderedDict()
+_lock = threading.Lock()
+
+def projected_xy(gdf, crs=METRIC_CRS):
+    """
+    Coordenadas (n, 2) de los puntos de 'gdf' en 'crs', con un Transformer
+    reutilizable (sin GeoDataFrame.to_crs). Para geometrías que no son
+    puntos se usa un punto representativo.
+    """
+    geoms = gdf.geometry.to_numpy()
+    if not (shapely.get_type_id(geoms) == 0).all():
+        geoms = shapely.point_on_surface(geoms)
+    x = shapely.get_x(geoms)
+    y = shapely.get_y(geoms)
+    if gdf.crs is not None and gdf.crs != crs:
+        x, y = get_transformer(gdf.crs, crs).transform(x, y)
+    return np.column_stack([x, y])
+
+def _categoria_filter(categoria):
+    if categoria is None:
+        return None
+    if isinstance(categoria, str):
+        categoria = [categoria]
+    return tuple(sorted(str(c).strip().upper() for c in categoria))
+
+def build_point_index(gdf_points, crs=METRIC_CRS, ids=None, categoria=None):
+    """
+    Construye (o reutiliza) el KD-tree de una capa de puntos en coordenadas
+    métricas. Los puntos sin coordenadas válidas quedan fuera del índice.
+
+    Args:
+        gdf_points: GeoDataFrame de puntos (para otras geometrías se usa un
+            punto representativo, ver projected_xy)
+        crs: CRS métrico para las distancias
+        ids: identificador de cada fila (por defecto, la etiqueta del índice)
+        categoria: filtro con que se eligieron los puntos (solo informativo)
+
+    Sin 'ids', el índice queda asociado al objeto 'gdf_points' y la
+    siguiente llamada con la misma capa no vuelve a proyectarla ni hashearla.
+    """
+    params = ("labels", str(crs), categoria)
+    if ids is None:
+        index = _frame_index(gdf_points, params)
+        if index is not None:
+            return index
+
+    xy = projected_xy(gdf_points, crs)
+    valid = np.isfinite(xy).all(axis=1)
+    xy = xy[valid]
+    labels = gdf_points.index.to_numpy()[valid]
+    ids = labels if ids is None else np.asarray(ids)[valid]
+
+    key = (array_hash(xy, labels.astype(str), ids.astype(str)), str(crs), categoria)
+    with _lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+    if index is None:
+        index = PointIndex(tree=cKDTree(xy), xy=xy, labels=labels, ids=ids,
+                           crs=str(crs), categoria=categoria)
+        with _lock:
+            _index_cache[key] = index
+            if len(_index_cache) > _MAX_INDEXES:
+                _index_cache.popitem(last=False)
+    if ids is None:
+        _remember_frame_index(gdf_points, params, index)
+    return index
+
+def build_hospital_index(gdf_hospitals, crs=METRIC_CRS, categoria=None):
+    """
+    Índice de hospitales (build_point_index) con el código del establecimiento
+    como identificador.
+
+    Args:
+        gdf_hospitals: GeoDataFrame de hospitales
+        crs: CRS métrico para las distancias
+        categoria: categoría o lista de categorías a incluir (p. ej. ['II-1', 'II-2'])
+    """
+    categoria = _categoria_filter(categoria)
+    params = (str(crs), categoria)
+    index = _frame_index(gdf_hospitals, params)
+    if index is not None:
+        return index
+
+    schema = get_schema(gdf_hospitals)
+    selected = gdf_hospitals
+    if categoria is not None:
+        col_cat = schema.require("categoria")
+        mask = normalize_values(gdf_hospitals[col_cat]).isin(categoria).to_numpy()
+        selected = gdf_hospitals[mask]
+
+    col_codigo = schema.get("codigo")
+    ids = selected[col_codigo].to_numpy() if col_codigo else None
+    index = build_point_index(selected, crs, ids=ids, categoria=categoria)
+    _remember_frame_index(gdf_hospitals, params, index)
+    return index
+
+def _frame_index(gdf, params):
+    """Índice ya construido para este mismo objeto 'gdf' con 'params' (o None)."""
+    with _lock:
+        entry = _frame_indexes.get(id(gdf))
+        if entry is None or entry[0]() is not gdf or entry[2] != len(gdf):
+            return None
+        _frame_indexes.move_to_end(id(gdf))
+        return entry[1].get(params)
+
+def _remember_frame_index(gdf, params, index):
+    with _lock:
+        entry = _frame_indexes.get(id(gdf))
+        if entry is None or entry[0]() is not gdf:
+            entry = (weakref.ref(gdf), {}, len(gdf))
+            _frame_indexes[id(gdf)] = entry
+        entry[1][params] = index
+        _frame_indexes.move_to_end(id(gdf))
+        if len(_frame_indexes) > _MAX_INDEXES:
+            _frame_indexes.popitem(last=False)
+
+def save_hospital_index(index, path):
+    """Guarda el índice (KD-tree incluido) para reutilizarlo en otro proceso."""
+    with open(path, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_hospital_index(path):
+    """Carga un índice guardado con save_hospital_index."""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def count_hospitals_within(gdf_points, index, radius=DEFAULT_BUFFER):
+    """
+    Número de hospitales a menos de 'radius' metros de cada punto, en una sola
+    consulta vectorizada al KD-tree (equivale al buffer + within del notebook).
+
+    Returns:
+        np.ndarray int32 (0 para puntos sin coordenadas válidas)
+    """
+    xy = projected_xy(gdf_points, index.crs)
+    counts = np.zeros(len(xy), dtype=np.int32)
+    valid = np.isfinite(xy).all(axis=1)
+    if valid.any() and len(index) > 0:
+        counts[valid] = index.tree.query_ball_point(xy[valid], r=radius, return_length=True, workers=-1)
+    return counts
+
+def nearest_hospitals(gdf_points, index, k=1, batch_size=200_000, max_distance=np.inf):
+    """
+    Distancia (metros) e identificador de los k hospitales más cercanos a cada
+    punto. La consulta al KD-tree se hace por lotes de 'batch_size' puntos
+    para acotar la memoria.
+
+    Returns:
+        (dist, ids): arrays (n, k); dist es NaN (e ids None) cuando no hay
+        hospital a menos de 'max_distance' o el punto no tiene coordenadas
+    """
+    xy = projected_xy(gdf_points, index.crs)
+    n = len(xy)
+    dist = np.full((n, k), np.nan, dtype=np.float32)
+    pos = np.full((n, k), -1, dtype=np.int64)
+
+    if len(index) > 0:
+        for start in range(0, n, batch_size):
+            block = xy[start:start + batch_size]
+            valid = np.isfinite(block).all(axis=1)
+            if not valid.any():
+                continue
+            d, i = index.tree.query(block[valid], k=k, distance_upper_bound=max_distance, workers=-1)
+            d = np.asarray(d, dtype=float).reshape(-1, k)
+            i = np.asarray(i).reshape(-1, k)
+            found = np.isfinite(d)
+            rows = np.flatnonzero(valid) + start
+            dist[rows] = np.where(found, d, np.nan)
+            pos[rows] = np.where(found, i, -1)
+
+    ids = np.full((n, k), None, dtype=object)
+    found = pos >= 0
+    ids[found] = index.ids[pos[found]]
+    return dist, ids
+
+def add_nearest_hospital(gdf_ccpp, gdf_hospitals, k=1, categoria=None, index=None):
+    """
+    Agrega a los centros poblados la distancia (km) y el código del hospital
+    más cercano: columnas DistHospKm / IdHosp (y DistHospKm_2, IdHosp_2, ...
+    si k > 1).
+
+    Args:
+        gdf_ccpp: GeoDataFrame de centros poblados
+        gdf_hospitals: GeoDataFrame de hospitales
+        k: número de vecinos
+        categoria: filtrar hospitales por categoría (ver build_hospital_index)
+        index: índice ya construido (si se pasa, se ignoran los dos anteriores)
+    """
+    if index is None:
+        index = build_hospital_index(gdf_hospitals, categoria=categoria)
+    dist, ids = nearest_hospitals(gdf_ccpp, index, k=k)
+
+    gdf = gdf_ccpp.copy()
+    for j in range(k):
+        suffix = "" if j == 0 else f"_{j + 1}"
+        gdf[f"DistHospKm{suffix}"] = dist[:, j] / 1000
+        gdf[f"IdHosp{suffix}"] = ids[:, j]
+    return gdf
+
+def nearest_hospital_table(gdf_ccpp, gdf_hospitals):
+    """
+    Distancia (km) y código del hospital más cercano a cada centro poblado,
+    sin copiar la capa (ver add_nearest_hospital).
+
+    Returns:
+        DataFrame con DistHospKm e IdHosp, indexado como gdf_ccpp
+    """
+    dist, ids = nearest_hospitals(gdf_ccpp, build_hospital_index(gdf_hospitals))
+    return pd.DataFrame({"DistHospKm": dist[:, 0] / 1000, "IdHosp": ids[:, 0]}, index=gdf_ccpp.index)
+
+def _result_frame(gdf_ccpp, counts):
+    """GeoDataFrame CentroPoblado / Departamento / NumHosp / geometry (WGS84)."""
+    schema = get_schema(gdf_ccpp)
+    col_nombre = schema.get("centro_poblado") or schema.get("nombre")
+    col_dept = schema.get("departamento")
+    resultado = gpd.GeoDataFrame(
+        {
+            "CentroPoblado": gdf_ccpp[col_nombre].to_numpy() if col_nombre else gdf_ccpp.index.astype(str),
+            "Departamento": gdf_ccpp[col_dept].to_numpy() if col_dept else None,
+            "NumHosp": counts,
+        },
+        geometry=gdf_ccpp.geometry.to_numpy(),
+        crs=gdf_ccpp.crs,
+        index=gdf_ccpp.index,
+    )
+    if resultado.crs is not None and resultado.crs != "EPSG:4326":
+        resultado = resultado.to_crs("EPSG:4326")
+    return resultado
+
+@instrumented("proximity.national", rows_in=lambda gdf_ccpp, *args, **kwargs: len(gdf_ccpp))
+def analyze_proximity_national(gdf_ccpp, gdf_hospitals, buffer_distance=DEFAULT_BUFFER):
+    """
+    Cuenta hospitales dentro de 'buffer_distance' metros para todos los
+    centros poblados del país en una sola consulta.
+
+    Returns:
+        GeoDataFrame con CentroPoblado, Departamento, NumHosp y geometry (EPSG:4326)
+    """
+    index = build_hospital_index(gdf_hospitals)
+    counts = count_hospitals_within(gdf_ccpp, index, buffer_distance)
+    return _result_frame(gdf_ccpp, counts)
+
+def _department_mask(gdf, department):
+    col_dept = get_schema(gdf).get("departamento")
+    if col_dept is None:
+        return np.ones(len(gdf), dtype=bool)
+    return (normalize_values(gdf[col_dept]) == normalize_values(pd.Series([department]))[0]).to_numpy()
+
+@instrumented("proximity.department", rows_out=lambda result: None if result[0] is None else len(result[0]))
+def analyze_proximity_department(gdf_ccpp, gdf_hospitals, department, buffer_distance=DEFAULT_BUFFER):
+    """
+    Análisis de proximidad para los centros poblados de un departamento.
+
+    A diferencia del notebook (que solo contaba hospitales del mismo
+    departamento), el conteo usa el índice nacional: los buffers cerca de un
+    límite departamental también cuentan los hospitales del otro lado.
+
+    Returns:
+        (resultado, hosp_dept): GeoDataFrame de centros poblados con NumHosp y
+        GeoDataFrame de hospitales del departamento; (None, None) si no hay
+        centros poblados para el departamento.
+    """
+    note("departamento", department)
+    ccpp_dept = gdf_ccpp[_department_mask(gdf_ccpp, department)]
+    if len(ccpp_dept) == 0:
+        warn(f"No se encontraron centros poblados para {department}")
+        return None, None
+
+    index = build_hospital_index(gdf_hospitals)
+    counts = count_hospitals_within(ccpp_dept, index, buffer_distance)
+    resultado = _result_frame(ccpp_dept, counts)
+    hosp_dept = gdf_hospitals[_department_mask(gdf_hospitals, department)]
+
+    note("promedio_hospitales", round(float(resultado['NumHosp'].mean()), 1))
+    note("radio_km", buffer_distance / 1000)
+    return resultado, hosp_dept
+
+def proximity_for_department(resultado, gdf_hospitals, department):
+    """
+    Mismo resultado que analyze_proximity_department, tomado de la tabla
+    nacional de analyze_proximity_all_departments (sin volver a contar).
+
+    Returns:
+        (resultado, hosp_dept), o (None, None) si no hay centros poblados
+    """
+    has_dept = resultado["Departamento"].notna().any()
+    mask = _department_mask(resultado, department) if has_dept else np.zeros(len(resultado), dtype=bool)
+    if not mask.any():
+        warn(f"No se encontraron centros poblados para {department}")
+        return None, None
+    cols = ["CentroPoblado", "Departamento", "NumHosp", resultado.geometry.name]
+    # En el orden original de los centros poblados (la tabla nacional está ordenada por ranking)
+    resultado_dept = resultado.loc[mask, cols].sort_index()
+    return resultado_dept, gdf_hospitals[_department_mask(gdf_hospitals, department)]
+
+def _radius_column(radius):
+    return f"NumHosp_{radius / 1000:g}km"
+
+def count_hospitals_sweep(gdf_points, index, radii=DEFAULT_RADII, batch_size=20_000):
+    """
+    Conteo de hospitales para varios radios con una sola búsqueda de vecinos.
+
+    Para cada lote de puntos se obtienen todos los pares (punto, hospital) a
+    menos del radio máximo con sus distancias; cada distancia se ubica en el
+    primer radio que la contiene (searchsorted sobre los radios ordenados) y
+    la suma acumulada por radio da los conteos de todos los radios a la vez.
+
+    Returns:
+        np.ndarray int32 (n, len(radii)) con columnas en el orden de 'radii' ordenado
+    """
+    radii = np.sort(np.asarray(radii, dtype=float))
+    n_radii = len(radii)
+    xy = projected_xy(gdf_points, index.crs)
+    counts = np.zeros((len(xy), n_radii), dtype=np.int32)
+    if len(index) == 0:
+        return counts
+
+    valid_rows = np.flatnonzero(np.isfinite(xy).all(axis=1))
+    for start in range(0, len(valid_rows), batch_size):
+        rows = valid_rows[start:start + batch_size]
+        block_tree = cKDTree(xy[rows])
+        pairs = block_tree.sparse_distance_matrix(index.tree, radii[-1], output_type="ndarray")
+        if len(pairs) == 0:
+            continue
+        bucket = np.searchsorted(radii, pairs["v"], side="left")
+        per_bucket = np.bincount(pairs["i"] * n_radii + bucket, minlength=len(rows) * n_radii)
+        counts[rows] = per_bucket.reshape(len(rows), n_radii).cumsum(axis=1)
+    return counts
+
+@instrumented("proximity.sweep", rows_in=lambda gdf_ccpp, *args, **kwargs: len(gdf_ccpp),
+              rows_out=lambda result: len(result[0]))
+def analyze_proximity_sweep(gdf_ccpp, gdf_hospitals, radii=DEFAULT_RADII):
+    """
+    Barrido de accesibilidad: conteo de hospitales por centro poblado para
+    todos los radios en una sola pasada, más curvas de cobertura por
+    departamento.
+
+    Returns:
+        (resultado, coverage):
+        - resultado: GeoDataFrame con CentroPoblado, Departamento, geometry y
+          una columna NumHosp_<r>km por radio
+        - coverage: DataFrame (departamento x radio en km) con la proporción de
+          centros poblados con al menos un hospital dentro del radio; la fila
+          'PERÚ' es el total nacional
+    """
+    radii = sorted(radii)
+    index = build_hospital_index(gdf_hospitals)
+    counts = count_hospitals_sweep(gdf_ccpp, index, radii)
+
+    resultado = _result_frame(gdf_ccpp, counts[:, 0]).drop(columns="NumHosp")
+    for j, radius in enumerate(radii):
+        resultado[_radius_column(radius)] = counts[:, j]
+
+    return resultado, coverage_curves(resultado, radii)
+
+def coverage_curves(resultado, radii=DEFAULT_RADII):
+    """Proporción de centros poblados con >= 1 hospital, por departamento y radio."""
+    radii = sorted(radii)
+    cols = [_radius_column(r) for r in radii]
+    covered = resultado[cols].gt(0)
+    covered.columns = [r / 1000 for r in radii]
+
+    coverage = covered.groupby(resultado["Departamento"].astype(str)).mean()
+    coverage.loc["PERÚ"] = covered.mean()
+    coverage.columns.name = "radio_km"
+    return coverage
+
+def _count_partition(task):
+    """Trabajo de un proceso: KD-tree local del departamento (+ margen) y conteo."""
+    dept, ccpp_xy, hosp_xy, radius = task
+    if len(hosp_xy) == 0:
+        return dept, np.zeros(len(ccpp_xy), dtype=np.int32)
+    tree = cKDTree(hosp_xy)
+    return dept, tree.query_ball_point(ccpp_xy, r=radius, return_length=True).astype(np.int32)
+
+def _partition_tasks(ccpp_xy, hosp_xy, departments, radius):
+    """
+    Particiona por departamento. Cada partición recibe los hospitales dentro
+    del rectángulo de sus centros poblados ampliado en 'radius' (margen
+    transfronterizo), de modo que los buffers cerca de un límite cuentan
+    también los hospitales del departamento vecino.
+    """
+    tasks = []
+    rows_by_dept = {}
+    for dept, rows in pd.Series(np.arange(len(ccpp_xy))).groupby(departments).groups.items():
+        rows = np.asarray(rows)
+        pts = ccpp_xy[rows]
+        xmin, ymin = pts.min(axis=0) - radius
+        xmax, ymax = pts.max(axis=0) + radius
+        near = ((hosp_xy[:, 0] >= xmin) & (hosp_xy[:, 0] <= xmax) &
+                (hosp_xy[:, 1] >= ymin) & (hosp_xy[:, 1] <= ymax))
+        rows_by_dept[dept] = rows
+        tasks.append((dept, pts, hosp_xy[near], radius))
+    return tasks, rows_by_dept
+
+def _label_hash(gdf_ccpp):
+    """Hash por fila de índice, nombre y departamento de los centros poblados."""
+    schema = get_schema(gdf_ccpp)
+    cols = [c for c in (schema.get("centro_poblado") or schema.get("nombre"), schema.get("departamento")) if c]
+    return pd.util.hash_pandas_object(gdf_ccpp[cols].astype(str), index=True).to_numpy()
+
+@instrumented("proximity.all_departments", rows_in=lambda gdf_ccpp, *args, **kwargs: len(gdf_ccpp))
+def analyze_proximity_all_departments(gdf_ccpp, gdf_hospitals, buffer_distance=DEFAULT_BUFFER,
+                                      max_workers=None, use_cache=True, cache_dir=None):
+    """
+    Proximidad para los centros poblados de todos los departamentos, en
+    paralelo (un proceso por partición departamental) y con resultado
+    combinado en una sola tabla nacional.
+
+    Args:
+        gdf_ccpp: GeoDataFrame de centros poblados
+        gdf_hospitals: GeoDataFrame de hospitales
+        buffer_distance: radio en metros
+        max_workers: procesos (None = núcleos disponibles; 1 = sin pool)
+        use_cache: guardar/leer el resultado en la caché GeoParquet
+        cache_dir: carpeta de caché (por defecto '.cache/' junto al shapefile CCPP)
+
+    Returns:
+        GeoDataFrame con CentroPoblado, Departamento, NumHosp, geometry y los
+        rankings nacionales RankAislado (1 = menos hospitales) y
+        RankConcentrado (1 = más hospitales), ordenado por RankConcentrado
+    """
+    ccpp_xy = projected_xy(gdf_ccpp)
+    hosp_xy = projected_xy(gdf_hospitals)
+    hosp_xy = hosp_xy[np.isfinite(hosp_xy).all(axis=1)]
+
+    source = gdf_ccpp.attrs.get("source")
+    cache_dir = cache_dir or (default_cache_dir(source) if source else None)
+    path = None
+    if use_cache and cache_dir:
+        # El resultado también lleva nombre, departamento e índice de cada centro poblado
+        key = cache_key(array_hash(ccpp_xy, hosp_xy, _label_hash(gdf_ccpp)), {"buffer": buffer_distance})
+        path = cache_path(cache_dir, "proximity", key)
+        cached = read_cached_gdf(path)
+        if cached is not None:
+            note("cache", path)
+            return cached
+
+    col_dept = get_schema(gdf_ccpp).get("departamento")
+    departments = (normalize_values(gdf_ccpp[col_dept]).to_numpy() if col_dept
+                   else np.full(len(gdf_ccpp), "PERÚ", dtype=object))
+
+    valid = np.isfinite(ccpp_xy).all(axis=1)
+    tasks, rows_by_dept = _partition_tasks(ccpp_xy[valid], hosp_xy, departments[valid], buffer_distance)
+    valid_rows = np.flatnonzero(valid)
+
+    results = None
+    if max_workers != 1 and len(tasks) > 1:
+        workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+        # Las particiones grandes primero para equilibrar la carga
+        ordered = sorted(tasks, key=lambda t: len(t[1]) * max(len(t[2]), 1), reverse=True)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_count_partition, ordered))
+        except (BrokenProcessPool, OSError) as e:
+            warn(f"Pool de procesos no disponible ({e}); se calcula en serie")
+    if results is None:
+        results = [_count_partition(t) for t in tasks]
+
+    counts = np.zeros(len(gdf_ccpp), dtype=np.int32)
+    for dept, dept_counts in results:
+        counts[valid_rows[rows_by_dept[dept]]] = dept_counts
+
+    resultado = _result_frame(gdf_ccpp, counts)
+    resultado["RankAislado"] = resultado["NumHosp"].rank(method="min", ascending=True).astype(int)
+    resultado["RankConcentrado"] = resultado["NumHosp"].rank(method="min", ascending=False).astype(int)
+    resultado = resultado.sort_values(["RankConcentrado", "CentroPoblado"])
+
+    note("departamentos", len(tasks))
+    if path:
+        write_cached_gdf(resultado, path)
+    return resultado
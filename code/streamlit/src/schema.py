@@ -0,0 +1,177 @@
+import unicodedata
+
+from instrumentation import warn
+
+# Nombres canónicos -> nombres reales conocidos (IPRESS, shapefiles del INEI/IGN
+# y exportaciones antiguas). La comparación ignora mayúsculas, espacios y tildes.
+COLUMN_ALIASES = {
+    "institucion":    ["Institución", "INSTITUCION"],
+    "codigo":         ["Código Único", "Código Único de IPRESS", "COD_IPRESS", "CODIGO_RENAES", "co_ipress"],
+    "nombre":         ["Nombre del establecimiento", "Nombre del establecimientos", "NOMBRE_ESTABLECIMIENTO"],
+    "clasificacion":  ["Clasificación"],
+    "categoria":      ["Categoria", "CATEGORIA_IPRESS"],
+    "departamento":   ["Departamento", "DEPARTAMEN", "NOMBDEP", "DEP"],
+    "provincia":      ["Provincia", "NOMBPROV", "PROV"],
+    "distrito":       ["Distrito", "NOMBDIST", "DIST"],
+    "ubigeo":         ["UBIGEO", "IDDIST", "CODUBIGEO", "UBIGEO_INEI"],
+    "estado":         ["Estado"],
+    "condicion":      ["Condición", "Condicion de funcionamiento"],
+    "norte":          ["NORTE"],
+    "este":           ["ESTE"],
+    "zona":           ["Zona UTM", "Zona", "Huso"],
+    "centro_poblado": ["NOM_POBLAD", "NOMBCCPP", "CENTRO_POBLADO"],
+}
+
+# NORTE/ESTE son coordenadas UTM en metros: una exportación con LATITUD y
+# LONGITUD en grados no se debe resolver como ellas (se reproyectaría como UTM).
+
+# Último recurso (heurística histórica del proyecto): prefijos que, si una
+# columna empieza con ellos, la identifican. Solo se usa cuando ningún alias
+# exacto coincide, y cada coincidencia se advierte para agregar el alias.
+COLUMN_PATTERNS = {
+    "departamento": ("nombdep", "departamen"),
+    "distrito": ("nombdist", "distrito"),
+    "nombre": ("nombre",),
+}
+
+def normalize_name(name):
+    """Nombre de columna normalizado: minúsculas, sin espacios extremos ni tildes."""
+    text = unicodedata.normalize("NFKD", str(name).strip().lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def normalize_values(series):
+    """Valores de texto normalizados para comparar nombres: MAYÚSCULAS, sin tildes ni espacios extremos."""
+    return (series.astype(str).str.upper().str.strip()
+                  .str.normalize("NFKD")
+                  .str.encode("ascii", errors="ignore")
+                  .str.decode("ascii"))
+
+def register_aliases(canonical, names):
+    """Agrega alias globales para un nombre canónico (p. ej. una nueva versión de IPRESS)."""
+    COLUMN_ALIASES.setdefault(canonical, [])
+    for name in names:
+        if name not in COLUMN_ALIASES[canonical]:
+            COLUMN_ALIASES[canonical].append(name)
+
+def _merged_aliases(aliases=None):
+    merged = {k: list(v) for k, v in COLUMN_ALIASES.items()}
+    for canonical, names in (aliases or {}).items():
+        merged[canonical] = list(names) + merged.get(canonical, [])
+    return merged
+
+def expand_aliases(names, aliases=None):
+    """
+    Conjunto de nombres normalizados equivalentes a 'names': cada nombre que es
+    alias de un canónico arrastra todos los alias de ese canónico.
+    """
+    merged = _merged_aliases(aliases)
+    wanted = {normalize_name(n) for n in names}
+    for alias_list in merged.values():
+        keys = {normalize_name(a) for a in alias_list}
+        if keys & wanted:
+            wanted |= keys
+    return wanted
+
+class Schema:
+    """
+    Mapeo resuelto de nombres canónicos ('departamento', 'ubigeo', 'norte', ...)
+    a las columnas reales de un DataFrame. Se calcula una vez al cargar los
+    datos y viaja con el DataFrame en df.attrs['schema'].
+    """
+
+    def __init__(self, columns):
+        self.columns = dict(columns)
+
+    def get(self, name, default=None):
+        return self.columns.get(name, default)
+
+    def require(self, name):
+        if name not in self.columns:
+            raise KeyError(
+                f"No se encontró la columna '{name}' en el archivo. "
+                f"Columnas resueltas: {self.columns}"
+            )
+        return self.columns[name]
+
+    def __getitem__(self, name):
+        return self.require(name)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __eq__(self, other):
+        return isinstance(other, Schema) and self.columns == other.columns
+
+    def __repr__(self):
+        return f"Schema({self.columns})"
+
+    def rename_map(self, target):
+        """Renombres para llevar las columnas de este esquema a las de 'target'."""
+        return {
+            col: target.columns[name]
+            for name, col in self.columns.items()
+            if name in target.columns and target.columns[name] != col
+        }
+
+    def to_dict(self):
+        return dict(self.columns)
+
+def resolve_schema(df, aliases=None):
+    """
+    Resuelve los nombres canónicos contra las columnas de 'df'.
+
+    Args:
+        df: DataFrame o GeoDataFrame
+        aliases: alias adicionales {canónico: [nombres]} con prioridad sobre los globales
+
+    Returns:
+        Schema
+    """
+    by_norm = {}
+    for c in df.columns:
+        by_norm.setdefault(normalize_name(c), c)
+
+    resolved = {}
+    for canonical, alias_list in _merged_aliases(aliases).items():
+        for alias in alias_list:
+            col = by_norm.get(normalize_name(alias))
+            if col is not None:
+                resolved[canonical] = col
+                break
+
+    used = set(resolved.values())
+    for canonical, fragments in COLUMN_PATTERNS.items():
+        if canonical in resolved:
+            continue
+        for norm, col in by_norm.items():
+            if col not in used and norm.startswith(fragments):
+                warn(f"Columna '{col}' resuelta como '{canonical}' por prefijo: "
+                     "conviene registrarla como alias (register_aliases)")
+                resolved[canonical] = col
+                used.add(col)
+                break
+
+    return Schema(resolved)
+
+def attach_schema(df, schema):
+    """Guarda el esquema en df.attrs (se propaga en copias y filtros de pandas)."""
+    df.attrs["schema"] = schema.to_dict()
+    df.attrs["schema_columns"] = [str(c) for c in df.columns]
+    return df
+
+def get_schema(df, aliases=None):
+    """
+    Devuelve el esquema adjunto a 'df'. Si no tiene, lo resuelve y lo adjunta
+    para las siguientes llamadas. Si las columnas cambiaron desde que se
+    adjuntó, se conservan los mapeos que siguen siendo válidos y se resuelven
+    solo los nombres canónicos que faltan.
+    """
+    cached = df.attrs.get("schema")
+    if cached is not None and df.attrs.get("schema_columns") == [str(c) for c in df.columns]:
+        return Schema(cached)
+    schema = resolve_schema(df, aliases)
+    if cached is not None:
+        kept = {k: v for k, v in cached.items() if v in df.columns}
+        schema = Schema({**schema.to_dict(), **kept})
+    attach_schema(df, schema)
+    return schema
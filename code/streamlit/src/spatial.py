@@ -0,0 +1,110 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import shapely
+
+from cache import array_hash, cache_key, default_cache_dir, read_cached_array, write_cached_array
+from instrumentation import instrumented, note
+
+# Índices STRtree recientes por capa de distritos (clave: huella de la capa)
+_district_trees = OrderedDict()
+_MAX_TREES = 4
+# Resultados recientes de asignación (clave: huella de puntos + distritos)
+_assignments = OrderedDict()
+_MAX_ASSIGNMENTS = 16
+_lock = threading.Lock()
+
+def district_fingerprint(gdf_districts):
+    """Huella de la capa de distritos: claves UBIGEO + límites + CRS."""
+    keys = _keys(gdf_districts)
+    bounds = shapely.bounds(gdf_districts.geometry.to_numpy())
+    return cache_key(array_hash(keys, bounds), {"crs": str(gdf_districts.crs)})
+
+def _keys(gdf_districts):
+    if "UBIGEO_KEY" in gdf_districts.columns:
+        return gdf_districts["UBIGEO_KEY"].to_numpy(dtype=np.int32)
+    # Sin UBIGEO: la posición de la fila identifica al polígono
+    return np.arange(1, len(gdf_districts) + 1, dtype=np.int32)
+
+def district_index(gdf_districts):
+    """
+    STRtree sobre los polígonos de distritos (geometrías preparadas).
+    Se construye una sola vez por capa y se reutiliza entre llamadas.
+    """
+    fp = district_fingerprint(gdf_districts)
+    with _lock:
+        tree = _district_trees.get(fp)
+        if tree is not None:
+            _district_trees.move_to_end(fp)
+            return tree
+        geoms = gdf_districts.geometry.to_numpy()
+        shapely.prepare(geoms)
+        tree = shapely.STRtree(geoms)
+        _district_trees[fp] = tree
+        if len(_district_trees) > _MAX_TREES:
+            _district_trees.popitem(last=False)
+    return tree
+
+@instrumented("spatial.assign_districts", rows_in=lambda gdf_points, *args, **kwargs: len(gdf_points))
+def assign_districts(gdf_points, gdf_districts, cache_dir=None):
+    """
+    Asigna cada punto al polígono de distrito que lo contiene, en una sola
+    consulta masiva al STRtree (predicado 'covered_by', así los puntos sobre
+    un límite también se asignan).
+
+    Args:
+        gdf_points: GeoDataFrame de puntos (hospitales o centros poblados)
+        gdf_districts: capa de distritos (con UBIGEO_KEY si está disponible)
+        cache_dir: carpeta de caché en disco; por defecto '.cache/' junto al
+            shapefile de distritos (si se conoce su ruta)
+
+    Returns:
+        np.ndarray int32 con el UBIGEO_KEY de cada punto (-1 si cae fuera)
+    """
+    geoms = gdf_points.geometry
+    if gdf_points.crs is not None and gdf_districts.crs is not None and gdf_points.crs != gdf_districts.crs:
+        geoms = geoms.to_crs(gdf_districts.crs)
+    geoms = geoms.to_numpy()
+
+    fp = district_fingerprint(gdf_districts)
+    # get_coordinates omite las geometrías vacías o nulas: la máscara de
+    # validez distingue, p. ej., [A, None, B] de [A, B, None]
+    valid = ~(shapely.is_missing(geoms) | shapely.is_empty(geoms))
+    xy = shapely.get_coordinates(geoms)
+    key = cache_key(array_hash(valid, xy), {"districts": fp})
+
+    with _lock:
+        if key in _assignments:
+            _assignments.move_to_end(key)
+            return _assignments[key]
+
+    cache_dir = cache_dir or _default_dir(gdf_districts)
+    path = os.path.join(cache_dir, f"districts-assign-{key}.npy") if cache_dir else None
+    result = read_cached_array(path) if path else None
+
+    if result is None:
+        tree = district_index(gdf_districts)
+        point_idx, poly_idx = tree.query(geoms, predicate="covered_by")
+
+        # Un punto sobre un límite puede caer en dos polígonos: se usa el primero
+        first_point, first_pos = np.unique(point_idx, return_index=True)
+        result = np.full(len(geoms), -1, dtype=np.int32)
+        result[first_point] = _keys(gdf_districts)[poly_idx[first_pos]]
+
+        note("dentro_de_distrito", int((result >= 0).sum()))
+        if path:
+            write_cached_array(result, path)
+
+    # Compartido entre llamadas: de solo lectura
+    result.setflags(write=False)
+    with _lock:
+        _assignments[key] = result
+        if len(_assignments) > _MAX_ASSIGNMENTS:
+            _assignments.popitem(last=False)
+    return result
+
+def _default_dir(gdf_districts):
+    source = gdf_districts.attrs.get("source")
+    return default_cache_dir(source) if source else None
@@ -0,0 +1,115 @@
+"""
+Reporte de tiempos de importación del dashboard: cuánto cuesta lo que se
+importa al arrancar streamlit_app.py y cuánto se ahorra al diferir las
+librerías pesadas (geopandas, matplotlib, plotly, folium...) hasta que
+una función las necesita.
+
+Uso (desde code/streamlit/src):
+    python startup.py
+    python startup.py --modules plots estimation --top 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Lo que importa streamlit_app.py antes de mostrar la primera pestaña
+STARTUP_MODULES = ("streamlit", "schema", "context")
+
+# Librerías que no deberían cargarse al arrancar
+HEAVY_MODULES = (
+    "geopandas", "matplotlib.pyplot", "plotly.express", "folium",
+    "scipy.spatial", "pyogrio", "pyarrow", "streamlit_folium",
+)
+
+def import_times(modules, cwd=SRC_DIR):
+    """
+    Importa 'modules' en un intérprete nuevo con -X importtime.
+
+    Returns:
+        (lista de dicts con module, depth, self_ms y cumulative_ms en el
+        orden en que terminó cada importación, módulos de HEAVY_MODULES que
+        quedaron cargados)
+    """
+    code = "".join(f"import {m}\n" for m in modules)
+    code += f"import sys, json\nprint(json.dumps([m for m in {list(HEAVY_MODULES)!r} if m in sys.modules]))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    heavy_loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    return entries, heavy_loaded
+
+def startup_report(modules=STARTUP_MODULES, top=15):
+    """
+    Imprime el costo de importar 'modules' (importaciones de primer nivel
+    más caras y total) y el de cada librería pesada que se difiere.
+
+    Returns:
+        dict con total_ms, top (módulo, ms), heavy_loaded y deferred_ms
+    """
+    # Lo que el intérprete importa de por sí (site, encodings...) no cuenta
+    baseline = {e["module"] for e in import_times([])[0]}
+    entries, heavy_loaded = import_times(modules)
+    roots = [e for e in entries if e["depth"] == 0 and e["module"] not in baseline]
+    total = sum(e["cumulative_ms"] for e in roots)
+
+    print(f"Importaciones al arrancar ({', '.join(modules)}): {total:.0f} ms")
+    for e in sorted(roots, key=lambda e: e["cumulative_ms"], reverse=True)[:top]:
+        print(f"  {e['cumulative_ms']:8.1f} ms  {e['module']}")
+    if heavy_loaded:
+        print(f"Librerías pesadas cargadas al arrancar: {', '.join(heavy_loaded)}")
+    else:
+        print("Ninguna librería pesada se carga al arrancar")
+
+    deferred = {}
+    for module in HEAVY_MODULES:
+        if module in heavy_loaded:
+            continue
+        try:
+            module_entries, _ = import_times(list(modules) + [module])
+        except RuntimeError as e:
+            print(f"  {module}: no disponible ({e})")
+            continue
+        # Costo adicional: solo lo que se importa después de los módulos de arranque
+        loaded_before = {e["module"] for e in entries}
+        deferred[module] = sum(e["self_ms"] for e in module_entries if e["module"] not in loaded_before)
+
+    if deferred:
+        print("Diferido hasta el primer uso (cada librería medida por separado):")
+        for module, ms in sorted(deferred.items(), key=lambda kv: kv[1], reverse=True):
+            print(f"  {ms:8.1f} ms  {module}")
+
+    return {
+        "total_ms": total,
+        "top": [(e["module"], e["cumulative_ms"]) for e in roots],
+        "heavy_loaded": heavy_loaded,
+        "deferred_ms": deferred,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempos de importación al arrancar el dashboard.")
+    parser.add_argument("--modules", nargs="+", default=list(STARTUP_MODULES), help="módulos a importar")
+    parser.add_argument("--top", type=int, default=15, help="importaciones a listar")
+    args = parser.parse_args(argv)
+    startup_report(args.modules, args.top)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,12 @@
-import streamlit as st
-import pandas as pd
-import geopandas as gpd
-import folium
 import os
-from estimation import load_and_filter_ipress, get_data_summary, get_departments_list
-from plots import create_hospital_map, create_department_bar
-import matplotlib
-matplotlib.use('Agg')  # Backend para Streamlit
+
+# Backend de matplotlib para Streamlit, por variable de entorno: matplotlib
+# (como geopandas, folium y plotly) se importa recién cuando se usa
+os.environ['MPLBACKEND'] = 'Agg'
+
+import streamlit as st
+from context import ProductError
+from schema import get_schema
 
 # Configuración de página
 st.set_page_config(
@@ -18,6 +18,30 @@ st.set_page_config(
 # Título principal
 st.title("🏥 Análisis de Hospitales Operativos en Perú")
 
+# Etapas que se calculan en esta ejecución del script (panel opcional en la
+# barra lateral; se completa al final)
+from instrumentation import breakdown, collect
+
+# La clave reemplaza al colector de una ejecución anterior en este hilo que
+# no llegó a detenerse (p. ej. si terminó con st.stop())
+rerun_stages = collect(key="streamlit_rerun")
+rerun_stages.start()
+with st.sidebar:
+    mostrar_tiempos = st.checkbox(
+        "⏱️ Tiempos de esta ejecución",
+        value=False,
+        help="Etapas de carga y análisis que se calcularon en esta ejecución"
+    )
+    panel_tiempos = st.container()
+
+# Datos compartidos por todas las sesiones: se cargan una vez por proceso
+@st.cache_resource
+def get_data_context():
+    from context import DataContext
+    return DataContext()
+
+data = get_data_context()
+
 # Crear tabs
 tab1, tab2, tab3 = st.tabs(["📂 Descripción de Datos", "📊 Análisis Estático", "🌍 Mapas Dinámicos"])
 
@@ -63,20 +87,12 @@ with tab1:
     
     st.divider()
     
-    # Cargar datos
-    @st.cache_data
-    def load_data():
-        # Buscar archivo Excel en data/
-        excel_path = '../data/IPRESS.xlsx'
-        if not os.path.exists(excel_path):
-            excel_path = 'data/IPRESS.xlsx'
-        if not os.path.exists(excel_path):
-            raise FileNotFoundError("No se encontró IPRESS.xlsx en la carpeta data/")
-        return load_and_filter_ipress(excel_path)
-    
     try:
         with st.spinner('⏳ Cargando y procesando datos desde Excel...'):
-            gdf_hospitals = load_data()
+            from estimation import get_data_summary, get_departments_list, memory_footprint
+            from plots import create_hospital_map
+            
+            gdf_hospitals = data.get('hospitals')
             
             # Verificar si hay datos
             if len(gdf_hospitals) == 0:
@@ -120,11 +136,8 @@ with tab1:
         st.subheader("📊 Distribución por Distrito")
         
         # Obtener conteo por departamento
-        col_dept = None
-        for c in gdf_hospitals.columns:
-            if c.strip().lower() == "departamento":
-                col_dept = c
-                break
+        schema = get_schema(gdf_hospitals)
+        col_dept = schema.get("departamento")
         
         if col_dept:
             dept_counts = gdf_hospitals[col_dept].value_counts().sort_values(ascending=False)
@@ -183,13 +196,6 @@ with tab1:
         
         # Aplicar filtro
         if selected_dept != "Todos":
-            # Buscar columna Departamento
-            col_dept = None
-            for c in gdf_hospitals.columns:
-                if c.strip().lower() == "departamento":
-                    col_dept = c
-                    break
-            
             if col_dept:
                 gdf_filtered = gdf_hospitals[gdf_hospitals[col_dept] == selected_dept]
                 st.info(f"Mostrando {len(gdf_filtered)} hospitales en **{selected_dept}**")
@@ -198,26 +204,34 @@ with tab1:
         else:
             gdf_filtered = gdf_hospitals
         
+        # Mapa de hospitales: celdas agregadas a zoom bajo, puntos al acercarse
+        zoom_mapa = st.slider("Zoom del mapa:", min_value=4, max_value=13, value=5 if selected_dept == "Todos" else 7)
+        if selected_dept != "Todos" and len(gdf_filtered) > 0:
+            centro = {"lat": float(gdf_filtered.geometry.y.median()), "lon": float(gdf_filtered.geometry.x.median())}
+        else:
+            centro = None
+        st.plotly_chart(create_hospital_map(gdf_filtered, zoom=zoom_mapa, center=centro), use_container_width=True)
+        
         st.divider()
         
         # Vista previa de datos
         st.subheader("🔍 Vista Previa de Datos")
         
-        # Columnas clave para mostrar
+        # Columnas clave para mostrar (nombres canónicos del esquema)
         display_columns = [
-            'Institución',
-            'Nombre del establecimiento',
-            'Departamento',
-            'Provincia',
-            'Distrito',
-            'Categoria',
-            'Estado',
-            'NORTE',
-            'ESTE'
+            'institucion',
+            'nombre',
+            'departamento',
+            'provincia',
+            'distrito',
+            'categoria',
+            'estado',
+            'norte',
+            'este'
         ]
         
         # Filtrar solo las columnas que existen
-        available_columns = [col for col in display_columns if col in gdf_filtered.columns]
+        available_columns = [schema[col] for col in display_columns if col in schema]
         
         if len(available_columns) > 0:
             st.dataframe(
@@ -238,16 +252,13 @@ with tab1:
                 st.write(f"- Filas totales: {len(gdf_hospitals):,}")
                 st.write(f"- Filas mostradas: {len(gdf_filtered):,}")
                 st.write(f"- Columnas: {len(gdf_hospitals.columns)}")
+                st.write(f"- Memoria: {memory_footprint(gdf_hospitals)['total_mb']:.2f} MB")
             
             with col_info2:
                 st.markdown("**Sistema de coordenadas:**")
-                st.write(f"- Original: UTM 18S (EPSG:32718)")
+                st.write(f"- Original: UTM 18S (EPSG:32718) o la zona UTM de cada registro")
                 st.write(f"- Convertido a: WGS84 (EPSG:4326)")
         
-        # Guardar en session_state para otros tabs
-        st.session_state['gdf_hospitals'] = gdf_hospitals
-        st.session_state['gdf_filtered'] = gdf_filtered
-        
     except FileNotFoundError as e:
         st.error("❌ No se encontró el archivo IPRESS.xlsx")
         st.info("💡 Asegúrate de que el archivo esté en la carpeta **data/** y se llame **IPRESS.xlsx**")
@@ -257,6 +268,9 @@ with tab1:
             st.write("Buscando en:")
             st.code("../data/IPRESS.xlsx\ndata/IPRESS.xlsx")
         
+    except ProductError as e:
+        st.error(f"❌ {str(e)}")
+        
     except Exception as e:
         st.error(f"❌ Error al cargar los datos: {str(e)}")
         
@@ -268,50 +282,44 @@ with tab1:
 with tab2:
     st.header("🗺️ Mapas Estáticos y Análisis por Departamento")
     
-    if 'gdf_hospitals' not in st.session_state:
+    if not data.is_loaded('hospitals'):
         st.warning("⚠️ Primero carga los datos en la pestaña **'Descripción de Datos'**")
     else:
         try:
-            # Cargar shapefile de distritos
-            @st.cache_data
-            def load_districts():
-                # Buscar v_distritos_2023.shp
-                shapefile_path = '../data/v_distritos_2023.shp'
-                if not os.path.exists(shapefile_path):
-                    shapefile_path = 'data/v_distritos_2023.shp'
-                if not os.path.exists(shapefile_path):
-                    raise FileNotFoundError("No se encontró v_distritos_2023.shp")
-                
-                from estimation import load_districts_shapefile, merge_hospitals_with_districts
-                gdf_dist = load_districts_shapefile(shapefile_path)
-                
-                # Hacer merge con hospitales
-                gdf_merged = merge_hospitals_with_districts(
-                    st.session_state['gdf_hospitals'], 
-                    gdf_dist
-                )
-                
-                return gdf_dist, gdf_merged
+            from estimation import get_departments_list
+            from plots import (
+                create_department_bar, create_department_static_map, create_static_choropleth_map,
+                create_top10_hospitals_map, create_zero_hospitals_map, render_cached,
+            )
+            
+            gdf_hospitals = data.get('hospitals')
             
             with st.spinner('📍 Cargando shapefile de distritos...'):
-                gdf_districts, gdf_districts_merged = load_districts()
+                gdf_districts = data.get('districts')
+                gdf_districts_merged = data.get('merged')
             
             st.success(f'✅ Shapefile cargado: {len(gdf_districts)} distritos')
             
+            # Atlas pre-renderizado (python atlas.py): se usa si corresponde a estos datos
+            from atlas import atlas_image, department_id, load_manifest
+            clave_atlas = data.get('atlas_key')
+            manifest_atlas = load_manifest()
+            
             st.divider()
             
             # MAPA 1: Distribución Nacional de Hospitales por Distrito
             st.subheader("🗺️ Mapa 1: Distribución de Hospitales por Distrito")
             
             with st.spinner('Generando mapa nacional...'):
-                from plots import create_static_choropleth_map
-                
-                fig_choropleth = create_static_choropleth_map(
+                # Imagen en caché: solo se vuelve a dibujar si cambian los datos
+                img_choropleth = atlas_image('nacional_hospitales', clave_atlas, manifest=manifest_atlas) or render_cached(
+                    create_static_choropleth_map,
                     gdf_districts_merged,
+                    data_key=clave_atlas,
                     title="Distribución de Hospitales por Distrito en Perú"
                 )
                 
-                st.pyplot(fig_choropleth)
+                st.image(img_choropleth, use_container_width=True)
             
             # Estadísticas del mapa 1
             col1, col2, col3 = st.columns(3)
@@ -334,14 +342,15 @@ with tab2:
             st.subheader("🗺️ Mapa 2: Distritos sin Hospitales Públicos")
             
             with st.spinner('Generando mapa de distritos sin hospitales...'):
-                from plots import create_zero_hospitals_map
-                
-                fig_zero = create_zero_hospitals_map(
+                # Imagen en caché: solo se vuelve a dibujar si cambian los datos
+                img_zero = atlas_image('nacional_sin_hospitales', clave_atlas, manifest=manifest_atlas) or render_cached(
+                    create_zero_hospitals_map,
                     gdf_districts_merged,
+                    data_key=clave_atlas,
                     title="Distritos sin Hospitales Públicos"
                 )
                 
-                st.pyplot(fig_zero)
+                st.image(img_zero, use_container_width=True)
             
             st.info(f"📊 **{distritos_sin_hosp} distritos** ({(distritos_sin_hosp/len(gdf_districts_merged)*100):.1f}% del total) no cuentan con hospitales públicos")
             
@@ -351,14 +360,15 @@ with tab2:
             st.subheader("🗺️ Mapa 3: Top 10 Distritos con Más Hospitales")
             
             with st.spinner('Generando mapa de top 10 distritos...'):
-                from plots import create_top10_hospitals_map
-                
-                fig_top10 = create_top10_hospitals_map(
+                # Imagen en caché: solo se vuelve a dibujar si cambian los datos
+                img_top10 = atlas_image('nacional_top10', clave_atlas, manifest=manifest_atlas) or render_cached(
+                    create_top10_hospitals_map,
                     gdf_districts_merged,
+                    data_key=clave_atlas,
                     title="Top 10 Distritos con Mayor Número de Hospitales"
                 )
                 
-                st.pyplot(fig_top10)
+                st.image(img_top10, use_container_width=True)
             
             # Tabla del Top 10
             top10_data = gdf_districts_merged.nlargest(10, 'n_hospitales')[['DISTRITO_NORM', 'n_hospitales']].copy()
@@ -387,9 +397,34 @@ with tab2:
             # Gráfico de Barras por Departamento
             st.subheader("📊 Top 10 Departamentos con Más Hospitales")
             
-            bar_chart = create_department_bar(st.session_state['gdf_hospitals'])
+            bar_chart = create_department_bar(gdf_hospitals)
             st.plotly_chart(bar_chart, use_container_width=True)
             
+            st.divider()
+            
+            # Mapa por departamento (del atlas si está exportado)
+            st.subheader("🗺️ Mapa por Departamento")
+            
+            departamentos_mapa = get_departments_list(gdf_hospitals)
+            if departamentos_mapa:
+                dept_mapa = st.selectbox("Departamento:", options=departamentos_mapa, key="dept_mapa")
+                
+                img_dept = atlas_image(department_id(dept_mapa), clave_atlas, manifest=manifest_atlas)
+                if img_dept is None:
+                    with st.spinner(f'Generando mapa de {dept_mapa}...'):
+                        img_dept = render_cached(
+                            create_department_static_map,
+                            gdf_districts_merged,
+                            gdf_hospitals,
+                            dept_mapa,
+                            data_key=clave_atlas
+                        )
+                
+                if img_dept is not None:
+                    st.image(img_dept, use_container_width=True)
+                else:
+                    st.warning(f"No se encontraron distritos para {dept_mapa}")
+            
         except FileNotFoundError as e:
             st.error("❌ No se encontró el archivo v_distritos_2023.shp")
             st.info("💡 Asegúrate de que el shapefile esté en la carpeta **data/** con sus archivos asociados (.shp, .shx, .dbf, .prj)")
@@ -398,6 +433,9 @@ with tab2:
                 st.write("Buscando en:")
                 st.code("../data/v_distritos_2023.shp\ndata/v_distritos_2023.shp")
             
+        except ProductError as e:
+            st.error(f"❌ {str(e)}")
+            
         except Exception as e:
             st.error(f"❌ Error: {str(e)}")
             
@@ -409,102 +447,106 @@ with tab2:
 with tab3:
     st.header("🌍 Mapas Dinámicos con Folium")
     
-    if 'gdf_hospitals' not in st.session_state:
+    if not data.is_loaded('hospitals'):
         st.warning("⚠️ Primero carga los datos en la pestaña **'Descripción de Datos'**")
     else:
         try:
-            # Cargar shapefiles (reutilizando el mismo código del Tab 2)
-            @st.cache_data
-            def load_all_shapefiles():
-                from estimation import load_districts_shapefile, load_ccpp_shapefile, merge_hospitals_with_districts
-                
-                # Distritos (mismo que Tab 2)
-                shapefile_path = '../data/v_distritos_2023.shp'
-                if not os.path.exists(shapefile_path):
-                    shapefile_path = 'data/v_distritos_2023.shp'
-                if not os.path.exists(shapefile_path):
-                    raise FileNotFoundError("No se encontró v_distritos_2023.shp")
-                
-                gdf_dist = load_districts_shapefile(shapefile_path)
-                gdf_merged = merge_hospitals_with_districts(st.session_state['gdf_hospitals'], gdf_dist)
-                
-                # CCPP
-                ccpp_path = '../data/CCPP_IGN100K.shp'
-                if not os.path.exists(ccpp_path):
-                    ccpp_path = 'data/CCPP_IGN100K.shp'
-                if not os.path.exists(ccpp_path):
-                 raise FileNotFoundError("No se encontró CCPP_IGN100K.shp")
-
-                gdf_ccpp = load_ccpp_shapefile(ccpp_path)
-                
-                return gdf_dist, gdf_merged, gdf_ccpp
+            from plots import (
+                create_ccpp_proximity_map, create_coverage_curve_chart, create_hex_density_map,
+                create_national_hospital_map, create_vector_tile_map,
+            )
+            
+            gdf_hospitals = data.get('hospitals')
             
             with st.spinner('📍 Cargando shapefiles...'):
-                gdf_districts, gdf_districts_merged, gdf_ccpp = load_all_shapefiles()
+                gdf_districts = data.get('districts')
+                gdf_ccpp = data.get('ccpp')
             
             st.success(f'✅ Datos cargados: {len(gdf_districts)} distritos, {len(gdf_ccpp)} centros poblados')
             
+            from streamlit_folium import folium_static
+            import streamlit.components.v1 as components
+            
+            # Mapas HTML pre-generados por pipeline.py (si están al día con los datos)
+            mapas_html = data.get('maps')
+            
+            def mostrar_mapa(nombre, crear_mapa, width, height):
+                """Muestra el HTML pre-generado 'nombre' si existe; si no, crea el mapa."""
+                if nombre in mapas_html:
+                    with open(mapas_html[nombre], encoding='utf-8') as f:
+                        components.html(f.read(), width=width, height=height)
+                else:
+                    folium_static(crear_mapa(), width=width, height=height)
+            
             st.divider()
             
             # MAPA 1: Nacional con Marcadores
             st.subheader("🗺️ Mapa Nacional: Ubicación de Hospitales")
-            st.markdown("Mapa interactivo con marcadores de hospitales agrupados por región.")
+            st.markdown(f"Mapa interactivo con los {len(gdf_hospitals):,} hospitales, agrupados por región.")
             
             with st.spinner('Generando mapa nacional...'):
-                from streamlit_folium import folium_static
-                import folium
-                from folium import plugins
-                
-                m = folium.Map(location=[-9.19, -75.0152], zoom_start=6, tiles='OpenStreetMap')
-                marker_cluster = plugins.MarkerCluster(name='Hospitales').add_to(m)
-                
-                col_nombre = None
-                col_dept = None
-                for c in st.session_state['gdf_hospitals'].columns:
-                    c_lower = c.strip().lower()
-                    if 'nombre' in c_lower and 'establecimiento' in c_lower:
-                        col_nombre = c
-                    elif c_lower == 'departamento':
-                        col_dept = c
-                
-                for idx, row in st.session_state['gdf_hospitals'].head(500).iterrows():
-                    nombre = row[col_nombre] if col_nombre else 'Hospital'
-                    dept = row[col_dept] if col_dept else ''
-                    popup_text = f"<b>{nombre}</b><br>Departamento: {dept}"
-                    folium.CircleMarker(
-                        location=[row.geometry.y, row.geometry.x],
-                        radius=5,
-                        popup=folium.Popup(popup_text, max_width=300),
-                        color='green',
-                        fill=True,
-                        fillColor='green',
-                        fillOpacity=0.7
-                    ).add_to(marker_cluster)
-                
-                folium.LayerControl().add_to(m)
-                folium_static(m, width=1200, height=600)
+                # Todos los hospitales: agrupación en el navegador (FastMarkerCluster)
+                mostrar_mapa('hospitales_nacional', lambda: create_national_hospital_map(gdf_hospitals), 1200, 600)
             
             st.info("💡 Haz clic en los clusters verdes para expandir y ver hospitales individuales.")
             
+            # Teselas vectoriales (python tiles.py build): solo se descargan las visibles
+            from tiles import load_metadata
+            metadata_teselas = load_metadata()
+            
+            with st.expander("🧩 Mapa con teselas vectoriales (distritos, hospitales y centros poblados)"):
+                if metadata_teselas is None:
+                    st.info("💡 Genera las teselas con `python tiles.py build` para ver este mapa.")
+                else:
+                    from tiles import local_base_url, tile_settings, tile_url
+                    
+                    # El navegador descarga las teselas: en un despliegue se usa la URL
+                    # pública (HOSPITALS_TILE_URL); el servidor en el proceso es solo
+                    # para desarrollo local (HOSPITALS_TILE_SERVER=1)
+                    config_teselas = tile_settings()
+                    url_teselas = config_teselas['public_url']
+                    if url_teselas is None and config_teselas['local_server']:
+                        @st.cache_resource
+                        def tile_server(host, port):
+                            from tiles import start_tile_server
+                            return start_tile_server(host=host, port=port)
+                        
+                        try:
+                            tile_server(config_teselas['host'], config_teselas['port'])
+                            url_teselas = local_base_url(config_teselas['host'], config_teselas['port'])
+                        except OSError as e:
+                            st.warning(f"⚠️ No se pudo iniciar el servidor local de teselas en el puerto {config_teselas['port']}: {e}")
+                    
+                    if url_teselas is None:
+                        st.info("💡 Publica la carpeta `output/tiles` y define su URL en **HOSPITALS_TILE_URL** "
+                                "(o usa **HOSPITALS_TILE_SERVER=1** en desarrollo local) para ver este mapa.")
+                    else:
+                        folium_static(create_vector_tile_map(tile_url(url_teselas), metadata_teselas), width=1200, height=600)
+                        st.caption(f"{metadata_teselas['tiles']:,} teselas, zoom {metadata_teselas['minzoom']}–{metadata_teselas['maxzoom']}")
+            
             st.divider()
             
             # MAPAS DE PROXIMIDAD CON CCPP
             st.subheader("📍 Análisis de Proximidad por Centros Poblados")
-            st.markdown("Análisis de acceso a hospitales basado en centros poblados (CCPP) con buffer de 10 km.")
+            radio_km = st.select_slider(
+                "Radio del buffer (km):",
+                options=[5, 10, 20, 50],
+                value=10
+            )
+            st.markdown(f"Análisis de acceso a hospitales basado en centros poblados (CCPP) con buffer de {radio_km} km.")
+            
+            # Conteos nacionales para el radio elegido (Lima, Loreto y el ranking salen de esta tabla)
+            with st.spinner('Calculando proximidad para todos los departamentos...'):
+                from pipeline import map_name
+                from proximity import proximity_for_department
+                
+                ranking = data.get('proximity', buffer_distance=radio_km * 1000)
             
             # Análisis de Lima
             st.markdown("### 🔴 Lima - Alta Densidad")
             
             with st.spinner('Analizando proximidad en Lima...'):
-                from estimation import analyze_proximity_department
-                from plots import create_ccpp_proximity_map
-                
-                resultado_lima, hosp_lima = analyze_proximity_department(
-                    gdf_ccpp, 
-                    st.session_state['gdf_hospitals'], 
-                    'LIMA',
-                    buffer_distance=10000
-                )
+                resultado_lima, hosp_lima = proximity_for_department(ranking, gdf_hospitals, 'LIMA')
                 
                 if resultado_lima is not None:
                     aislado_lima = resultado_lima.loc[resultado_lima['NumHosp'].idxmin()]
@@ -515,24 +557,32 @@ with tab3:
                     with col1:
                         st.markdown("**Centro Poblado Más Concentrado**")
                         st.metric("Centro Poblado", concentrado_lima['CentroPoblado'])
-                        st.metric("Hospitales en 10km", int(concentrado_lima['NumHosp']))
+                        st.metric(f"Hospitales en {radio_km}km", int(concentrado_lima['NumHosp']))
                         
-                        mapa_lima_conc = create_ccpp_proximity_map(
-                            resultado_lima, hosp_lima, 'LIMA', 
-                            concentrado_lima, tipo='concentrado'
+                        mostrar_mapa(
+                            map_name('LIMA', 'concentrado', radio_km * 1000),
+                            lambda: create_ccpp_proximity_map(
+                                resultado_lima, hosp_lima, 'LIMA', 
+                                concentrado_lima, tipo='concentrado',
+                                buffer_distance=radio_km * 1000
+                            ),
+                            550, 500
                         )
-                        folium_static(mapa_lima_conc, width=550, height=500)
                     
                     with col2:
                         st.markdown("**Centro Poblado Más Aislado**")
                         st.metric("Centro Poblado", aislado_lima['CentroPoblado'])
-                        st.metric("Hospitales en 10km", int(aislado_lima['NumHosp']))
+                        st.metric(f"Hospitales en {radio_km}km", int(aislado_lima['NumHosp']))
                         
-                        mapa_lima_ais = create_ccpp_proximity_map(
-                            resultado_lima, hosp_lima, 'LIMA', 
-                            aislado_lima, tipo='aislado'
+                        mostrar_mapa(
+                            map_name('LIMA', 'aislado', radio_km * 1000),
+                            lambda: create_ccpp_proximity_map(
+                                resultado_lima, hosp_lima, 'LIMA', 
+                                aislado_lima, tipo='aislado',
+                                buffer_distance=radio_km * 1000
+                            ),
+                            550, 500
                         )
-                        folium_static(mapa_lima_ais, width=550, height=500)
                 else:
                     st.warning("No se pudieron analizar los datos de Lima")
             
@@ -542,12 +592,7 @@ with tab3:
             st.markdown("### 🔵 Loreto - Baja Densidad")
             
             with st.spinner('Analizando proximidad en Loreto...'):
-                resultado_loreto, hosp_loreto = analyze_proximity_department(
-                    gdf_ccpp, 
-                    st.session_state['gdf_hospitals'], 
-                    'LORETO',
-                    buffer_distance=10000
-                )
+                resultado_loreto, hosp_loreto = proximity_for_department(ranking, gdf_hospitals, 'LORETO')
                 
                 if resultado_loreto is not None:
                     aislado_loreto = resultado_loreto.loc[resultado_loreto['NumHosp'].idxmin()]
@@ -558,24 +603,32 @@ with tab3:
                     with col1:
                         st.markdown("**Centro Poblado Más Concentrado**")
                         st.metric("Centro Poblado", concentrado_loreto['CentroPoblado'])
-                        st.metric("Hospitales en 10km", int(concentrado_loreto['NumHosp']))
+                        st.metric(f"Hospitales en {radio_km}km", int(concentrado_loreto['NumHosp']))
                         
-                        mapa_loreto_conc = create_ccpp_proximity_map(
-                            resultado_loreto, hosp_loreto, 'LORETO', 
-                            concentrado_loreto, tipo='concentrado'
+                        mostrar_mapa(
+                            map_name('LORETO', 'concentrado', radio_km * 1000),
+                            lambda: create_ccpp_proximity_map(
+                                resultado_loreto, hosp_loreto, 'LORETO', 
+                                concentrado_loreto, tipo='concentrado',
+                                buffer_distance=radio_km * 1000
+                            ),
+                            550, 500
                         )
-                        folium_static(mapa_loreto_conc, width=550, height=500)
                     
                     with col2:
                         st.markdown("**Centro Poblado Más Aislado**")
                         st.metric("Centro Poblado", aislado_loreto['CentroPoblado'])
-                        st.metric("Hospitales en 10km", int(aislado_loreto['NumHosp']))
+                        st.metric(f"Hospitales en {radio_km}km", int(aislado_loreto['NumHosp']))
                         
-                        mapa_loreto_ais = create_ccpp_proximity_map(
-                            resultado_loreto, hosp_loreto, 'LORETO', 
-                            aislado_loreto, tipo='aislado'
+                        mostrar_mapa(
+                            map_name('LORETO', 'aislado', radio_km * 1000),
+                            lambda: create_ccpp_proximity_map(
+                                resultado_loreto, hosp_loreto, 'LORETO', 
+                                aislado_loreto, tipo='aislado',
+                                buffer_distance=radio_km * 1000
+                            ),
+                            550, 500
                         )
-                        folium_static(mapa_loreto_ais, width=550, height=500)
                 else:
                     st.warning("No se pudieron analizar los datos de Loreto")
             
@@ -598,14 +651,127 @@ with tab3:
                 
                 with col4:
                     st.metric("Máximo Loreto", int(resultado_loreto['NumHosp'].max()))
+                
+                # Distancia al hospital más cercano (también para centros sin hospitales en el radio);
+                # la tabla nacional no depende del radio y se calcula una sola vez
+                cercanos = data.get('nearest')
+                dist_lima = cercanos['DistHospKm'].reindex(resultado_lima.index)
+                dist_loreto = cercanos['DistHospKm'].reindex(resultado_loreto.index)
+                
+                col1, col2, col3, col4 = st.columns(4)
+                
+                with col1:
+                    st.metric("Distancia mediana Lima", f"{dist_lima.median():.1f} km")
+                
+                with col2:
+                    st.metric("Distancia máxima Lima", f"{dist_lima.max():.1f} km")
+                
+                with col3:
+                    st.metric("Distancia mediana Loreto", f"{dist_loreto.median():.1f} km")
+                
+                with col4:
+                    st.metric("Distancia máxima Loreto", f"{dist_loreto.max():.1f} km")
+            
+            st.divider()
+            
+            # Curvas de cobertura: todos los radios en una sola búsqueda de vecinos
+            st.subheader("📈 Cobertura por Radio de Búsqueda")
+            st.markdown("Proporción de centros poblados con al menos un hospital dentro de cada radio.")
             
+            with st.spinner('Calculando barrido de radios...'):
+                # Radios 5, 10, 20 y 50 km (pipeline.RADII)
+                coverage = data.get('coverage')
+                
+                selected_curves = st.multiselect(
+                    "Departamentos:",
+                    options=coverage.index.tolist(),
+                    default=[d for d in ['PERÚ', 'LIMA', 'LORETO'] if d in coverage.index]
+                )
+                
+                st.plotly_chart(
+                    create_coverage_curve_chart(coverage, selected_curves),
+                    use_container_width=True
+                )
+
+            st.divider()
+
+            # Ranking nacional: todos los departamentos en paralelo (resultado en caché)
+            st.subheader("🏆 Ranking Nacional de Centros Poblados")
+            st.markdown(f"Hospitales dentro de **{radio_km} km** de cada centro poblado, en todo el país.")
+
+            with st.spinner('Preparando ranking...'):
+                cols_ranking = ['CentroPoblado', 'Departamento', 'NumHosp']
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("**Más aislados**")
+                    st.dataframe(
+                        ranking.sort_values('RankAislado').head(10)[cols_ranking],
+                        use_container_width=True, hide_index=True
+                    )
+                with col2:
+                    st.markdown("**Más concentrados**")
+                    st.dataframe(
+                        ranking.sort_values('RankConcentrado').head(10)[cols_ranking],
+                        use_container_width=True, hide_index=True
+                    )
+
+            st.divider()
+
+            # Densidad en grilla hexagonal: celdas de igual área en lugar de distritos
+            st.subheader("⬡ Densidad en Grilla Hexagonal")
+            st.markdown("Hospitales por centro poblado en celdas hexagonales de igual tamaño.")
+
+            from hexgrid import cell_size
+
+            col1, col2 = st.columns(2)
+            with col1:
+                resolucion_hex = st.select_slider(
+                    "Tamaño de celda:",
+                    options=[2, 3, 4, 5],
+                    value=3,
+                    format_func=lambda res: f"{cell_size(res) / 1000:g} km"
+                )
+            with col2:
+                valor_hex = st.selectbox(
+                    "Variable:",
+                    options=['hosp_por_ccpp', 'n_hospitales', 'n_ccpp'],
+                    format_func={'hosp_por_ccpp': 'Hospitales por centro poblado',
+                                 'n_hospitales': 'Hospitales',
+                                 'n_ccpp': 'Centros poblados'}.get
+                )
+
+            with st.spinner('Agregando en la grilla hexagonal...'):
+                # Una tabla por resolución, compartida entre reruns y sesiones
+                densidad = data.get('hex_density', resolution=resolucion_hex)
+                st.plotly_chart(create_hex_density_map(densidad, valor_hex), use_container_width=True)
+
         except FileNotFoundError as e:
             st.error(f"❌ {str(e)}")
             st.info("💡 Asegúrate de que los archivos estén en la carpeta **data/**")
             
+        except ProductError as e:
+            st.error(f"❌ {str(e)}")
+            
         except Exception as e:
             st.error(f"❌ Error: {str(e)}")
             
             with st.expander("Ver error completo"):
                 import traceback
-                st.code(traceback.format_exc())
\ No newline at end of file
+                st.code(traceback.format_exc())
+
+# Panel de tiempos: desglose de las etapas calculadas en esta ejecución
+rerun_stages.stop()
+if data.fallbacks:
+    with st.sidebar:
+        st.info("💡 Calculado en el dashboard por falta de artefactos al día: "
+                f"{', '.join(sorted(data.fallbacks))}. Ejecuta `python pipeline.py` "
+                "para precalcularlos.")
+if mostrar_tiempos:
+    with panel_tiempos:
+        registros = rerun_stages.sink.records
+        if registros:
+            total = sum(r.seconds for r in registros if r.depth == 0)
+            st.caption(f"{len(registros)} etapas, {total:.2f} s en total")
+            st.dataframe(breakdown(registros), hide_index=True)
+        else:
+            st.caption("Ninguna etapa se calculó en esta ejecución: todo vino del contexto compartido")
@@ -0,0 +1,496 @@
+"""
+Teselas vectoriales (Mapbox Vector Tiles) para los mapas interactivos: una
+pirámide z/x/y en disco con las capas de distritos, centros poblados y
+hospitales. Los mapas Folium cargan solo las teselas visibles en lugar de
+incrustar todas las geometrías.
+
+Las teselas las descarga el navegador, no el servidor de Streamlit: en un
+despliegue la carpeta de salida se publica con cualquier servidor estático
+(o CDN) y su URL pública se indica en HOSPITALS_TILE_URL. El servidor HTTP
+de este módulo es para desarrollo local (navegador y dashboard en la misma
+máquina); el dashboard solo lo inicia si HOSPITALS_TILE_SERVER=1.
+
+Uso (desde code/streamlit/src):
+    python tiles.py build --zooms 5-10
+    python tiles.py serve --port 8765
+    HOSPITALS_TILE_URL=https://teselas.example.org/peru streamlit run streamlit_app.py
+    HOSPITALS_TILE_SERVER=1 streamlit run streamlit_app.py
+"""
+import argparse
+import functools
+import json
+import os
+import shutil
+import struct
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import shapely
+
+from instrumentation import instrumented, note
+from schema import get_schema
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SRC_DIR, "..", "data"))
+TILES_DIR = os.path.normpath(os.path.join(SRC_DIR, "..", "..", "..", "output", "tiles"))
+
+# Resolución de cada tesela (unidades por lado) y margen alrededor de ella
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+# Celda de generalización de puntos: a cada zoom se deja un punto por celda
+# de 16 unidades (~1 píxel en pantalla en una tesela de 256 px). En el zoom
+# máximo no se generaliza: el visor sobreamplía esas teselas y deben tener
+# todos los puntos (también los que comparten ubicación).
+POINT_GRID = 16
+
+DEFAULT_ZOOMS = range(5, 11)
+DEFAULT_PORT = 8765
+
+# Configuración del dashboard (variables de entorno)
+TILE_URL_ENV = "HOSPITALS_TILE_URL"        # URL pública de la carpeta de teselas
+TILE_SERVER_ENV = "HOSPITALS_TILE_SERVER"  # "1": servidor local dentro del dashboard
+TILE_HOST_ENV = "HOSPITALS_TILE_HOST"
+TILE_PORT_ENV = "HOSPITALS_TILE_PORT"
+
+MAX_LATITUDE = 85.0511287798
+
+# Comandos de geometría y tipos de geometría de MVT (especificación v2)
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+_POINT, _POLYGON = 1, 3
+
+# ---------------------------------------------------------------------------
+# Codificación protobuf (solo lo necesario para vector_tile.proto)
+# ---------------------------------------------------------------------------
+
+def _varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _key(out, field, wire_type):
+    _varint((field << 3) | wire_type, out)
+
+def _bytes_field(out, field, data):
+    _key(out, field, 2)
+    _varint(len(data), out)
+    out += data
+
+def _varint_field(out, field, value):
+    _key(out, field, 0)
+    _varint(value, out)
+
+def _packed_field(out, field, values):
+    buf = bytearray()
+    for v in values:
+        _varint(v, buf)
+    _bytes_field(out, field, buf)
+
+def _zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return (values << 1) ^ (values >> 63)
+
+def _command(command, count):
+    return (command & 0x7) | (count << 3)
+
+def _encode_value(value):
+    """Mensaje Value: texto, entero (sint64), real (double) o booleano."""
+    out = bytearray()
+    if isinstance(value, (bool, np.bool_)):
+        _varint_field(out, 7, int(value))
+    elif isinstance(value, (int, np.integer)):
+        _varint_field(out, 6, int(_zigzag([int(value)])[0]))
+    elif isinstance(value, (float, np.floating)):
+        _key(out, 3, 1)
+        out += struct.pack("<d", float(value))
+    else:
+        _bytes_field(out, 1, str(value).encode("utf-8"))
+    return bytes(out)
+
+def _point_commands(xy):
+    deltas = np.diff(np.vstack([[0, 0], xy]), axis=0)
+    return [_command(_MOVE_TO, len(xy))] + _zigzag(deltas).ravel().tolist()
+
+def _ring_commands(ring, cursor, exterior):
+    """Comandos de un anillo (sin el punto de cierre) a partir de la posición 'cursor'."""
+    # Orientación MVT (eje y hacia abajo): exterior con área positiva, huecos negativa
+    x, y = ring[:, 0], ring[:, 1]
+    area = np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+    if (area > 0) != exterior:
+        ring = ring[::-1]
+    deltas = np.diff(np.vstack([cursor, ring]), axis=0)
+    zz = _zigzag(deltas)
+    return ([_command(_MOVE_TO, 1)] + zz[0].tolist() + [_command(_LINE_TO, len(ring) - 1)]
+            + zz[1:].ravel().tolist() + [_command(_CLOSE_PATH, 1)]), ring[-1]
+
+def _clean_ring(coords):
+    """Coordenadas enteras del anillo sin puntos repetidos consecutivos ni el de cierre."""
+    ring = np.round(coords).astype(np.int64)
+    keep = np.ones(len(ring), dtype=bool)
+    keep[1:] = np.any(ring[1:] != ring[:-1], axis=1)
+    ring = ring[keep]
+    if len(ring) > 1 and (ring[0] == ring[-1]).all():
+        ring = ring[:-1]
+    return ring if len(ring) >= 3 else None
+
+def _polygon_commands(geom):
+    commands = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for polygon in shapely.get_parts(geom):
+        if shapely.get_type_id(polygon) != 3:
+            continue
+        exterior = _clean_ring(shapely.get_coordinates(shapely.get_exterior_ring(polygon)))
+        if exterior is None:
+            continue
+        cmds, cursor = _ring_commands(exterior, cursor, True)
+        commands += cmds
+        for i in range(shapely.get_num_interior_rings(polygon)):
+            hole = _clean_ring(shapely.get_coordinates(shapely.get_interior_ring(polygon, i)))
+            if hole is not None:
+                cmds, cursor = _ring_commands(hole, cursor, False)
+                commands += cmds
+    return commands
+
+def encode_layer(name, geoms, properties, ids, polygonal):
+    """
+    Mensaje Layer de MVT.
+
+    Args:
+        name: nombre de la capa
+        geoms: geometrías en coordenadas de la tesela (0..TILE_EXTENT)
+        properties: dict {columna: array de valores} alineado con 'geoms'
+        ids: identificador entero de cada elemento
+        polygonal: True para polígonos, False para puntos
+    """
+    keys, values = {}, {}
+    features = []
+    columns = list(properties)
+    for i, geom in enumerate(geoms):
+        if polygonal:
+            geometry = _polygon_commands(geom)
+        else:
+            geometry = _point_commands(np.round(shapely.get_coordinates(geom)).astype(np.int64))
+        if not geometry:
+            continue
+        tags = []
+        for col in columns:
+            value = properties[col][i]
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                continue
+            value = value.item() if isinstance(value, np.generic) else value
+            tags.append(keys.setdefault(col, len(keys)))
+            tags.append(values.setdefault((type(value).__name__, value), len(values)))
+        feature = bytearray()
+        _varint_field(feature, 1, int(ids[i]))
+        if tags:
+            _packed_field(feature, 2, tags)
+        _varint_field(feature, 3, _POLYGON if polygonal else _POINT)
+        _packed_field(feature, 4, geometry)
+        features.append(feature)
+
+    if not features:
+        return None
+    layer = bytearray()
+    _varint_field(layer, 15, 2)
+    _bytes_field(layer, 1, name.encode("utf-8"))
+    for feature in features:
+        _bytes_field(layer, 2, feature)
+    for key in keys:
+        _bytes_field(layer, 3, str(key).encode("utf-8"))
+    for _, value in values:
+        _bytes_field(layer, 4, _encode_value(value))
+    _varint_field(layer, 5, TILE_EXTENT)
+    return bytes(layer)
+
+def encode_tile(layers):
+    """Mensaje Tile a partir de capas ya codificadas."""
+    out = bytearray()
+    for layer in layers:
+        _bytes_field(out, 3, layer)
+    return bytes(out)
+
+# ---------------------------------------------------------------------------
+# Pirámide z/x/y
+# ---------------------------------------------------------------------------
+
+def _world_coords(zoom):
+    """Función lon/lat -> coordenadas Web Mercator en unidades de tesela al zoom dado."""
+    scale = (2 ** zoom) * TILE_EXTENT
+
+    def transform(coords):
+        lon = coords[:, 0]
+        lat = np.radians(np.clip(coords[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+        x = (lon + 180.0) / 360.0 * scale
+        y = (1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * scale
+        return np.column_stack([x, y])
+    return transform
+
+def _tile_pairs(bounds, zoom):
+    """Pares (elemento, tesela) según el rectángulo envolvente de cada elemento (con margen)."""
+    n_tiles = 2 ** zoom
+    lo = np.floor((bounds[:, :2] - TILE_BUFFER) / TILE_EXTENT).astype(np.int64).clip(0, n_tiles - 1)
+    hi = np.floor((bounds[:, 2:] + TILE_BUFFER) / TILE_EXTENT).astype(np.int64).clip(0, n_tiles - 1)
+    nx = hi[:, 0] - lo[:, 0] + 1
+    ny = hi[:, 1] - lo[:, 1] + 1
+    counts = nx * ny
+    rows = np.repeat(np.arange(len(bounds)), counts)
+    # Posición de cada par dentro del rango de su elemento
+    offset = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    tx = lo[rows, 0] + offset % nx[rows]
+    ty = lo[rows, 1] + offset // nx[rows]
+    return rows, tx, ty
+
+def _layer_frame(gdf, zoom):
+    """Capa en WGS84 y, para polígonos, con el nivel de simplificación del zoom."""
+    if gdf.crs is not None and gdf.crs != "EPSG:4326":
+        gdf = gdf.to_crs("EPSG:4326")
+    polygonal = bool(len(gdf)) and bool(np.isin(shapely.get_type_id(gdf.geometry.to_numpy()), [3, 6]).all())
+    if polygonal:
+        from lod import simplified
+        gdf = simplified(gdf, zoom=zoom)
+    return gdf, polygonal
+
+def _feature_ids(gdf):
+    if "UBIGEO_KEY" in gdf.columns:
+        return gdf["UBIGEO_KEY"].to_numpy().astype(np.int64).clip(0)
+    return np.arange(1, len(gdf) + 1, dtype=np.int64)
+
+def _layer_tiles(name, gdf, columns, zoom, thin=True):
+    """
+    Teselas de una capa a un zoom: dict {(x, y): Layer codificado}. Con
+    'thin' los puntos se generalizan a uno por celda de POINT_GRID.
+    """
+    gdf, polygonal = _layer_frame(gdf, zoom)
+    geoms = gdf.geometry.to_numpy()
+    valid = ~(shapely.is_missing(geoms) | shapely.is_empty(geoms))
+    world = shapely.transform(geoms[valid], _world_coords(zoom))
+    props = {col: gdf[col].to_numpy(dtype=object)[valid] for col in columns}
+    ids = _feature_ids(gdf)[valid]
+
+    rows, tx, ty = _tile_pairs(shapely.bounds(world), zoom)
+    order = np.lexsort((ty, tx))
+    rows, tx, ty = rows[order], tx[order], ty[order]
+    starts = np.flatnonzero(np.r_[True, (tx[1:] != tx[:-1]) | (ty[1:] != ty[:-1])])
+    ends = np.r_[starts[1:], len(rows)]
+
+    tiles = {}
+    for start, end in zip(starts, ends):
+        x, y = int(tx[start]), int(ty[start])
+        sel = rows[start:end]
+        x0, y0 = x * TILE_EXTENT, y * TILE_EXTENT
+        local = shapely.transform(world[sel], lambda c: c - (x0, y0))
+        if polygonal:
+            local = shapely.clip_by_rect(local, -TILE_BUFFER, -TILE_BUFFER,
+                                         TILE_EXTENT + TILE_BUFFER, TILE_EXTENT + TILE_BUFFER)
+            keep = ~shapely.is_empty(local)
+        else:
+            xy = shapely.get_coordinates(local)
+            inside = np.flatnonzero(((xy >= -TILE_BUFFER) & (xy <= TILE_EXTENT + TILE_BUFFER)).all(axis=1))
+            if thin:
+                # Un punto por celda de POINT_GRID unidades
+                cells = np.floor(xy[inside] / POINT_GRID).astype(np.int64)
+                _, first = np.unique(cells, axis=0, return_index=True)
+                inside = inside[first]
+            keep = np.zeros(len(xy), dtype=bool)
+            keep[inside] = True
+        if not keep.any():
+            continue
+        layer = encode_layer(name, local[keep], {c: v[sel][keep] for c, v in props.items()},
+                             ids[sel][keep], polygonal)
+        if layer is not None:
+            tiles[(x, y)] = layer
+    return tiles
+
+@instrumented("tiles.build", rows_out=lambda metadata: metadata["tiles"])
+def build_tiles(layers, output_dir=TILES_DIR, zooms=DEFAULT_ZOOMS):
+    """
+    Genera la pirámide de teselas vectoriales en 'output_dir/{z}/{x}/{y}.pbf'
+    (todas las capas en cada tesela) y un metadata.json.
+
+    La pirámide se escribe en una carpeta temporal que reemplaza a
+    'output_dir' al terminar: no quedan teselas de una generación anterior.
+    Si 'output_dir' ya existe, debe ser una pirámide (con metadata.json) o
+    estar vacía.
+
+    Args:
+        layers: dict {nombre de capa: (GeoDataFrame, columnas a incluir)}
+        output_dir: carpeta de salida
+        zooms: niveles de zoom a generar
+
+    Returns:
+        dict con la metadata escrita
+    """
+    zooms = list(zooms)
+    output_dir = os.path.abspath(output_dir)
+    if os.path.isdir(output_dir) and os.listdir(output_dir) and \
+            not os.path.exists(os.path.join(output_dir, "metadata.json")):
+        raise ValueError(f"{output_dir} no es una pirámide de teselas: no se reemplaza")
+    tmp_dir = f"{output_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    try:
+        metadata = _write_tiles(layers, tmp_dir, zooms)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    note("carpeta", output_dir)
+    return metadata
+
+def _write_tiles(layers, output_dir, zooms):
+    """Escribe las teselas y metadata.json en 'output_dir'."""
+    n_tiles = 0
+    for zoom in zooms:
+        per_tile = {}
+        for name, (gdf, columns) in layers.items():
+            for xy, layer in _layer_tiles(name, gdf, columns, zoom, thin=zoom < max(zooms)).items():
+                per_tile.setdefault(xy, []).append(layer)
+        for (x, y), encoded in per_tile.items():
+            path = os.path.join(output_dir, str(zoom), str(x), f"{y}.pbf")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(encode_tile(encoded))
+        n_tiles += len(per_tile)
+        note(f"zoom_{zoom}", len(per_tile))
+
+    bounds = np.array([gdf.to_crs("EPSG:4326").total_bounds if gdf.crs and gdf.crs != "EPSG:4326"
+                       else gdf.total_bounds for gdf, _ in layers.values()])
+    metadata = {
+        "minzoom": min(zooms),
+        "maxzoom": max(zooms),
+        "bounds": [float(bounds[:, 0].min()), float(bounds[:, 1].min()),
+                   float(bounds[:, 2].max()), float(bounds[:, 3].max())],
+        "layers": {name: list(columns) for name, (_, columns) in layers.items()},
+        "tiles": n_tiles,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    return metadata
+
+def default_layers(gdf_districts=None, gdf_hospitals=None, gdf_ccpp=None):
+    """Capas 'distritos', 'hospitales' y 'ccpp' con sus columnas de interés (según el esquema)."""
+    layers = {}
+    for name, gdf, wanted in (
+        ("distritos", gdf_districts, ("ubigeo", "departamento", "distrito")),
+        ("hospitales", gdf_hospitals, ("codigo", "nombre", "categoria", "departamento")),
+        ("ccpp", gdf_ccpp, ("centro_poblado", "departamento")),
+    ):
+        if gdf is None:
+            continue
+        schema = get_schema(gdf)
+        columns = [schema[c] for c in wanted if c in schema]
+        columns += [c for c in ("n_hospitales", "NumHosp", "CentroPoblado") if c in gdf.columns and c not in columns]
+        layers[name] = (gdf, columns)
+    return layers
+
+def load_metadata(output_dir=TILES_DIR):
+    """metadata.json de la pirámide (None si no se generó)."""
+    path = os.path.join(output_dir, "metadata.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+# ---------------------------------------------------------------------------
+# Servidor local
+# ---------------------------------------------------------------------------
+
+class _TileHandler(SimpleHTTPRequestHandler):
+    """Sirve la carpeta de teselas con CORS; una tesela inexistente es una tesela vacía."""
+
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, ".pbf": "application/x-protobuf"}
+
+    def end_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        super().end_headers()
+
+    def send_error(self, code, message=None, explain=None):
+        if code == 404 and self.path.split("?")[0].endswith(".pbf"):
+            self.send_response(204)
+            self.end_headers()
+            return
+        super().send_error(code, message, explain)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_tile_server(directory=TILES_DIR, host="127.0.0.1", port=DEFAULT_PORT):
+    """
+    Inicia el servidor de teselas en un hilo en segundo plano y lo retorna.
+    Si el puerto está ocupado se propaga el OSError.
+    """
+    handler = functools.partial(_TileHandler, directory=directory)
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    note("servidor_teselas", local_base_url(host, port))
+    return server
+
+def local_base_url(host="127.0.0.1", port=DEFAULT_PORT):
+    """URL base del servidor local de teselas."""
+    return f"http://{host}:{port}"
+
+def tile_url(base_url):
+    """Plantilla de URL de las teselas para Leaflet/Folium a partir de la URL base de la carpeta."""
+    return f"{base_url.rstrip('/')}/{{z}}/{{x}}/{{y}}.pbf"
+
+def tile_settings(environ=None):
+    """
+    Configuración de teselas del dashboard a partir de las variables de entorno.
+
+    Returns:
+        dict con public_url (URL base pública o None), local_server (iniciar
+        el servidor local), host y port
+    """
+    environ = os.environ if environ is None else environ
+    return {
+        "public_url": environ.get(TILE_URL_ENV) or None,
+        "local_server": environ.get(TILE_SERVER_ENV, "").strip().lower() in ("1", "true", "yes", "si", "sí"),
+        "host": environ.get(TILE_HOST_ENV, "127.0.0.1"),
+        "port": int(environ.get(TILE_PORT_ENV, DEFAULT_PORT)),
+    }
+
+def _parse_zooms(text):
+    if "-" in text:
+        lo, hi = text.split("-")
+        return range(int(lo), int(hi) + 1)
+    return [int(z) for z in text.split(",")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teselas vectoriales de distritos, hospitales y centros poblados.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="generar la pirámide de teselas")
+    build.add_argument("--ipress", default=os.path.join(DATA_DIR, "IPRESS.xlsx"))
+    build.add_argument("--districts", default=os.path.join(DATA_DIR, "v_distritos_2023.shp"))
+    build.add_argument("--ccpp", default=os.path.join(DATA_DIR, "CCPP_IGN100K.shp"))
+    build.add_argument("--output", default=TILES_DIR)
+    build.add_argument("--zooms", default=f"{DEFAULT_ZOOMS.start}-{DEFAULT_ZOOMS.stop - 1}", help="p. ej. 5-10 o 6,8,10")
+
+    serve = sub.add_parser("serve", help="servir las teselas por HTTP")
+    serve.add_argument("--directory", default=TILES_DIR)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        server = ThreadingHTTPServer((args.host, args.port), functools.partial(_TileHandler, directory=args.directory))
+        print(f"Sirviendo {args.directory} en {local_base_url(args.host, args.port)} (Ctrl+C para terminar)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    from estimation import (
+        load_and_filter_ipress, load_ccpp_shapefile, load_districts_shapefile,
+        merge_hospitals_with_districts,
+    )
+    gdf_hospitals = load_and_filter_ipress(args.ipress)
+    gdf_districts = merge_hospitals_with_districts(gdf_hospitals, load_districts_shapefile(args.districts))
+    gdf_ccpp = load_ccpp_shapefile(args.ccpp)
+    build_tiles(default_layers(gdf_districts, gdf_hospitals, gdf_ccpp), args.output, _parse_zooms(args.zooms))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from pyproj import CRS
+
+from cache import cache_key, cache_path, default_cache_dir, file_hash, prune_cache, write_cached_gdf
+from instrumentation import instrumented, note, warn
+from projection import get_transformer
+from schema import normalize_values, resolve_schema
+
+# Archivos que componen un shapefile: un cambio en cualquiera invalida el almacén
+SHAPEFILE_PARTS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+# Columnas auxiliares del almacén GeoParquet (no se devuelven al usuario)
+BBOX_COLUMNS = ("_xmin", "_ymin", "_xmax", "_ymax")
+DEPT_KEY = "_dept"
+
+# Filas por row group: con el almacén ordenado por departamento, las
+# estadísticas de cada row group permiten saltar los demás departamentos
+STORE_ROW_GROUP = 4_096
+
+_SQL_OPS = {"==": "=", "=": "=", "!=": "<>", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+def _source_hash(filepath):
+    base = os.path.splitext(filepath)[0]
+    parts = [base + ext for ext in SHAPEFILE_PARTS if os.path.exists(base + ext)]
+    return [file_hash(p) for p in (parts or [filepath])]
+
+def _sql_literal(value):
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+def _to_sql(where):
+    """Filtros [(columna, op, valor)] -> cláusula WHERE de OGR."""
+    clauses = []
+    for col, op, value in where:
+        if op in ("in", "not in"):
+            values = ", ".join(_sql_literal(v) for v in value)
+            clauses.append(f'"{col}" {op.upper()} ({values})')
+        else:
+            clauses.append(f'"{col}" {_SQL_OPS[op]} {_sql_literal(value)}')
+    return " AND ".join(clauses) or None
+
+def _native_bbox(bbox, native_crs, bbox_crs):
+    """Rectángulo (minx, miny, maxx, maxy) en el CRS nativo de la capa."""
+    if bbox is None or native_crs is None or CRS.from_user_input(bbox_crs) == CRS.from_user_input(native_crs):
+        return bbox
+    return get_transformer(bbox_crs, native_crs).transform_bounds(*bbox)
+
+def _department_column(field_names):
+    return resolve_schema(pd.DataFrame(columns=list(field_names))).get("departamento")
+
+def _department_key(department):
+    return normalize_values(pd.Series([department]))[0]
+
+def _build_store(filepath, path):
+    """Convierte la capa completa (CRS nativo) al almacén GeoParquet."""
+    import pyogrio
+
+    gdf = pyogrio.read_dataframe(filepath, use_arrow=True)
+    gdf.index = pd.Index(np.arange(len(gdf)))
+    bounds = shapely.bounds(gdf.geometry.to_numpy())
+    for j, col in enumerate(BBOX_COLUMNS):
+        gdf[col] = bounds[:, j]
+
+    col_dept = _department_column(gdf.columns)
+    if col_dept is not None:
+        gdf[DEPT_KEY] = normalize_values(gdf[col_dept])
+        gdf = gdf.sort_values(DEPT_KEY, kind="stable")
+
+    write_cached_gdf(gdf, path, row_group_size=STORE_ROW_GROUP)
+    note("almacen_creado", path)
+
+def _read_store(path, columns, bbox, where, department):
+    import pyarrow.parquet as pq
+
+    names = pq.ParquetFile(path).schema_arrow.names
+    filters = list(where or [])
+    if department is not None:
+        if DEPT_KEY not in names:
+            warn("La capa no tiene columna de departamento: no se filtra")
+        else:
+            filters.append((DEPT_KEY, "==", _department_key(department)))
+    if bbox is not None:
+        minx, miny, maxx, maxy = bbox
+        filters += [("_xmax", ">=", minx), ("_xmin", "<=", maxx),
+                    ("_ymax", ">=", miny), ("_ymin", "<=", maxy)]
+
+    hidden = set(BBOX_COLUMNS) | {DEPT_KEY}
+    if columns is None:
+        columns = [c for c in names if c not in hidden and not c.startswith("__index_level_")]
+    else:
+        columns = list(columns) + ["geometry"]
+    gdf = gpd.read_parquet(path, columns=columns, filters=filters or None)
+    return gdf.sort_index()
+
+def _read_ogr(filepath, columns, bbox, where, department):
+    import pyogrio
+
+    sql = _to_sql(where or [])
+    if department is None:
+        gdf = pyogrio.read_dataframe(filepath, columns=columns, bbox=bbox, where=sql,
+                                     use_arrow=True, fid_as_index=True)
+    else:
+        fields = pyogrio.read_info(filepath)["fields"]
+        col_dept = _department_column(fields)
+        if col_dept is None:
+            warn("La capa no tiene columna de departamento: no se filtra")
+            return _read_ogr(filepath, columns, bbox, where, None)
+        # Primera pasada solo con la columna de departamento; luego se leen
+        # únicamente las geometrías de ese departamento (por FID)
+        attrs = pyogrio.read_dataframe(filepath, columns=[col_dept], where=sql,
+                                       read_geometry=False, fid_as_index=True)
+        fids = attrs.index[normalize_values(attrs[col_dept]) == _department_key(department)]
+        gdf = pyogrio.read_dataframe(filepath, columns=columns, fids=np.asarray(fids),
+                                     use_arrow=True, fid_as_index=True)
+        if bbox is not None and len(gdf):
+            gdf = gdf.cx[bbox[0]:bbox[2], bbox[1]:bbox[3]]
+    gdf.index = pd.Index(np.asarray(gdf.index))
+    return gdf
+
+@instrumented("vector.read")
+def read_vector(filepath, columns=None, bbox=None, where=None, department=None,
+                crs="EPSG:4326", bbox_crs="EPSG:4326", use_cache=True, cache_dir=None):
+    """
+    Lee una capa vectorial (shapefile) leyendo solo lo necesario.
+
+    La primera lectura convierte la capa completa, en su CRS nativo, a un
+    almacén GeoParquet (geometrías WKB + columnas de bbox, ordenado por
+    departamento) en '.cache/' junto al archivo. Las lecturas siguientes
+    proyectan columnas y filtran filas dentro de pyarrow, sin pasar por OGR.
+    Con use_cache=False se lee directamente con pyogrio (Arrow).
+
+    Args:
+        filepath: ruta del shapefile
+        columns: atributos a leer (None = todos); la geometría siempre se lee
+        bbox: (minx, miny, maxx, maxy) en 'bbox_crs'; se conservan las
+            geometrías cuyo rectángulo envolvente lo intersecta
+        where: filtros de atributos [(columna, op, valor)] con op en
+            ==, !=, <, <=, >, >=, in, not in
+        department: nombre de departamento (sin importar tildes ni mayúsculas)
+        crs: CRS de salida; None conserva el CRS nativo de la capa
+        bbox_crs: CRS en que está expresado 'bbox'
+        use_cache: usar el almacén GeoParquet
+        cache_dir: carpeta del almacén (por defecto '.cache/' junto al archivo)
+
+    Returns:
+        GeoDataFrame indexado por el número de fila original de la capa
+    """
+    import pyogrio
+
+    native_crs = pyogrio.read_info(filepath)["crs"]
+    bbox = _native_bbox(bbox, native_crs, bbox_crs)
+
+    if use_cache:
+        cache_dir = cache_dir or default_cache_dir(filepath)
+        prefix = "vector-" + os.path.splitext(os.path.basename(filepath))[0]
+        path = cache_path(cache_dir, prefix, cache_key(_source_hash(filepath), {"store": STORE_ROW_GROUP}))
+        if not os.path.exists(path):
+            _build_store(filepath, path)
+            prune_cache(cache_dir, prefix, keep=path)
+    if use_cache and os.path.exists(path):
+        gdf = _read_store(path, columns, bbox, where, department)
+    else:
+        gdf = _read_ogr(filepath, columns, bbox, where, department)
+
+    if gdf.crs is None and native_crs is not None:
+        gdf = gdf.set_crs(native_crs)
+    if crs is not None and gdf.crs is not None and gdf.crs != crs:
+        gdf = gdf.to_crs(crs)
+    return gdf
@@ -0,0 +1,15 @@
+"""
+Configuración de pytest: los módulos del dashboard son planos en src/ y se
+importan por nombre, como en streamlit_app.py.
+
+Uso (desde la raíz del repositorio):
+    python -m pytest -q code/streamlit/tests
+"""
+import os
+import sys
+
+SRC_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+os.environ.setdefault("MPLBACKEND", "Agg")
@@ -0,0 +1,62 @@
+"""
+Exportación del atlas: partición por departamento contra el filtrado por
+texto de create_department_static_map, manifest con una imagen por mapa y
+reutilización de las imágenes cuando los datos no cambian.
+"""
+import os
+
+import numpy as np
+
+import atlas
+from benchmark import synthetic_districts, synthetic_ipress
+from estimation import load_and_filter_ipress, merge_hospitals_with_districts
+
+def _layers(tmp_path, n=400, seed=5):
+    rng = np.random.default_rng(seed)
+    districts = synthetic_districts(shape=(8, 6))
+    path = tmp_path / "IPRESS.parquet"
+    synthetic_ipress(districts, n, rng).to_parquet(path, index=False)
+    hospitals = load_and_filter_ipress(str(path), use_cache=False)
+    return hospitals, merge_hospitals_with_districts(hospitals, districts)
+
+def test_partition_matches_text_filter(tmp_path):
+    hospitals, merged = _layers(tmp_path)
+    partition = atlas.department_partition(hospitals, merged)
+    assert len(partition) == merged["DEPARTAMEN"].nunique()
+    for name, hosp_rows, dist_rows in partition.values():
+        expected_hosp = np.flatnonzero(hospitals["Departamento"].astype(str).str.upper() == name.upper())
+        expected_dist = np.flatnonzero(merged["DEPARTAMEN"].astype(str).str.upper() == name.upper())
+        np.testing.assert_array_equal(np.sort(hosp_rows), expected_hosp)
+        np.testing.assert_array_equal(np.sort(dist_rows), expected_dist)
+
+def test_export_writes_manifest_and_reuses_images(tmp_path, monkeypatch):
+    hospitals, merged = _layers(tmp_path)
+    output = tmp_path / "atlas"
+    manifest = atlas.export_atlas(hospitals, merged, str(output), max_workers=1)
+
+    departments = merged["DEPARTAMEN"].nunique()
+    assert len(manifest["maps"]) == len(atlas.NATIONAL_MAPS) + departments
+    assert atlas.load_manifest(str(output)) == manifest
+    for entry in manifest["maps"].values():
+        assert (output / entry["file"]).stat().st_size > 0
+        if entry["tipo"] == "departamento":
+            assert entry["n_distritos"] == (merged["DEPARTAMEN"] == entry["departamento"]).sum()
+    assert not [f for f in os.listdir(output) if f.endswith(".tmp")]
+
+    key = atlas.atlas_key(hospitals, merged)
+    image = atlas.atlas_image("nacional_hospitales", key, str(output))
+    assert image == str(output / "nacional_hospitales.png")
+    assert atlas.atlas_image("nacional_hospitales", "otra-clave", str(output)) is None
+
+    # Mismos datos: no se vuelve a renderizar; con force=True se rehace todo
+    rendered = []
+    original = atlas._render_job
+    monkeypatch.setattr(atlas, "_render_job", lambda job: rendered.append(job) or original(job))
+    atlas.export_atlas(hospitals, merged, str(output), max_workers=1)
+    assert rendered == []
+    os.remove(output / "nacional_top10.png")
+    atlas.export_atlas(hospitals, merged, str(output), max_workers=1)
+    assert [os.path.basename(job[3]) for job in rendered] == ["nacional_top10.png"]
+    rendered.clear()
+    atlas.export_atlas(hospitals, merged, str(output), max_workers=1, force=True)
+    assert len(rendered) == len(manifest["maps"])
@@ -0,0 +1,43 @@
+"""
+Comparación de reportes de benchmark: solo cuentan como regresión los
+aumentos que superan el umbral y el ruido mínimo de cada métrica.
+"""
+import json
+
+import pytest
+
+import benchmark
+
+def _report(*rows):
+    return {"results": [dict(size=size, stage=stage, seconds=seconds, peak_mb=peak_mb)
+                        for size, stage, seconds, peak_mb in rows]}
+
+def test_compare_results_known_answers():
+    baseline = _report((1_000, "merge", 1.0, 100.0), (1_000, "proximity", 0.01, 10.0),
+                       (10_000, "merge", 2.0, 200.0), (10_000, "plots", 0.0, 0.0))
+    current = _report(
+        (1_000, "merge", 1.3, 110.0),        # +30 % en tiempo; memoria dentro del umbral
+        (1_000, "proximity", 0.04, 20.0),    # x4 pero bajo el ruido mínimo de ambas métricas
+        (10_000, "merge", 2.0, 300.0),       # +50 % de memoria
+        (10_000, "plots", 5.0, 50.0),        # sin línea base útil (0): se ignora
+        (50_000, "merge", 9.0, 900.0),       # tamaño nuevo: sin comparación
+    )
+    regressions = benchmark.compare_results(current, baseline)
+    found = {(r["size"], r["stage"], r["metric"]): r["ratio"] for r in regressions}
+    assert found.keys() == {(1_000, "merge", "seconds"), (10_000, "merge", "peak_mb")}
+    assert found[(1_000, "merge", "seconds")] == pytest.approx(1.3)
+    assert found[(10_000, "merge", "peak_mb")] == pytest.approx(1.5)
+
+    # Umbral más alto: el +30 % deja de ser regresión
+    assert [r["metric"] for r in benchmark.compare_results(current, baseline, threshold=1.4)] == ["peak_mb"]
+    # Mejoras o empates nunca son regresiones
+    assert benchmark.compare_results(baseline, current) == []
+    assert benchmark.compare_results(baseline, baseline) == []
+
+def test_latest_results_skips_excluded(tmp_path):
+    for stamp in ("20260101-000000", "20260102-000000"):
+        (tmp_path / f"bench-{stamp}.json").write_text(json.dumps(_report()))
+    newest = str(tmp_path / "bench-20260102-000000.json")
+    assert benchmark.latest_results(str(tmp_path)) == newest
+    assert benchmark.latest_results(str(tmp_path), exclude=newest).endswith("bench-20260101-000000.json")
+    assert benchmark.latest_results(str(tmp_path / "vacío")) is None
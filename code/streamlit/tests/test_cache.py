@@ -0,0 +1,27 @@
+"""
+Hash de archivos fuente recordado por (ruta, tamaño, mtime).
+"""
+import hashlib
+import os
+
+import cache
+
+def test_file_hash_rereads_only_when_stat_changes(tmp_path):
+    path = tmp_path / "capa.dbf"
+    path.write_bytes(b"a" * 1000)
+    first = cache.file_hash(str(path))
+    assert first == hashlib.sha256(b"a" * 1000).hexdigest()
+    stat = os.stat(path)
+
+    # Mismo tamaño y mtime: no se vuelve a leer el archivo
+    path.write_bytes(b"b" * 1000)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.file_hash(str(path)) == first
+
+    # Cambia la fecha de modificación: se recalcula
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.file_hash(str(path)) == hashlib.sha256(b"b" * 1000).hexdigest()
+    # Cambia el tamaño: se recalcula
+    path.write_bytes(b"b" * 10)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.file_hash(str(path)) == hashlib.sha256(b"b" * 10).hexdigest()
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from context import DataContext, ProductError
+
+def _context(builders):
+    products = {name: (deps, builder) for name, (deps, builder) in builders.items()}
+    return DataContext(data_dirs=(), products=products, artifacts_dir="/nonexistent")
+
+def test_failed_product_is_not_cached():
+    attempts = []
+
+    def load(context):
+        attempts.append(1)
+        return None if len(attempts) == 1 else [1, 2, 3]
+
+    data = _context({"rows": ((), load), "total": (("rows",), lambda context, rows: sum(rows))})
+    with pytest.raises(ProductError):
+        data.get("total")
+    assert not data.is_loaded("rows")
+    # El segundo intento vuelve a llamar al cargador
+    assert data.get("total") == 6
+    assert len(attempts) == 2
+
+def test_concurrent_get_builds_once_and_invalidate_cascades():
+    calls = []
+    barrier = threading.Barrier(4)
+
+    def load(context):
+        calls.append(1)
+        return 10
+
+    data = _context({"base": ((), load), "double": (("base",), lambda context, base: 2 * base)})
+
+    def worker():
+        barrier.wait()
+        assert data.get("double") == 20
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+
+    data.invalidate("base")
+    assert not data.is_loaded("double")
+    assert data.get("double") == 20
+    assert len(calls) == 2
+
+def test_missing_artifact_is_reported_or_required():
+    def load(context):
+        value = context.artifact("rows")
+        return [1, 2] if value is None else value
+
+    data = _context({"rows": ((), load)})
+    assert data.get("rows") == [1, 2]
+    assert data.fallbacks == {"rows"}
+
+    strict = DataContext(data_dirs=(), products={"rows": ((), load)}, artifacts_dir="/nonexistent",
+                         require_artifacts=True)
+    with pytest.raises(ProductError, match="pipeline.py"):
+        strict.get("rows")
+    assert not strict.is_loaded("rows")
+
+def test_dashboard_proximity_runs_without_process_pool(monkeypatch):
+    import context
+    import proximity
+
+    calls = []
+    monkeypatch.setattr(proximity, "analyze_proximity_all_departments",
+                        lambda ccpp, hospitals, **kwargs: calls.append(kwargs) or "resultado")
+    products = {"ccpp": ((), lambda c: "ccpp"), "hospitals": ((), lambda c: "hospitals"),
+                "proximity": context.PRODUCTS["proximity"]}
+    data = DataContext(data_dirs=(), products=products, artifacts_dir="/nonexistent")
+    assert data.get("proximity", buffer_distance=5_000) == "resultado"
+    assert calls == [{"buffer_distance": 5_000, "max_workers": 1}]
@@ -0,0 +1,98 @@
+"""
+Claves enteras de UBIGEO, conteo de hospitales por distrito (np.bincount)
+contra el merge por texto del notebook original, caché GeoParquet de IPRESS
+y tabla compacta de hospitales.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_districts, synthetic_ipress
+from estimation import load_and_filter_ipress, merge_hospitals_with_districts, ubigeo_key
+
+def test_ubigeo_key_known_answers():
+    values = ["150101", " 150101 ", "150101.0", "10101", "010101", "", "  ", "abc", None, "0", "-5", "1000000"]
+    expected = [150101, 150101, 150101, 10101, 10101, -1, -1, -1, -1, -1, -1, -1]
+    np.testing.assert_array_equal(ubigeo_key(values), expected)
+    np.testing.assert_array_equal(ubigeo_key([150101.0, 10101, np.nan, 0, 999_999, 1_000_000]),
+                                  [150101, 10101, -1, -1, 999_999, -1])
+    assert ubigeo_key(pd.Series(["150101"], dtype="string")).dtype == np.int32
+
+def test_merge_counts_match_text_groupby(tmp_path):
+    rng = np.random.default_rng(3)
+    districts = synthetic_districts(shape=(12, 10))
+    districts["UBIGEO_KEY"] = ubigeo_key(districts["UBIGEO"])
+    path = tmp_path / "IPRESS.parquet"
+    synthetic_ipress(districts, 800, rng).to_parquet(path, index=False)
+    hospitals = load_and_filter_ipress(str(path), use_cache=False)
+
+    merged = merge_hospitals_with_districts(hospitals, districts)
+
+    # Versión del notebook: UBIGEO como texto con zfill(6), groupby y merge
+    text = hospitals["UBIGEO"].astype(str).str.zfill(6)
+    counts = text.groupby(text).size()
+    expected = districts["UBIGEO"].astype(str).str.zfill(6).map(counts).fillna(0).astype(int)
+    assert merged["n_hospitales"].sum() == len(hospitals)
+    np.testing.assert_array_equal(merged["n_hospitales"].to_numpy(), expected.to_numpy())
+
+def test_ipress_cache_hit_and_invalidation(tmp_path, monkeypatch):
+    import os
+
+    import estimation
+
+    rng = np.random.default_rng(4)
+    districts = synthetic_districts(shape=(12, 10))
+    df = synthetic_ipress(districts, 200, rng)
+    path, cache_dir = tmp_path / "IPRESS.parquet", tmp_path / "cache"
+    df.to_parquet(path, index=False)
+
+    first = load_and_filter_ipress(str(path), cache_dir=str(cache_dir))
+    cached = sorted(os.listdir(cache_dir))
+    assert len(cached) == 1 and cached[0].startswith("ipress-")
+
+    # Acierto: no se vuelve a leer ni a reproyectar el archivo
+    original = estimation._load_and_filter_ipress
+    monkeypatch.setattr(estimation, "_load_and_filter_ipress",
+                        lambda *args, **kwargs: pytest.fail("se volvió a procesar IPRESS"))
+    hit = load_and_filter_ipress(str(path), cache_dir=str(cache_dir))
+    assert hit.geometry.geom_equals(first.geometry).all()
+    assert list(hit["Código Único"]) == list(first["Código Único"])
+
+    # Otros parámetros: otra clave (solo se conserva la última)
+    monkeypatch.setattr(estimation, "_load_and_filter_ipress", original)
+    load_and_filter_ipress(str(path), cache_dir=str(cache_dir), utm_zone=18)
+    assert os.listdir(cache_dir) != cached and len(os.listdir(cache_dir)) == 1
+    cached = os.listdir(cache_dir)
+
+    # El archivo cambia: se recalcula y la caché anterior se elimina
+    df.iloc[:50].to_parquet(path, index=False)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    changed = load_and_filter_ipress(str(path), cache_dir=str(cache_dir))
+    assert len(changed) < len(first)
+    assert os.listdir(cache_dir) != cached and len(os.listdir(cache_dir)) == 1
+
+def test_compact_table_keeps_values_with_smaller_types(tmp_path):
+    import geopandas as gpd
+
+    from estimation import compact_hospitals, memory_footprint
+    from schema import get_schema
+
+    rng = np.random.default_rng(5)
+    df = synthetic_ipress(synthetic_districts(shape=(12, 10)), 2_000, rng).dropna(subset=["NORTE"])
+    df = df[df["NORTE"] != 0]
+    df["Teléfono"] = "01-555"
+    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["ESTE"], df["NORTE"]), crs="EPSG:32718")
+
+    compact = compact_hospitals(gdf)
+    assert "Teléfono" not in compact.columns
+    for col in ("Departamento", "Provincia", "Distrito", "Categoria", "Institución"):
+        assert compact[col].dtype == "category"
+        assert (compact[col].astype(object) == gdf[col]).all()
+    assert compact["NORTE"].dtype == np.float32
+    np.testing.assert_allclose(compact["NORTE"], gdf["NORTE"], atol=1.0)
+    assert compact["UBIGEO"].dtype == "Int32"
+    np.testing.assert_array_equal(compact["UBIGEO"].to_numpy(dtype=np.int64), ubigeo_key(gdf["UBIGEO"]))
+    assert compact.geometry.geom_equals(gdf.geometry).all()
+    assert get_schema(compact)["ubigeo"] == "UBIGEO"
+    assert memory_footprint(compact)["total_mb"] < memory_footprint(gdf)["total_mb"] / 2
@@ -0,0 +1,75 @@
+"""
+Consistencia de la grilla hexagonal jerárquica: cada punto cae en el
+hexágono cuyo centro es el más cercano, cada celda tiene un único padre que
+la lista entre sus hijos, y los conteos suman lo mismo en toda resolución.
+"""
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+import hexgrid
+
+def _xy(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # Rectángulo métrico en UTM 18S que cubre gran parte del Perú
+    return rng.uniform(200_000, 1_200_000, n), rng.uniform(8_000_000, 9_900_000, n)
+
+def _points(n, seed=0):
+    x, y = _xy(n, seed)
+    return gpd.GeoDataFrame(geometry=gpd.points_from_xy(x, y), crs=hexgrid.METRIC_CRS)
+
+def test_points_fall_in_nearest_hexagon():
+    x, y = _xy(5_000)
+    for res in (2, 5, 8):
+        ids = hexgrid.xy_to_cells(x, y, res)
+        assert (hexgrid.cell_resolution(ids) == res).all()
+        cx, cy = hexgrid.cell_centers(ids)
+        dist = np.hypot(x - cx, y - cy)
+        # Dentro del círculo circunscrito del hexágono (radio = lado)
+        assert (dist <= hexgrid.cell_size(res) * (1 + 1e-9)).all()
+        # Ningún centro vecino está más cerca
+        q = (ids >> hexgrid._COORD_BITS) & hexgrid._COORD_MASK
+        r = ids & hexgrid._COORD_MASK
+        for dq, dr in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, -1), (-1, 1)):
+            neighbor = hexgrid._pack(q - hexgrid._COORD_OFFSET + dq, r - hexgrid._COORD_OFFSET + dr, res)
+            nx, ny = hexgrid.cell_centers(neighbor)
+            assert (dist <= np.hypot(x - nx, y - ny) + 1e-6).all()
+        # El centro de una celda cae en la misma celda
+        np.testing.assert_array_equal(hexgrid.xy_to_cells(cx, cy, res), ids)
+
+def test_parent_and_children_are_consistent():
+    x, y = _xy(2_000, seed=1)
+    fine = np.unique(hexgrid.xy_to_cells(x, y, 6))
+    parents = hexgrid.cell_parent(fine)
+    assert (hexgrid.cell_resolution(parents) == 5).all()
+    for cell, parent in zip(fine[:300], parents[:300]):
+        children = hexgrid.cell_children(parent)
+        assert cell in children
+        assert (hexgrid.cell_parent(children) == parent).all()
+    # Los hijos de padres distintos no se repiten (cada celda tiene un solo padre)
+    all_children = np.concatenate([hexgrid.cell_children(p) for p in np.unique(parents)])
+    assert len(np.unique(all_children)) == len(all_children)
+    assert np.isin(fine, all_children).all()
+    # Subir varios niveles de una vez equivale a subir de a uno
+    two_up = hexgrid.cell_parent(fine, 4)
+    np.testing.assert_array_equal(two_up, hexgrid.cell_parent(parents))
+
+def test_hex_index_and_density_sum_across_resolutions():
+    hospitals = _points(3_000, seed=2)
+    ccpp = _points(8_000, seed=3)
+    index = hexgrid.hex_index(hospitals, resolutions=(2, 4, 6))
+    np.testing.assert_array_equal(index[2], hexgrid.cell_parent(index[6], 2))
+    np.testing.assert_array_equal(index[4], hexgrid.cell_parent(index[6], 4))
+
+    tables = {res: hexgrid.density_table(hospitals, ccpp, res) for res in (2, 3, 5)}
+    for table in tables.values():
+        assert table["n_hospitales"].sum() == len(hospitals)
+        assert table["n_ccpp"].sum() == len(ccpp)
+    # Agregar la tabla fina a la resolución gruesa da la tabla gruesa
+    coarse = hexgrid.rollup(tables[5]["n_hospitales"], 2)
+    pd.testing.assert_series_equal(coarse.sort_index(), tables[2]["n_hospitales"].sort_index(),
+                                   check_names=False, check_index_type=False)
+
+    counts = (hexgrid.cell_counts(hexgrid.points_to_cells(hospitals, hexgrid.MAX_RESOLUTION)),
+              hexgrid.cell_counts(hexgrid.points_to_cells(ccpp, hexgrid.MAX_RESOLUTION)))
+    pd.testing.assert_frame_equal(hexgrid.density_from_counts(*counts, 3), tables[3])
@@ -0,0 +1,103 @@
+"""
+Actualización incremental con un nuevo snapshot de IPRESS: el resultado de
+aplicar el diff debe ser igual al de recalcular todo con el snapshot nuevo.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+from benchmark import synthetic_ccpp, synthetic_districts, synthetic_ipress
+from estimation import load_and_filter_ipress, merge_hospitals_with_districts
+from incremental import diff_snapshots, update_district_counts, update_proximity_counts
+from proximity import analyze_proximity_all_departments, build_point_index
+
+RADIUS = 20_000
+
+def _new_snapshot(df, rng):
+    """Elimina, mueve, cambia de UBIGEO y agrega establecimientos."""
+    df = df.copy()
+    rows = rng.permutation(len(df))
+    removed, moved, reassigned = rows[:30], rows[30:60], rows[60:70]
+    df.loc[df.index[moved], "NORTE"] += rng.uniform(-15_000, 15_000, len(moved))
+    df.loc[df.index[reassigned], "UBIGEO"] = df["UBIGEO"].to_numpy()[rows[70:80]]
+    added = df.iloc[rows[80:105]].copy()
+    added["Código Único"] = np.arange(len(df) + 1, len(df) + 1 + len(added))
+    return pd.concat([df.drop(df.index[removed]), added], ignore_index=True)
+
+@pytest.fixture(scope="module")
+def snapshots(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("snapshots")
+    rng = np.random.default_rng(7)
+    districts = synthetic_districts(shape=(12, 10))
+    districts["UBIGEO_KEY"] = districts["UBIGEO"].astype(int)
+    old_df = synthetic_ipress(districts, 600, rng)
+    new_df = _new_snapshot(old_df, rng)
+    paths = {"old": str(workdir / "IPRESS-old.parquet"), "new": str(workdir / "IPRESS-new.parquet"),
+             "districts": str(workdir / "distritos.shp"), "ccpp": str(workdir / "CCPP.shp")}
+    old_df.to_parquet(paths["old"], index=False)
+    new_df.to_parquet(paths["new"], index=False)
+    districts.drop(columns="UBIGEO_KEY").to_file(paths["districts"], engine="pyogrio")
+    ccpp = synthetic_ccpp(districts, 2_000, rng)
+    ccpp.to_file(paths["ccpp"], engine="pyogrio")
+    old = load_and_filter_ipress(paths["old"], use_cache=False)
+    new = load_and_filter_ipress(paths["new"], use_cache=False)
+    return dict(paths=paths, districts=districts, ccpp=ccpp, old=old, new=new)
+
+def _codes(gdf):
+    return set(gdf["Código Único"].astype(str))
+
+def test_diff_finds_added_removed_and_moved(snapshots):
+    old, new = snapshots["old"], snapshots["new"]
+    diff = diff_snapshots(old, new)
+    assert _codes(diff.added) == _codes(new) - _codes(old)
+    assert _codes(diff.removed) == _codes(old) - _codes(new)
+    assert len(diff.moved_new) > 0
+    assert list(diff.moved_old["Código Único"]) == list(diff.moved_new["Código Único"])
+    # Los que no cambiaron no aparecen
+    assert len(diff_snapshots(new, new)) == 0
+
+def test_update_matches_full_recompute(snapshots):
+    old, new, districts, ccpp = (snapshots[k] for k in ("old", "new", "districts", "ccpp"))
+    diff = diff_snapshots(old, new)
+
+    merged = update_district_counts(merge_hospitals_with_districts(old, districts), diff, districts)
+    expected = merge_hospitals_with_districts(new, districts)
+    np.testing.assert_array_equal(merged["n_hospitales"].to_numpy(), expected["n_hospitales"].to_numpy())
+
+    before = analyze_proximity_all_departments(ccpp, old, buffer_distance=RADIUS, max_workers=1, use_cache=False)
+    updated = update_proximity_counts(before, ccpp, diff, buffer_distance=RADIUS)
+    expected = analyze_proximity_all_departments(ccpp, new, buffer_distance=RADIUS, max_workers=1,
+                                                 use_cache=False)
+    # Mismo orden de filas (conteo descendente y nombre) sin reordenar la tabla
+    for col in ("NumHosp", "CentroPoblado"):
+        np.testing.assert_array_equal(updated[col].to_numpy(), expected[col].to_numpy())
+    updated, expected = updated.sort_index(), expected.sort_index()
+    assert (updated["NumHosp"] != before.sort_index()["NumHosp"]).any()
+    for col in ("NumHosp", "RankAislado", "RankConcentrado"):
+        np.testing.assert_array_equal(updated[col].to_numpy(), expected[col].to_numpy())
+
+    # El índice de centros poblados se construye una vez por capa
+    assert build_point_index(ccpp) is build_point_index(ccpp)
+    # Sin cambios no se toca la tabla
+    pd.testing.assert_frame_equal(update_proximity_counts(before, ccpp, diff_snapshots(new, new)), before)
+
+def test_update_pipeline_matches_full_run(snapshots, tmp_path):
+    paths = snapshots["paths"]
+    only = ["merged", pipeline.proximity_stage(RADIUS)]
+    sources = {"hospitals": paths["old"], "districts": paths["districts"], "ccpp": paths["ccpp"]}
+    incremental_dir, full_dir = str(tmp_path / "incremental"), str(tmp_path / "full")
+
+    pipeline.run_pipeline(sources, incremental_dir, radii=(RADIUS,), only=only, max_workers=1)
+    sources["hospitals"] = paths["new"]
+    pipeline.update_pipeline(sources, incremental_dir, radii=(RADIUS,), only=only, max_workers=1)
+    pipeline.run_pipeline(sources, full_dir, radii=(RADIUS,), only=only, max_workers=1)
+
+    for name in only:
+        updated = pipeline.load_artifact(name, incremental_dir).sort_index()
+        expected = pipeline.load_artifact(name, full_dir).sort_index()
+        column = "n_hospitales" if name == "merged" else "NumHosp"
+        np.testing.assert_array_equal(updated[column].to_numpy(), expected[column].to_numpy())
+    # Las claves del manifest son las del snapshot nuevo
+    manifest = pipeline.load_manifest(incremental_dir)
+    assert manifest["stages"]["merged"]["key"] == pipeline.load_manifest(full_dir)["stages"]["merged"]["key"]
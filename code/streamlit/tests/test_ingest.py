@@ -0,0 +1,47 @@
+"""
+Lectura por bloques de IPRESS: el resultado concatenado es igual a leer el
+archivo completo con pandas, solo con las columnas pedidas.
+"""
+import numpy as np
+import pandas as pd
+
+from benchmark import synthetic_districts, synthetic_ipress
+from ingest import IPRESS_COLUMNS, iter_ipress_chunks
+
+def _registry(n=230, seed=0):
+    df = synthetic_ipress(synthetic_districts(shape=(6, 5)), n, np.random.default_rng(seed))
+    # Columna que no se usa y no debe leerse
+    df["Teléfono"] = "01-555"
+    return df
+
+def _expected(full):
+    """Lectura completa normalizada como en ingest: coordenadas numéricas y el resto texto."""
+    full = full[[c for c in full.columns if c in IPRESS_COLUMNS]].copy()
+    for c in full.columns:
+        if c in ("NORTE", "ESTE"):
+            full[c] = pd.to_numeric(full[c], errors="coerce")
+        else:
+            full[c] = full[c].astype(str).where(full[c].notna(), None)
+    return full.reset_index(drop=True)
+
+def _chunks(path, chunksize):
+    chunks = list(iter_ipress_chunks(str(path), chunksize=chunksize))
+    assert all(len(c) <= chunksize for c in chunks)
+    return pd.concat(chunks, ignore_index=True)
+
+def test_xlsx_chunks_match_read_excel(tmp_path):
+    path = tmp_path / "IPRESS.xlsx"
+    _registry().to_excel(path, index=False)
+    result = _chunks(path, chunksize=50)
+    assert "Teléfono" not in result.columns
+    # UBIGEO es texto en la hoja: se conservan los ceros a la izquierda
+    assert result["UBIGEO"].str.len().eq(6).all()
+    pd.testing.assert_frame_equal(result, _expected(pd.read_excel(path, dtype=str)))
+
+def test_csv_chunks_match_read_csv(tmp_path):
+    path = tmp_path / "IPRESS.csv"
+    # Exportación con ';' y latin1, como algunas versiones del registro
+    _registry(seed=1).to_csv(path, sep=";", encoding="latin1", index=False)
+    result = _chunks(path, chunksize=64)
+    full = pd.read_csv(path, sep=";", encoding="latin1", dtype=str)
+    pd.testing.assert_frame_equal(result, _expected(full))
@@ -0,0 +1,44 @@
+"""
+Colectores por hilo de registros de etapas.
+"""
+from instrumentation import collect, stage
+
+def test_keyed_collector_replaces_one_left_running():
+    stale = collect(key="rerun")
+    stale.start()  # Ejecución anterior que no llegó a stop()
+    current = collect(key="rerun")
+    current.start()
+    with collect() as other:
+        with stage("prueba.etapa"):
+            pass
+    current.stop()
+
+    assert [r.name for r in current.sink.records] == ["prueba.etapa"]
+    assert [r.name for r in other.records] == ["prueba.etapa"]
+    assert stale.sink.records == []
+
+def test_failing_sink_is_logged_not_printed(monkeypatch, capsys):
+    import instrumentation
+
+    warnings = []
+
+    class Logger:
+        def warning(self, message):
+            warnings.append(message)
+
+    class Broken:
+        def emit(self, record):
+            raise RuntimeError("sin disco")
+
+    monkeypatch.setattr(instrumentation, "default_logger", lambda: Logger())
+    sink = instrumentation.add_sink(Broken())
+    try:
+        with collect() as records:
+            with stage("prueba.destino"):
+                pass
+    finally:
+        instrumentation.remove_sink(sink)
+
+    assert [r.name for r in records.records] == ["prueba.destino"]
+    assert warnings == ["Instrumentación: error en Broken: sin disco"]
+    assert "sin disco" not in capsys.readouterr().out
@@ -0,0 +1,56 @@
+"""
+Pirámide de geometrías simplificadas: cada nivel queda alineado fila a fila
+con la capa original, con menos vértices, y se recupera igual desde disco.
+"""
+import geopandas as gpd
+import numpy as np
+import shapely
+
+import lod
+
+def _districts(n=40, seed=0):
+    # Círculos de ~20 km (muchos vértices) sin superposición, en orden aleatorio
+    rng = np.random.default_rng(seed)
+    lon, lat = np.meshgrid(np.arange(8) * 0.5 - 78, np.arange(5) * 0.5 - 12)
+    centers = shapely.points(lon.ravel(), lat.ravel())
+    geoms = shapely.buffer(centers, 0.18 + 0.04 * rng.random(len(centers)), quad_segs=64)
+    order = rng.permutation(len(geoms))[:n]
+    return gpd.GeoDataFrame({"UBIGEO_KEY": 150_101 + order}, geometry=geoms[order], crs="EPSG:4326",
+                            index=rng.permutation(1_000)[:n])
+
+def _assert_aligned(levels, gdf):
+    original = gdf.geometry.to_numpy()
+    previous = shapely.get_num_coordinates(original)
+    for level in sorted(levels)[1:]:
+        geoms = levels[level]
+        assert len(geoms) == len(gdf)
+        # Misma fila, mismo distrito: el centro sigue dentro y el área es parecida
+        assert shapely.contains(geoms, shapely.centroid(original)).all()
+        np.testing.assert_allclose(shapely.area(geoms), shapely.area(original), rtol=0.3)
+        vertices = shapely.get_num_coordinates(geoms)
+        assert (vertices <= previous).all()
+        previous = vertices
+    assert previous.sum() < shapely.get_num_coordinates(original).sum() / 4
+
+def test_pyramid_keeps_row_alignment(tmp_path):
+    gdf = _districts()
+    levels = lod.build_pyramid(gdf, cache_dir=str(tmp_path))
+    assert levels[0] is not None and len(levels) == len(lod.LOD_TOLERANCES)
+    _assert_aligned(levels, gdf)
+
+    # Desde disco (sin la copia en memoria) se obtiene lo mismo, en el mismo orden
+    lod._pyramids.clear()
+    stored = lod.build_pyramid(gdf, cache_dir=str(tmp_path))
+    for level in levels:
+        assert shapely.equals_exact(stored[level], levels[level], tolerance=0).all()
+
+def test_simplified_copy_keeps_index_and_columns():
+    gdf = _districts(seed=1)
+    out = lod.simplified(gdf, level=3)
+    assert out.index.equals(gdf.index)
+    np.testing.assert_array_equal(out["UBIGEO_KEY"], gdf["UBIGEO_KEY"])
+    assert shapely.get_num_coordinates(out.geometry.to_numpy()).sum() < \
+        shapely.get_num_coordinates(gdf.geometry.to_numpy()).sum()
+    # Sin nivel, ancho ni zoom: la capa tal cual
+    assert lod.simplified(gdf) is gdf
+    assert lod.level_for_zoom(14) == 0 and lod.level_for_zoom(5) > 0
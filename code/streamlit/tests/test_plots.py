@@ -0,0 +1,91 @@
+"""
+Popups y mapas de hospitales con columnas categóricas (tabla compacta) que
+tienen valores faltantes, y caché de imágenes de render_cached.
+"""
+import numpy as np
+
+import plots
+from benchmark import synthetic_districts, synthetic_ipress
+from estimation import load_and_filter_ipress
+
+def _hospitals(tmp_path, n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    df = synthetic_ipress(synthetic_districts(shape=(12, 10)), n, rng)
+    df.loc[df.index[::4], "Categoria"] = None
+    df.loc[df.index[::7], "Departamento"] = None
+    df.loc[df.index[::9], "Nombre del establecimiento"] = None
+    path = tmp_path / "IPRESS.parquet"
+    df.to_parquet(path, index=False)
+    return load_and_filter_ipress(str(path), use_cache=False)
+
+def test_popups_with_missing_categorical_values(tmp_path):
+    hospitals = _hospitals(tmp_path)
+    assert hospitals["Categoria"].dtype == "category" and hospitals["Categoria"].isna().any()
+    popups = plots.hospital_popups(hospitals)
+    assert popups.index.equals(hospitals.index)
+    missing = hospitals["Categoria"].isna().to_numpy()
+    assert popups[missing].str.endswith("<br>Categoría: ").all()
+    assert not popups.str.contains("nan").any()
+    # La columna original no cambia
+    assert hospitals["Categoria"].dtype == "category"
+
+def test_national_map_with_missing_categorical_values(tmp_path):
+    hospitals = _hospitals(tmp_path, seed=1)
+    m = plots.create_national_hospital_map(hospitals)
+    cluster = next(c for c in m._children.values() if type(c).__name__ == "FastMarkerCluster")
+    # Un marcador [lat, lon, popup] por hospital con coordenadas válidas
+    lat, lon = plots._latlon(hospitals)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    assert len(cluster.data) == valid.sum()
+    assert [row[2] for row in cluster.data] == plots.hospital_popups(hospitals)[valid].tolist()
+    assert "markerClusterGroup" in m.get_root().render()
+
+def test_points_mode_sends_every_hospital(tmp_path):
+    hospitals = _hospitals(tmp_path, seed=2)
+    # Centro lejano y zoom alto: el navegador puede desplazarse a cualquier punto
+    fig = plots.create_hospital_map(hospitals, zoom=12, center={"lat": -3.5, "lon": -80.0})
+    assert sum(len(trace.lat) for trace in fig.data) == len(hospitals)
+    fig = plots.create_hospital_map(hospitals, zoom=5)
+    assert sum(fig.data[0].customdata) == len(hospitals)
+
+CALLS = []
+
+def _bar_figure(df, title="x"):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    CALLS.append(title)
+    fig, ax = plt.subplots(figsize=(2, 2))
+    ax.bar(range(len(df)), df["n"])
+    ax.set_title(title)
+    return fig
+
+def test_render_cached_keys_on_data_function_and_params(tmp_path):
+    import pandas as pd
+
+    CALLS.clear()
+    plots._render_cache.clear()
+    df = pd.DataFrame({"n": [1, 2, 3]})
+    kwargs = dict(cache_dir=str(tmp_path))
+
+    first = plots.render_cached(_bar_figure, df, title="a", **kwargs)
+    assert first.startswith(b"\x89PNG")
+    assert plots.render_cached(_bar_figure, df.copy(), title="a", **kwargs) == first
+    assert CALLS == ["a"]
+    # Otros datos u otros parámetros: se vuelve a dibujar
+    plots.render_cached(_bar_figure, pd.DataFrame({"n": [3, 2, 1]}), title="a", **kwargs)
+    plots.render_cached(_bar_figure, df, title="b", **kwargs)
+    assert CALLS == ["a", "a", "b"]
+
+    # Con data_key no se hashean los datos: la clave decide
+    plots.render_cached(_bar_figure, df, title="c", data_key="v1", **kwargs)
+    plots.render_cached(_bar_figure, pd.DataFrame({"n": [9]}), title="c", data_key="v1", **kwargs)
+    assert CALLS == ["a", "a", "b", "c"]
+    plots.render_cached(_bar_figure, df, title="c", data_key="v2", **kwargs)
+    assert CALLS == ["a", "a", "b", "c", "c"]
+
+    # Sin la copia en memoria, la imagen se lee de disco
+    plots._render_cache.clear()
+    assert plots.render_cached(_bar_figure, df, title="a", **kwargs) == first
+    assert len(CALLS) == 5
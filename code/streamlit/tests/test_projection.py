@@ -0,0 +1,75 @@
+"""
+Zona UTM de origen de IPRESS: 18S o la columna de zona por defecto, y la
+inferencia por departamento (opcional) verificada contra los distritos.
+"""
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+
+from estimation import load_and_filter_ipress, ubigeo_key
+from projection import DEPARTMENT_UTM_ZONE, get_transformer
+
+# Cusco está partido entre 18S y 19S; su zona predominante es 18S
+SITES = [
+    # (UBIGEO, departamento, lon, lat, zona real)
+    ("080101", "CUSCO", -73.6, -13.5, 18),
+    ("080102", "CUSCO", -71.0, -13.5, 19),
+    ("150101", "LIMA", -77.0, -12.0, 18),
+]
+
+def _districts():
+    return gpd.GeoDataFrame({
+        "UBIGEO": [u for u, *_ in SITES],
+        "DEPARTAMEN": [d for _, d, *_ in SITES],
+        "PROVINCIA": [d for _, d, *_ in SITES],
+        "DISTRITO": [f"D{u}" for u, *_ in SITES],
+    }, geometry=[box(lon - 0.5, lat - 0.5, lon + 0.5, lat + 0.5) for _, _, lon, lat, _ in SITES],
+        crs="EPSG:4326")
+
+def _ipress(tmp_path, zone_column=False):
+    rows = []
+    for i, (ubigeo, dept, lon, lat, zone) in enumerate(SITES):
+        este, norte = get_transformer("EPSG:4326", f"EPSG:327{zone}").transform(lon, lat)
+        rows.append({"Código Único": i + 1, "Nombre del establecimiento": f"E{i}",
+                     "Departamento": dept, "Provincia": dept, "Distrito": f"D{ubigeo}",
+                     "UBIGEO": ubigeo, "NORTE": norte, "ESTE": este})
+        if zone_column:
+            rows[-1]["Zona UTM"] = f"{zone}S"
+    path = tmp_path / "IPRESS.parquet"
+    pd.DataFrame(rows).to_parquet(path, index=False)
+    return str(path)
+
+def _error_deg(gdf):
+    expected = np.array([(lon, lat) for _, _, lon, lat, _ in SITES])
+    return np.hypot(gdf.geometry.x - expected[:, 0], gdf.geometry.y - expected[:, 1]).to_numpy()
+
+def test_default_is_18s_or_zone_column(tmp_path):
+    assert DEPARTMENT_UTM_ZONE["CUSCO"] == 18
+    gdf = load_and_filter_ipress(_ipress(tmp_path), use_cache=False)
+    error = _error_deg(gdf)
+    # Sin columna de zona: todo desde 18S (la fila en 19S queda desplazada)
+    assert error[[0, 2]].max() < 1e-6 and error[1] > 4
+
+    gdf = load_and_filter_ipress(_ipress(tmp_path, zone_column=True), use_cache=False)
+    assert _error_deg(gdf).max() < 1e-6
+
+def test_department_zone_is_verified_against_districts(tmp_path):
+    path = _ipress(tmp_path)
+    districts = _districts()
+    districts["UBIGEO_KEY"] = ubigeo_key(districts["UBIGEO"])
+
+    # Sin polígonos: zona predominante del departamento, la minoritaria queda mal
+    unverified = load_and_filter_ipress(path, use_cache=False, utm_zone="department")
+    assert _error_deg(unverified)[1] > 4
+
+    # Con polígonos: la fila de Cusco en 19S se ubica en su distrito
+    gdf = load_and_filter_ipress(path, use_cache=False, utm_zone="department", gdf_districts=districts)
+    assert _error_deg(gdf).max() < 1e-6
+
+    # Sin UBIGEO válido se verifica por el nombre del departamento
+    df = pd.read_parquet(path)
+    df["UBIGEO"] = ""
+    df.to_parquet(path, index=False)
+    gdf = load_and_filter_ipress(path, use_cache=False, utm_zone="department", gdf_districts=districts)
+    assert _error_deg(gdf).max() < 1e-6
@@ -0,0 +1,85 @@
+"""
+Conteos de proximidad e índices de hospitales contra cálculos directos.
+"""
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+import proximity
+from benchmark import synthetic_ccpp, synthetic_districts, synthetic_ipress
+from estimation import load_and_filter_ipress
+
+def _layers(tmp_path, n_hospitals=400, n_ccpp=1_500, seed=0):
+    rng = np.random.default_rng(seed)
+    districts = synthetic_districts(shape=(12, 10))
+    path = tmp_path / "IPRESS.parquet"
+    synthetic_ipress(districts, n_hospitals, rng).to_parquet(path, index=False)
+    hospitals = load_and_filter_ipress(str(path), use_cache=False)
+    ccpp = synthetic_ccpp(districts, n_ccpp, rng)
+    return hospitals, ccpp
+
+def test_hospital_index_depends_on_categoria_and_reuses_frame(tmp_path):
+    hospitals, _ = _layers(tmp_path)
+    todos = proximity.build_hospital_index(hospitals)
+    nivel_ii = proximity.build_hospital_index(hospitals, categoria=["II-1", "II-2"])
+    assert nivel_ii is not todos
+    assert nivel_ii.categoria == ("II-1", "II-2")
+    assert len(nivel_ii) == int(hospitals["Categoria"].isin(["II-1", "II-2"]).sum())
+    # Mismo objeto y parámetros: el índice se reutiliza sin recalcular
+    assert proximity.build_hospital_index(hospitals) is todos
+    assert proximity.build_hospital_index(hospitals, categoria="ii-2 ") is not nivel_ii
+
+    # Mismas coordenadas con otros códigos: otro índice con los códigos nuevos
+    otros = hospitals.copy()
+    otros["Código Único"] = "X" + otros["Código Único"].astype(str)
+    index = proximity.build_hospital_index(otros)
+    assert index is not todos
+    assert set(index.ids) == set(otros["Código Único"])
+
+def test_all_departments_cache_key_includes_names_and_departments(tmp_path):
+    hospitals, ccpp = _layers(tmp_path, seed=1)
+    kwargs = dict(buffer_distance=20_000, max_workers=1, cache_dir=str(tmp_path / "cache"))
+    first = proximity.analyze_proximity_all_departments(ccpp, hospitals, **kwargs)
+
+    renamed = ccpp.copy()
+    renamed["NOM_POBLAD"] = "OTRO " + renamed["NOM_POBLAD"]
+    renamed.loc[renamed.index[:10], "DEPARTAMEN"] = "CUSCO"
+    second = proximity.analyze_proximity_all_departments(renamed, hospitals, **kwargs)
+    assert second["CentroPoblado"].str.startswith("OTRO ").all()
+    assert (second.sort_index()["Departamento"].to_numpy()[:10] == "CUSCO").all()
+    np.testing.assert_array_equal(first.sort_index()["NumHosp"], second.sort_index()["NumHosp"])
+
+def test_sweep_counts_match_ball_queries(tmp_path):
+    hospitals, ccpp = _layers(tmp_path, seed=2)
+    index = proximity.build_hospital_index(hospitals)
+    radii = (30_000, 5_000, 10_000)
+    counts = proximity.count_hospitals_sweep(ccpp, index, radii=radii, batch_size=500)
+
+    xy = proximity.projected_xy(ccpp, index.crs)
+    for column, radius in enumerate(sorted(radii)):
+        expected = np.array([len(found) for found in index.tree.query_ball_point(xy, radius)])
+        np.testing.assert_array_equal(counts[:, column], expected)
+    # Radios más grandes nunca cuentan menos
+    assert (np.diff(counts, axis=1) >= 0).all()
+
+def test_nearest_hospitals_match_brute_force(tmp_path):
+    hospitals, ccpp = _layers(tmp_path, n_hospitals=300, n_ccpp=800, seed=3)
+    index = proximity.build_hospital_index(hospitals, categoria=["I-1", "I-2"])
+    dist, ids = proximity.nearest_hospitals(ccpp, index, k=3, batch_size=250)
+
+    xy = proximity.projected_xy(ccpp, index.crs)
+    all_dist = np.hypot(xy[:, None, 0] - index.xy[None, :, 0], xy[:, None, 1] - index.xy[None, :, 1])
+    expected = np.sort(all_dist, axis=1)[:, :3]
+    np.testing.assert_allclose(dist, expected, rtol=1e-5)
+    # El código devuelto corresponde al hospital a esa distancia
+    by_id = dict(zip(index.ids, range(len(index))))
+    pos = np.vectorize(by_id.get)(ids[:, 0])
+    np.testing.assert_allclose(all_dist[np.arange(len(xy)), pos], dist[:, 0], rtol=1e-5)
+
+    # Con distancia máxima: NaN y None donde no hay hospital
+    limit = float(np.median(expected[:, 0]))
+    dist, ids = proximity.nearest_hospitals(ccpp, index, k=1, max_distance=limit)
+    missing = expected[:, 0] > limit
+    assert missing.any() and np.isnan(dist[missing, 0]).all()
+    assert all(i is None for i in ids[missing, 0])
+    np.testing.assert_allclose(dist[~missing, 0], expected[~missing, 0], rtol=1e-5)
@@ -0,0 +1,53 @@
+"""
+Resolución de columnas: alias exactos (sin importar mayúsculas ni tildes),
+prefijos con advertencia y esquema adjunto al DataFrame.
+"""
+import pandas as pd
+import pytest
+
+from instrumentation import collect, stage
+from schema import Schema, attach_schema, get_schema, resolve_schema
+
+def test_aliases_ignore_case_accents_and_spaces():
+    df = pd.DataFrame(columns=[" codigo único ", "DEPARTAMEN", "nombprov", "Distrito", "IDDIST",
+                               "NORTE", "ESTE", "LATITUD", "LONGITUD"])
+    resolved = resolve_schema(df)
+    assert resolved.to_dict() == {
+        "codigo": " codigo único ", "departamento": "DEPARTAMEN", "provincia": "nombprov",
+        "distrito": "Distrito", "ubigeo": "IDDIST", "norte": "NORTE", "este": "ESTE",
+    }
+    # LATITUD/LONGITUD (grados) no se toman como coordenadas UTM
+    assert "LATITUD" not in resolved.to_dict().values()
+    with pytest.raises(KeyError, match="zona"):
+        resolved.require("zona")
+
+def test_extra_aliases_take_priority():
+    df = pd.DataFrame(columns=["Departamento", "REGION"])
+    assert resolve_schema(df)["departamento"] == "Departamento"
+    assert resolve_schema(df, aliases={"departamento": ["Region"]})["departamento"] == "REGION"
+
+def test_prefix_match_warns():
+    df = pd.DataFrame(columns=["NOMBDEP_2017", "Nombre IPRESS", "DEP_CODIGO"])
+    with collect() as records:
+        with stage("prueba.esquema"):
+            resolved = resolve_schema(df)
+    assert resolved["departamento"] == "NOMBDEP_2017"
+    assert resolved["nombre"] == "Nombre IPRESS"
+    # Los prefijos cortos ('dep') no resuelven nada
+    assert "DEP_CODIGO" not in resolved.to_dict().values()
+    (record,) = records.records
+    assert len(record.warnings) == 2
+
+def test_schema_travels_with_the_frame():
+    df = pd.DataFrame({"Departamento": ["LIMA"], "NORTE": [1.0], "ESTE": [2.0]})
+    attach_schema(df, resolve_schema(df))
+    subset = df[df["NORTE"] > 0].copy()
+    assert get_schema(subset) == resolve_schema(df)
+
+    # Columna renombrada: se conservan los mapeos válidos y se resuelve el resto
+    renamed = subset.rename(columns={"Departamento": "DEPARTAMEN"})
+    assert get_schema(renamed)["departamento"] == "DEPARTAMEN"
+    assert get_schema(renamed)["norte"] == "NORTE"
+
+    other = Schema({"departamento": "DEPARTAMEN", "norte": "NORTE"})
+    assert resolve_schema(df).rename_map(other) == {"Departamento": "DEPARTAMEN"}
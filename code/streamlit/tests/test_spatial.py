@@ -0,0 +1,95 @@
+"""
+Asignación de distritos con STRtree (spatial.assign_districts) contra
+geopandas.sjoin sobre los mismos datos.
+"""
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import Point, box
+
+import spatial
+from estimation import assign_ccpp_districts
+from schema import get_schema
+
+def _districts():
+    # Cuadrícula 4 x 3 de distritos de 0.5° con UBIGEO de dos departamentos
+    cells, keys, depts = [], [], []
+    for i in range(4):
+        for j in range(3):
+            cells.append(box(-78 + 0.5 * i, -13 + 0.5 * j, -77.5 + 0.5 * i, -12.5 + 0.5 * j))
+            dept = 15 if i < 2 else 12
+            keys.append(dept * 10_000 + 100 + 3 * i + j + 1)
+            depts.append("LIMA" if dept == 15 else "JUNIN")
+    return gpd.GeoDataFrame({"UBIGEO": [f"{k:06d}" for k in keys], "UBIGEO_KEY": np.array(keys, dtype=np.int32),
+                             "DEPARTAMEN": depts}, geometry=cells, crs="EPSG:4326")
+
+def _points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # Parte de los puntos cae fuera de la cuadrícula
+    lon = rng.uniform(-78.3, -75.7, n)
+    lat = rng.uniform(-13.3, -11.2, n)
+    return gpd.GeoDataFrame({"id": np.arange(n)}, geometry=gpd.points_from_xy(lon, lat), crs="EPSG:4326")
+
+def _sjoin_keys(points, districts):
+    joined = gpd.sjoin(points, districts[["UBIGEO_KEY", "geometry"]], how="left", predicate="covered_by")
+    joined = joined[~joined.index.duplicated(keep="first")]
+    return joined["UBIGEO_KEY"].reindex(points.index).fillna(-1).to_numpy(dtype=np.int32)
+
+def test_assign_districts_matches_sjoin():
+    districts = _districts()
+    points = _points(2_000)
+    result = spatial.assign_districts(points, districts)
+    expected = _sjoin_keys(points, districts)
+    assert (result >= 0).any() and (result < 0).any()
+    np.testing.assert_array_equal(result, expected)
+
+def test_assign_districts_reprojects_points():
+    districts = _districts()
+    points = _points(500, seed=1)
+    result = spatial.assign_districts(points.to_crs("EPSG:32718"), districts)
+    np.testing.assert_array_equal(result, _sjoin_keys(points, districts))
+
+def test_missing_geometries_do_not_share_cache_key():
+    districts = _districts()
+    a, b = Point(-77.9, -12.9), Point(-76.1, -11.6)
+    first = gpd.GeoDataFrame(geometry=[a, None, b], crs="EPSG:4326")
+    second = gpd.GeoDataFrame(geometry=[a, b, None], crs="EPSG:4326")
+    # Mismas coordenadas válidas en distinto orden de filas: claves distintas
+    r1 = spatial.assign_districts(first, districts)
+    r2 = spatial.assign_districts(second, districts)
+    np.testing.assert_array_equal(r1, [150101, -1, 120112])
+    np.testing.assert_array_equal(r2, [150101, 120112, -1])
+
+def test_district_trees_are_bounded():
+    for shift in range(spatial._MAX_TREES + 2):
+        districts = _districts()
+        districts["UBIGEO_KEY"] = districts["UBIGEO_KEY"] + shift
+        spatial.district_index(districts)
+    assert len(spatial._district_trees) <= spatial._MAX_TREES
+
+def test_ccpp_districts_fill_missing_department():
+    districts = _districts()
+    points = _points(300, seed=2)
+    points["NOM_POBLAD"] = [f"CP {i}" for i in range(len(points))]
+    points["DEPARTAMEN"] = pd.Series(["LIMA"] * len(points), dtype=object)
+    points.loc[::3, "DEPARTAMEN"] = None
+
+    result = assign_ccpp_districts(points, districts)
+    keys = _sjoin_keys(points, districts)
+    np.testing.assert_array_equal(result["UBIGEO_KEY"].to_numpy(), keys)
+
+    filled = points["DEPARTAMEN"].isna().to_numpy() & (keys >= 0)
+    expected = np.where(keys[filled] // 10_000 == 15, "LIMA", "JUNIN")
+    np.testing.assert_array_equal(result["DEPARTAMEN"].to_numpy()[filled], expected)
+    # Los que ya tenían departamento no cambian
+    given = points["DEPARTAMEN"].notna().to_numpy()
+    assert (result["DEPARTAMEN"].to_numpy()[given] == "LIMA").all()
+    assert "UBIGEO_KEY" not in points.columns
+
+def test_ccpp_districts_add_department_column():
+    districts = _districts()
+    points = _points(100, seed=3)
+    result = assign_ccpp_districts(points, districts)
+    assert get_schema(result)["departamento"] == "Departamento"
+    inside = result["UBIGEO_KEY"].to_numpy() >= 0
+    assert result["Departamento"].notna().to_numpy()[inside].all()
@@ -0,0 +1,33 @@
+"""
+Importaciones diferidas: al arrancar el dashboard (y al importar plots.py)
+no se cargan las librerías pesadas; se cargan cuando una función las usa.
+Cada caso corre en un intérprete nuevo.
+"""
+import json
+import subprocess
+import sys
+
+import startup
+
+PLOTTING_MODULES = ("geopandas", "matplotlib.pyplot", "plotly.graph_objects", "folium", "streamlit_folium")
+
+def _loaded_after(code):
+    """Módulos de PLOTTING_MODULES cargados tras ejecutar 'code' en un intérprete nuevo."""
+    code += f"\nimport sys, json\nprint(json.dumps([m for m in {list(PLOTTING_MODULES)!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=startup.SRC_DIR,
+                          capture_output=True, text=True, check=True)
+    return set(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+def test_startup_modules_load_no_heavy_library():
+    entries, heavy_loaded = startup.import_times(startup.STARTUP_MODULES)
+    assert heavy_loaded == []
+    assert {"streamlit", "context"} <= {e["module"] for e in entries}
+
+def test_plots_loads_plotting_libraries_on_first_use():
+    assert _loaded_after("import plots") == set()
+    # La primera figura carga la librería que necesita, y solo esa
+    loaded = _loaded_after(
+        "import pandas as pd\nimport plots\n"
+        "plots.create_department_bar(pd.DataFrame({'Departamento': ['LIMA', 'CUSCO', 'LIMA']}))"
+    )
+    assert loaded == {"plotly.graph_objects"}
@@ -0,0 +1,269 @@
+"""
+Ida y vuelta de las teselas vectoriales: se generan teselas con tiles.py y
+se decodifican con un lector protobuf independiente del codificador.
+"""
+import os
+import struct
+
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import Point, Polygon
+
+import tiles
+
+# ---------------------------------------------------------------------------
+# Lector mínimo de vector_tile.proto (v2)
+# ---------------------------------------------------------------------------
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+def _fields(buf):
+    """(campo, tipo, valor) de un mensaje; los de longitud variable como bytes."""
+    pos = 0
+    while pos < len(buf):
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            value = buf[pos:pos + length]
+            pos += length
+        else:
+            raise ValueError(f"tipo de campo no soportado: {wire_type}")
+        yield field, wire_type, value
+
+def _packed(buf):
+    values, pos = [], 0
+    while pos < len(buf):
+        value, pos = _read_varint(buf, pos)
+        values.append(value)
+    return values
+
+def _unzigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+def _decode_value(buf):
+    for field, _, value in _fields(buf):
+        if field == 1:
+            return bytes(value).decode("utf-8")
+        if field == 3:
+            return struct.unpack("<d", value)[0]
+        if field == 6:
+            return _unzigzag(value)
+        if field == 7:
+            return bool(value)
+    raise ValueError("valor vacío")
+
+def _decode_geometry(commands):
+    """Lista de anillos/grupos de puntos en coordenadas de la tesela."""
+    parts, current = [], []
+    x = y = i = 0
+    while i < len(commands):
+        command, count = commands[i] & 0x7, commands[i] >> 3
+        i += 1
+        if command == 7:
+            parts.append(current)
+            current = []
+            continue
+        if command == 1 and current:
+            parts.append(current)
+            current = []
+        for _ in range(count):
+            x += _unzigzag(commands[i])
+            y += _unzigzag(commands[i + 1])
+            i += 2
+            current.append((x, y))
+    if current:
+        parts.append(current)
+    return parts
+
+def decode_tile(data):
+    """{capa: dict con version, extent y features (id, type, properties, geometry)}."""
+    layers = {}
+    for field, _, layer_buf in _fields(data):
+        assert field == 3
+        layer = {"features": [], "keys": [], "values": []}
+        raw_features = []
+        for lf, _, value in _fields(layer_buf):
+            if lf == 15:
+                layer["version"] = value
+            elif lf == 1:
+                layer["name"] = bytes(value).decode("utf-8")
+            elif lf == 2:
+                raw_features.append(value)
+            elif lf == 3:
+                layer["keys"].append(bytes(value).decode("utf-8"))
+            elif lf == 4:
+                layer["values"].append(_decode_value(value))
+            elif lf == 5:
+                layer["extent"] = value
+        for raw in raw_features:
+            feature = {"properties": {}}
+            for ff, _, value in _fields(raw):
+                if ff == 1:
+                    feature["id"] = value
+                elif ff == 2:
+                    tags = _packed(value)
+                    for k, v in zip(tags[::2], tags[1::2]):
+                        feature["properties"][layer["keys"][k]] = layer["values"][v]
+                elif ff == 3:
+                    feature["type"] = value
+                elif ff == 4:
+                    feature["geometry"] = _decode_geometry(_packed(value))
+            layer["features"].append(feature)
+        layers[layer["name"]] = layer
+    return layers
+
+def _ring_area(ring):
+    xy = np.asarray(ring, dtype=float)
+    x, y = xy[:, 0], xy[:, 1]
+    return np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y) / 2
+
+# ---------------------------------------------------------------------------
+# Datos
+# ---------------------------------------------------------------------------
+
+ZOOM = 6
+
+@pytest.fixture
+def layers():
+    # Dos distritos cuadrados dentro de una misma tesela de zoom 6 (el
+    # segundo con un hueco) y tres hospitales
+    districts = gpd.GeoDataFrame({
+        "UBIGEO_KEY": [150101, 150102],
+        "DISTRITO": ["LIMA", "ANCÓN"],
+        "n_hospitales": [2, 1],
+    }, geometry=[
+        Polygon([(-77.4, -12.4), (-77.0, -12.4), (-77.0, -12.0), (-77.4, -12.0)]),
+        Polygon([(-76.9, -12.4), (-76.5, -12.4), (-76.5, -12.0), (-76.9, -12.0)],
+                holes=[[(-76.8, -12.3), (-76.6, -12.3), (-76.6, -12.1), (-76.8, -12.1)]]),
+    ], crs="EPSG:4326")
+    hospitals = gpd.GeoDataFrame({
+        "Nombre": ["HOSPITAL A", "HOSPITAL B", "HOSPITAL C"],
+        "Camas": [120, 30, 8],
+        "Lat": [-12.2, -12.3, -12.05],
+    }, geometry=[Point(-77.2, -12.2), Point(-77.1, -12.3), Point(-76.55, -12.05)], crs="EPSG:4326")
+    return {
+        "distritos": (districts, ["DISTRITO", "n_hospitales"]),
+        "hospitales": (hospitals, ["Nombre", "Camas", "Lat"]),
+    }
+
+def _tile_of(lon, lat, zoom):
+    world = tiles._world_coords(zoom)(np.array([[lon, lat]]))[0]
+    return tuple((world // tiles.TILE_EXTENT).astype(int))
+
+def _to_lonlat(x, y, tx, ty, zoom):
+    """Coordenadas de tesela -> lon/lat (inversa de _world_coords)."""
+    scale = (2 ** zoom) * tiles.TILE_EXTENT
+    wx = (tx * tiles.TILE_EXTENT + x) / scale
+    wy = (ty * tiles.TILE_EXTENT + y) / scale
+    lon = wx * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * wy))))
+    return lon, lat
+
+# ---------------------------------------------------------------------------
+# Pruebas
+# ---------------------------------------------------------------------------
+
+def test_round_trip_layers_features_and_extent(tmp_path, layers):
+    metadata = tiles.build_tiles(layers, tmp_path, zooms=[ZOOM])
+    tx, ty = _tile_of(-77.0, -12.2, ZOOM)
+    path = tmp_path / str(ZOOM) / str(tx) / f"{ty}.pbf"
+    assert path.exists()
+    assert metadata["minzoom"] == metadata["maxzoom"] == ZOOM
+    assert metadata["layers"] == {"distritos": ["DISTRITO", "n_hospitales"],
+                                  "hospitales": ["Nombre", "Camas", "Lat"]}
+
+    decoded = decode_tile(path.read_bytes())
+    assert set(decoded) == {"distritos", "hospitales"}
+    for layer in decoded.values():
+        assert layer["version"] == 2
+        assert layer["extent"] == tiles.TILE_EXTENT
+
+    districts = {f["id"]: f for f in decoded["distritos"]["features"]}
+    assert set(districts) == {150101, 150102}
+    assert districts[150101]["properties"] == {"DISTRITO": "LIMA", "n_hospitales": 2}
+    assert districts[150102]["properties"] == {"DISTRITO": "ANCÓN", "n_hospitales": 1}
+    assert all(f["type"] == 3 for f in districts.values())
+
+    # Anillos: el exterior con área positiva (eje y hacia abajo) y el hueco negativa
+    assert len(districts[150101]["geometry"]) == 1
+    exterior, hole = districts[150102]["geometry"]
+    assert _ring_area(exterior) > 0 > _ring_area(hole)
+
+    # Las esquinas decodificadas vuelven a lon/lat con error menor a una unidad de tesela
+    xy = np.asarray(districts[150101]["geometry"][0], dtype=float)
+    lon, lat = _to_lonlat(xy[:, 0], xy[:, 1], tx, ty, ZOOM)
+    unit = 360.0 / (2 ** ZOOM * tiles.TILE_EXTENT)
+    assert np.allclose(sorted(set(np.round(lon, 2))), [-77.4, -77.0], atol=unit)
+    assert np.allclose(sorted(set(np.round(lat, 2))), [-12.4, -12.0], atol=unit)
+
+    hospitals = decoded["hospitales"]["features"]
+    assert len(hospitals) == 3
+    assert all(f["type"] == 1 for f in hospitals)
+    by_name = {f["properties"]["Nombre"]: f for f in hospitals}
+    assert by_name["HOSPITAL A"]["properties"]["Camas"] == 120
+    assert by_name["HOSPITAL B"]["properties"]["Lat"] == pytest.approx(-12.3)
+    (point,), = by_name["HOSPITAL C"]["geometry"]
+    lon, lat = _to_lonlat(point[0], point[1], tx, ty, ZOOM)
+    assert lon == pytest.approx(-76.55, abs=unit)
+    assert lat == pytest.approx(-12.05, abs=unit)
+
+def test_empty_layer_is_not_encoded():
+    assert tiles.encode_layer("vacia", np.array([], dtype=object), {}, np.array([]), False) is None
+
+def test_tile_url_settings():
+    assert tiles.tile_url("https://teselas.example.org/peru/") == "https://teselas.example.org/peru/{z}/{x}/{y}.pbf"
+    settings = tiles.tile_settings({})
+    assert settings["public_url"] is None and not settings["local_server"]
+    settings = tiles.tile_settings({tiles.TILE_SERVER_ENV: "1", tiles.TILE_PORT_ENV: "9000"})
+    assert settings["local_server"] and settings["port"] == 9000
+    assert tiles.local_base_url("127.0.0.1", 9000) == "http://127.0.0.1:9000"
+
+def _colocated_hospitals():
+    # Tres hospitales en el mismo edificio y uno a pocos metros
+    return gpd.GeoDataFrame({"Nombre": ["A", "B", "C", "D"]},
+                            geometry=[Point(-77.2, -12.2)] * 3 + [Point(-77.2001, -12.2001)], crs="EPSG:4326")
+
+def test_max_zoom_keeps_every_point(tmp_path):
+    layers = {"hospitales": (_colocated_hospitals(), ["Nombre"])}
+    tiles.build_tiles(layers, tmp_path / "teselas", zooms=[ZOOM, ZOOM + 4])
+
+    def names(zoom):
+        tx, ty = _tile_of(-77.2, -12.2, zoom)
+        path = tmp_path / "teselas" / str(zoom) / str(tx) / f"{ty}.pbf"
+        return sorted(f["properties"]["Nombre"] for f in decode_tile(path.read_bytes())["hospitales"]["features"])
+
+    # Zoom menor: un punto por celda; zoom máximo (sobreampliado): todos
+    assert names(ZOOM) == ["A"]
+    assert names(ZOOM + 4) == ["A", "B", "C", "D"]
+
+def test_rebuild_replaces_previous_tiles(tmp_path, layers):
+    output = tmp_path / "teselas"
+    tiles.build_tiles(layers, output, zooms=[ZOOM, ZOOM + 1])
+    assert (output / str(ZOOM + 1)).is_dir()
+    tiles.build_tiles(layers, output, zooms=[ZOOM])
+    assert not (output / str(ZOOM + 1)).exists()
+    assert tiles.load_metadata(str(output))["maxzoom"] == ZOOM
+    assert not list(tmp_path.glob("*.tmp"))
+
+    other = tmp_path / "otra"
+    other.mkdir()
+    (other / "notas.txt").write_text("no borrar")
+    with pytest.raises(ValueError):
+        tiles.build_tiles(layers, other, zooms=[ZOOM])
+    assert (other / "notas.txt").exists()
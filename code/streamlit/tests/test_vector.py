@@ -0,0 +1,53 @@
+"""
+Lectura de capas vectoriales (vector.read_vector) desde el almacén
+GeoParquet y directamente con OGR, contra geopandas.read_file.
+"""
+import geopandas as gpd
+import numpy as np
+import pytest
+
+from benchmark import synthetic_districts
+from vector import read_vector
+
+BBOX = (-76.0, -14.0, -72.5, -10.0)
+
+@pytest.fixture(scope="module")
+def shapefile(tmp_path_factory):
+    path = tmp_path_factory.mktemp("capa") / "distritos.shp"
+    synthetic_districts(shape=(20, 16)).to_file(path, engine="pyogrio")
+    return str(path)
+
+def _ubigeos(gdf):
+    return sorted(gdf["UBIGEO"])
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_bbox_and_columns_match_read_file(shapefile, tmp_path, use_cache):
+    expected = gpd.read_file(shapefile, bbox=BBOX)
+    result = read_vector(shapefile, columns=["UBIGEO"], bbox=BBOX, use_cache=use_cache,
+                         cache_dir=str(tmp_path / "cache"))
+    assert list(result.columns) == ["UBIGEO", "geometry"]
+    assert 0 < len(result) < len(gpd.read_file(shapefile))
+    assert _ubigeos(result) == _ubigeos(expected)
+    merged = result.merge(expected[["UBIGEO", "geometry"]], on="UBIGEO", suffixes=("", "_esperado"))
+    assert merged.geometry.geom_equals(gpd.GeoSeries(merged["geometry_esperado"])).all()
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_department_and_where_filters(shapefile, tmp_path, use_cache):
+    full = gpd.read_file(shapefile)
+    dept = full["DEPARTAMEN"].iloc[0]
+    kwargs = dict(use_cache=use_cache, cache_dir=str(tmp_path / "cache"))
+
+    # Sin tildes ni mayúsculas
+    result = read_vector(shapefile, department=dept.lower(), **kwargs)
+    assert _ubigeos(result) == _ubigeos(full[full["DEPARTAMEN"] == dept])
+    # El índice es la fila original de la capa
+    np.testing.assert_array_equal(full.loc[result.index, "UBIGEO"], result["UBIGEO"])
+
+    result = read_vector(shapefile, where=[("UBIGEO", "in", list(full["UBIGEO"].iloc[:5]))], **kwargs)
+    assert _ubigeos(result) == _ubigeos(full.iloc[:5])
+
+def test_output_crs(shapefile, tmp_path):
+    result = read_vector(shapefile, crs="EPSG:32718", cache_dir=str(tmp_path / "cache"))
+    expected = gpd.read_file(shapefile).to_crs("EPSG:32718")
+    assert result.crs == "EPSG:32718"
+    np.testing.assert_allclose(result.sort_index().total_bounds, expected.total_bounds)